@@ -9,6 +9,8 @@ from posts.models import Post, Group
 def mock_media(settings):
     with tempfile.TemporaryDirectory() as temp_directory:
         settings.MEDIA_ROOT = temp_directory
+        # Фоновые миниатюры пережили бы тест и писали бы в удаляемый каталог
+        settings.POST_THUMBNAIL_BACKGROUND = False
         yield temp_directory
 
 
@@ -0,0 +1,17 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite, в котором транзакции записи начинаются с BEGIN IMMEDIATE
+
+    Пока выставлен begin_immediate (см. core.writes), транзакция берёт
+    блокировку записи сразу. Обычный BEGIN DEFERRED получает её только
+    на первом изменении, и если БД в этот момент пишет другой процесс,
+    SQLite не ждёт busy_timeout, а сразу отвечает "database is locked".
+    """
+    begin_immediate = False
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(
+            'BEGIN IMMEDIATE' if self.begin_immediate else 'BEGIN'
+        )
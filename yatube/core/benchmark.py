@@ -0,0 +1,115 @@
+import resource
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def benchmark_database(name=None):
+    """Временная тестовая БД, чтобы бенчмарки не трогали рабочие данные
+
+    name задаёт файл БД: по умолчанию тестовая БД SQLite живёт в памяти,
+    а миллионы строк туда не помещаются.
+    """
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict['TEST']
+    old_test_name = test_settings.get('NAME')
+    if name:
+        test_settings['NAME'] = name
+    connection.creation.create_test_db(verbosity=0, autoclobber=True,
+                                       serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = old_test_name
+
+
+def measure(func, repeat=20):
+    """Время выполнения func в миллисекундах для каждого из repeat вызовов"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга"""
+    ordered = sorted(values)
+    rank = max(0, round(percent / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def summary(timings):
+    return {
+        'p50': statistics.median(timings),
+        'p95': percentile(timings, 95),
+        'min': min(timings),
+    }
+
+
+def reset_peak_rss():
+    """Сбрасывает пиковый RSS процесса (только Linux); False, если нельзя"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss():
+    """Пиковый RSS процесса в килобайтах"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def first_requests(database, urls, warm):
+    """Время запуска и первых запросов свежего продакшен-воркера
+
+    Вызывается в новом процессе до django.setup(): включает настройки
+    продакшена (DEBUG = False, кеширующий загрузчик шаблонов) и БД
+    database, поднимает WSGI-приложение, при warm прогревает его и
+    отдаёт urls по два раза прямо через WSGI. Времена в миллисекундах.
+    """
+    from django.conf import settings
+
+    settings.DEBUG = False
+    options = settings.TEMPLATES[0]['OPTIONS']
+    if not isinstance(options['loaders'][0], tuple):
+        options['loaders'] = [
+            ('django.template.loaders.cached.Loader', options['loaders']),
+        ]
+    settings.DATABASES['default']['NAME'] = database
+    started = time.perf_counter()
+    from django.core.wsgi import get_wsgi_application
+    application = get_wsgi_application()
+    if warm:
+        from core.warmup import warmup
+        warmup()
+    result = {'boot': (time.perf_counter() - started) * 1000}
+
+    from django.test import RequestFactory
+    factory = RequestFactory()
+
+    def get(url):
+        started = time.perf_counter()
+        response = application(factory.get(url).environ,
+                               lambda status, headers: None)
+        b''.join(response)
+        response.close()
+        return (time.perf_counter() - started) * 1000
+
+    result['first'] = {url: get(url) for url in urls}
+    result['second'] = {url: get(url) for url in urls}
+    return result
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+
+from .metrics import record_cache
+
+MISSING = object()
+
+
+class MetricsCacheMixin:
+    """Учитывает попадания и промахи get/get_many в метриках запроса"""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, MISSING, version=version)
+        if value is MISSING:
+            record_cache(0, 1)
+            return default
+        record_cache(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        # Как в BaseCache, через get: иначе LocMemCache посчитал бы каждый
+        # ключ дважды. Бэкендам с настоящим get_many нужна своя версия.
+        values = {}
+        misses = 0
+        for key in keys:
+            value = super().get(key, MISSING, version=version)
+            if value is MISSING:
+                misses += 1
+            else:
+                values[key] = value
+        record_cache(len(values), misses)
+        return values
+
+
+class MetricsLocMemCache(MetricsCacheMixin, LocMemCache):
+    pass
+
+
+def metrics_caches():
+    """settings.CACHES с MetricsLocMemCache вместо LocMemCache
+
+    Для override_settings там, где метрики включаются на ходу.
+    """
+    return {
+        alias: ({**options, 'BACKEND': 'core.cache.MetricsLocMemCache'}
+                if options['BACKEND'].endswith('.LocMemCache') else options)
+        for alias, options in settings.CACHES.items()
+    }
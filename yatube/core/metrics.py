@@ -0,0 +1,169 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+_local = threading.local()
+
+
+class RequestStats:
+    """Счётчики одного запроса: запросы к БД, шаблоны и кеш"""
+    __slots__ = ('queries', 'db_seconds', 'template_seconds',
+                 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка connection.execute_wrapper: время каждого запроса"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - started
+
+
+def current():
+    """Счётчики текущего запроса или None, если метрики не собираются"""
+    return getattr(_local, 'stats', None)
+
+
+def start():
+    stats = _local.stats = RequestStats()
+    return stats
+
+
+def finish():
+    _local.stats = None
+
+
+def record_template(seconds):
+    stats = current()
+    if stats is not None:
+        stats.template_seconds += seconds
+
+
+def record_cache(hits, misses):
+    stats = current()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+class ViewMetrics:
+    __slots__ = ('requests', 'buckets', 'seconds', 'queries', 'db_seconds',
+                 'template_seconds', 'cache_hits', 'cache_misses')
+
+    def __init__(self, bucket_count):
+        self.requests = {}
+        self.buckets = [0] * bucket_count
+        self.seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+class Registry:
+    """Метрики процесса по именам view
+
+    Каждый процесс-воркер считает свои запросы; Prometheus опрашивает
+    воркеры по отдельности и суммирует их сам.
+    """
+
+    def __init__(self, buckets=None):
+        self.lock = threading.Lock()
+        self.buckets = buckets
+        self.views = {}
+
+    def observe(self, view, status, seconds, stats):
+        buckets = self.buckets or settings.METRICS_BUCKETS
+        with self.lock:
+            metrics = self.views.get(view)
+            if metrics is None:
+                metrics = self.views[view] = ViewMetrics(len(buckets))
+            metrics.requests[status] = metrics.requests.get(status, 0) + 1
+            index = bisect_left(buckets, seconds)
+            if index < len(buckets):
+                metrics.buckets[index] += 1
+            metrics.seconds += seconds
+            metrics.queries += stats.queries
+            metrics.db_seconds += stats.db_seconds
+            metrics.template_seconds += stats.template_seconds
+            metrics.cache_hits += stats.cache_hits
+            metrics.cache_misses += stats.cache_misses
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus 0.0.4"""
+        buckets = self.buckets or settings.METRICS_BUCKETS
+        with self.lock:
+            views = sorted(self.views.items())
+            lines = [
+                '# HELP yatube_view_requests_total Обработанные запросы.',
+                '# TYPE yatube_view_requests_total counter',
+            ]
+            for view, metrics in views:
+                for status, count in sorted(metrics.requests.items()):
+                    lines.append(
+                        f'yatube_view_requests_total{{view="{escape(view)}",'
+                        f'status="{status}"}} {count}'
+                    )
+            lines += [
+                '# HELP yatube_view_duration_seconds Время обработки.',
+                '# TYPE yatube_view_duration_seconds histogram',
+            ]
+            for view, metrics in views:
+                label = f'view="{escape(view)}"'
+                cumulative = 0
+                for bound, count in zip(buckets, metrics.buckets):
+                    cumulative += count
+                    lines.append(
+                        f'yatube_view_duration_seconds_bucket'
+                        f'{{{label},le="{bound}"}} {cumulative}'
+                    )
+                total = sum(metrics.requests.values())
+                lines += [
+                    f'yatube_view_duration_seconds_bucket'
+                    f'{{{label},le="+Inf"}} {total}',
+                    f'yatube_view_duration_seconds_sum{{{label}}} '
+                    f'{metrics.seconds}',
+                    f'yatube_view_duration_seconds_count{{{label}}} {total}',
+                ]
+            for name, attribute, help_text in COUNTERS:
+                lines += [f'# HELP {name} {help_text}',
+                          f'# TYPE {name} counter']
+                lines += [
+                    f'{name}{{view="{escape(view)}"}} '
+                    f'{getattr(metrics, attribute)}'
+                    for view, metrics in views
+                ]
+        return '\n'.join(lines) + '\n'
+
+
+COUNTERS = (
+    ('yatube_view_db_queries_total', 'queries', 'Запросы к БД.'),
+    ('yatube_view_db_duration_seconds_total', 'db_seconds',
+     'Время запросов к БД.'),
+    ('yatube_view_template_duration_seconds_total', 'template_seconds',
+     'Время рендеринга шаблонов.'),
+    ('yatube_view_cache_hits_total', 'cache_hits', 'Попадания в кеш.'),
+    ('yatube_view_cache_misses_total', 'cache_misses', 'Промахи кеша.'),
+)
+
+registry = Registry()
@@ -0,0 +1,192 @@
+import threading
+import time
+from functools import wraps
+
+from django.template.base import Node, Template, TextNode, VariableNode
+
+_local = threading.local()
+
+
+class RenderProfile:
+    """Дерево рендеринга одного запроса
+
+    Кадры — шаблоны (в том числе подключённые через include и extends),
+    теги и фильтры. stacks хранит собственное время по полному пути
+    кадров, frames — число вызовов, полное и собственное время по имени
+    кадра. Текст и переменные без фильтров отдельных кадров не получают:
+    их время входит в собственное время родителя.
+    """
+
+    def __init__(self, root):
+        self.path = [root]
+        self.children = [0.0]
+        self.stacks = {}
+        self.frames = {}
+
+    def enter(self, name):
+        self.path.append(name)
+        self.children.append(0.0)
+
+    def exit(self, seconds):
+        key = tuple(self.path)
+        name = self.path.pop()
+        own = seconds - self.children.pop()
+        self.children[-1] += seconds
+        self.stacks[key] = self.stacks.get(key, 0.0) + own
+        frame = self.frames.setdefault(name, [0, 0.0, 0.0])
+        frame[0] += 1
+        # Рекурсивный кадр (for внутри for) не считается в полное время
+        # дважды
+        if name not in self.path:
+            frame[1] += seconds
+        frame[2] += own
+
+
+def current():
+    """Профиль текущего рендеринга или None"""
+    return getattr(_local, 'profile', None)
+
+
+def start(request=None):
+    """Начинает профиль, корневой кадр — имя view запроса"""
+    match = getattr(request, 'resolver_match', None)
+    root = match.view_name if match is not None else 'render'
+    profile = _local.profile = RenderProfile(root)
+    return profile
+
+
+def finish():
+    profile = current()
+    _local.profile = None
+    if profile is not None:
+        profiler.add(profile)
+
+
+def profiled(name, function, *args, **kwargs):
+    profile = current()
+    if profile is None:
+        return function(*args, **kwargs)
+    profile.enter(name)
+    started = time.perf_counter()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        profile.exit(time.perf_counter() - started)
+
+
+class Profiler:
+    """Профили рендеринга, сложенные по всем запросам процесса"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.stacks = {}
+            self.frames = {}
+
+    def add(self, profile):
+        with self.lock:
+            self.requests += 1
+            for key, seconds in profile.stacks.items():
+                self.stacks[key] = self.stacks.get(key, 0.0) + seconds
+            for name, (calls, cumulative, own) in profile.frames.items():
+                frame = self.frames.setdefault(name, [0, 0.0, 0.0])
+                frame[0] += calls
+                frame[1] += cumulative
+                frame[2] += own
+
+    def collapsed(self):
+        """Формат collapsed stacks (flamegraph.pl, speedscope): микросекунды"""
+        with self.lock:
+            lines = []
+            for key, seconds in sorted(self.stacks.items()):
+                micros = round(seconds * 1000000)
+                if micros > 0:
+                    lines.append(f'{";".join(key)} {micros}')
+        return '\n'.join(lines) + '\n'
+
+    def table(self):
+        """Кадры по убыванию собственного времени, времена в мс"""
+        with self.lock:
+            requests = self.requests or 1
+            lines = [
+                f'requests: {self.requests}',
+                f'{"frame":<50} {"calls":>8} {"cum ms":>10} {"self ms":>10} '
+                f'{"cum/req":>8} {"self/req":>8}',
+            ]
+            frames = sorted(self.frames.items(),
+                            key=lambda item: item[1][2], reverse=True)
+            for name, (calls, cumulative, own) in frames:
+                cumulative *= 1000
+                own *= 1000
+                lines.append(
+                    f'{name:<50} {calls:>8} {cumulative:>10.2f} '
+                    f'{own:>10.2f} {cumulative / requests:>8.2f} '
+                    f'{own / requests:>8.2f}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+profiler = Profiler()
+
+
+def node_name(node):
+    token = getattr(node, 'token', None)
+    if token is None:
+        return f'tag:{type(node).__name__}'
+    return f'tag:{token.contents.split(None, 1)[0]}'
+
+
+def profiled_filter(name, function):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        return profiled(name, function, *args, **kwargs)
+    wrapper.profiled = True
+    return wrapper
+
+
+def profile_filters(library, prefix):
+    for name, function in list(library.filters.items()):
+        if not getattr(function, 'profiled', False):
+            library.filters[name] = profiled_filter(
+                f'filter:{prefix}{name}', function
+            )
+
+
+def install(engine):
+    """Включает замеры шаблонов, тегов и фильтров для движка engine
+
+    Узлы и шаблоны замеряются подменой Node.render_annotated и
+    Template._render, фильтры — обёртками в библиотеках движка: фильтры
+    сторонних библиотек подписываются именем библиотеки
+    (filter:user_filters.addclass). Пока профиль не начат, обёртки только
+    проверяют его наличие. Уже скомпилированные шаблоны выбрасываются из
+    кеширующего загрузчика, чтобы заново найти обёрнутые фильтры.
+    """
+    for library in engine.template_builtins:
+        profile_filters(library, '')
+    for name, library in engine.template_libraries.items():
+        profile_filters(library, f'{name}.')
+    for loader in engine.template_loaders:
+        if hasattr(loader, 'reset'):
+            loader.reset()
+    if getattr(Node.render_annotated, 'profiled', False):
+        return
+    render_annotated = Node.render_annotated
+    render_template = Template._render
+
+    def profiled_render_annotated(node, context):
+        if current() is None or isinstance(node, (TextNode, VariableNode)):
+            return render_annotated(node, context)
+        return profiled(node_name(node), render_annotated, node, context)
+
+    def profiled_render_template(template, context):
+        return profiled(f'template:{template.name or "<string>"}',
+                        render_template, template, context)
+
+    profiled_render_annotated.profiled = True
+    Node.render_annotated = profiled_render_annotated
+    Template._render = profiled_render_template
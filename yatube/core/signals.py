@@ -0,0 +1,28 @@
+from threading import local
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Прагмы SQLITE_PRAGMAS для каждого нового соединения с SQLite"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(setting_changed)
+def reset_caches(sender, setting, **kwargs):
+    """Пересоздаёт кеши после override_settings(CACHES=...)
+
+    Django 2.2 этого не делает, а бэкенд кеша с метриками подключается
+    только через CACHES (см. core.cache.metrics_caches).
+    """
+    if setting == 'CACHES':
+        caches._caches = local()
@@ -0,0 +1,56 @@
+import time
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+
+from . import profiling
+from .metrics import record_template
+
+
+class MetricsTemplate(Template):
+
+    def render(self, context=None, request=None):
+        profile = None
+        if settings.TEMPLATE_PROFILING and profiling.current() is None:
+            profile = profiling.start(request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            record_template(time.perf_counter() - started)
+            if profile is not None:
+                profiling.finish()
+
+
+class MetricsDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates, учитывающий время рендеринга в метриках запроса
+
+    Замеряется шаблон, отданный view целиком, вместе со всеми include.
+    При TEMPLATE_PROFILING рендеринг дополнительно раскладывается по
+    шаблонам, тегам и фильтрам (см. core.profiling).
+    """
+
+    def __init__(self, params):
+        super().__init__(params)
+        if settings.TEMPLATE_PROFILING:
+            profiling.install(self.engine)
+
+    def from_string(self, template_code):
+        return MetricsTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return MetricsTemplate(template.template, self)
+
+
+def metrics_templates():
+    """settings.TEMPLATES с MetricsDjangoTemplates вместо DjangoTemplates
+
+    Для override_settings там, где метрики или профилирование включаются
+    на ходу: движки шаблонов при этом пересоздаются.
+    """
+    return [
+        {**options, 'BACKEND': 'core.templates.MetricsDjangoTemplates'}
+        if options['BACKEND'].endswith('.DjangoTemplates') else options
+        for options in settings.TEMPLATES
+    ]
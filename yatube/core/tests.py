@@ -1,5 +1,19 @@
-from django.test import Client, TestCase
+import json
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection
+from django.template import engines
+from django.urls import reverse
+
+from . import profiling, warmup
+from .cache import MetricsLocMemCache, metrics_caches
+from .metrics import registry
+from .templates import MetricsDjangoTemplates, metrics_templates
 
 
 User = get_user_model()
@@ -21,3 +35,162 @@ class TestCoreViews(TestCase):
     def test_template_404(self):
         response = self.authorized_client.get('/unexisting-page/')
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+@override_settings(METRICS_ENABLED=True, CACHES=metrics_caches(),
+                   TEMPLATES=metrics_templates())
+class TestMetrics(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.guest_client = Client()
+
+    def metric(self, text, line_start):
+        for line in text.splitlines():
+            if line.startswith(line_start):
+                return float(line.rsplit(' ', 1)[1])
+        return None
+
+    def test_metrics_per_view(self):
+        self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get('/unexisting-page/')
+        text = self.guest_client.get(reverse('metrics')).content.decode()
+        view = 'view="posts:index"'
+        self.assertEqual(self.metric(
+            text, f'yatube_view_requests_total{{{view},status="200"}}'
+        ), 2)
+        self.assertEqual(self.metric(
+            text, f'yatube_view_duration_seconds_count{{{view}}}'
+        ), 2)
+        self.assertEqual(self.metric(
+            text, f'yatube_view_duration_seconds_bucket{{{view},le="+Inf"}}'
+        ), 2)
+        self.assertGreater(self.metric(
+            text, f'yatube_view_db_queries_total{{{view}}}'
+        ), 0)
+        self.assertGreater(self.metric(
+            text, f'yatube_view_template_duration_seconds_total{{{view}}}'
+        ), 0)
+        self.assertGreater(self.metric(
+            text, f'yatube_view_cache_misses_total{{{view}}}'
+        ), 0)
+        self.assertEqual(self.metric(
+            text, 'yatube_view_requests_total{view="unresolved",status="404"}'
+        ), 1)
+
+    def test_metrics_endpoint_is_internal(self):
+        response = self.guest_client.get(reverse('metrics'),
+                                         REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled_metrics_are_not_collected(self):
+        self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(registry.views, {})
+        self.assertEqual(
+            self.guest_client.get(reverse('metrics')).status_code, 404
+        )
+
+
+@override_settings(TEMPLATE_PROFILING=True, TEMPLATES=metrics_templates())
+class TestTemplateProfiling(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        profiling.install(engines.all()[0].engine)
+
+    def setUp(self):
+        cache.clear()
+        profiling.profiler.reset()
+        self.guest_client = Client()
+
+    def test_profile_frames(self):
+        self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('users:signup'))
+        frames = profiling.profiler.frames
+        self.assertEqual(profiling.profiler.requests, 2)
+        for name in ('template:posts/index.html', 'template:base.html',
+                     'template:posts/includes/paginator.html',
+                     'template:includes/header.html', 'tag:include',
+                     'filter:user_filters.addclass'):
+            self.assertIn(name, frames)
+        calls, cumulative, own = frames['template:base.html']
+        self.assertEqual(calls, 2)
+        self.assertGreaterEqual(cumulative, own)
+        self.assertIn(
+            ('posts:index', 'template:posts/index.html', 'tag:extends',
+             'template:base.html', 'tag:include',
+             'template:includes/header.html'),
+            profiling.profiler.stacks
+        )
+
+    def test_profile_endpoint(self):
+        self.guest_client.get(reverse('posts:index'))
+        response = self.guest_client.get(reverse('template_profile'),
+                                         {'format': 'collapsed'})
+        stack, micros = response.content.decode().splitlines()[0].rsplit(
+            ' ', 1
+        )
+        self.assertTrue(stack.startswith('posts:index;'))
+        self.assertGreater(int(micros), 0)
+        self.assertIn('template:posts/index.html', self.guest_client.get(
+            reverse('template_profile')
+        ).content.decode())
+        with override_settings(TEMPLATE_PROFILING=False):
+            self.assertEqual(self.guest_client.get(
+                reverse('template_profile')
+            ).status_code, 404)
+
+
+class TestStockBackends(TestCase):
+    def test_metrics_backends_are_off_by_default(self):
+        self.assertNotIsInstance(caches['default'], MetricsLocMemCache)
+        self.assertNotIsInstance(engines.all()[0], MetricsDjangoTemplates)
+
+    def test_metrics_backends_follow_override(self):
+        with override_settings(CACHES=metrics_caches(),
+                               TEMPLATES=metrics_templates()):
+            self.assertIsInstance(caches['default'], MetricsLocMemCache)
+            self.assertIsInstance(engines.all()[0], MetricsDjangoTemplates)
+        self.assertNotIsInstance(caches['default'], MetricsLocMemCache)
+
+
+class TestWarmup(TestCase):
+    def test_warmup_command(self):
+        out = StringIO()
+        call_command('warmup', stdout=out)
+        stats = json.loads(out.getvalue())
+        self.assertEqual(stats['failed'], [])
+        self.assertGreater(stats['templates'], 0)
+        self.assertGreater(stats['urls'], 0)
+
+    def test_warmup_compiles_into_cached_loader(self):
+        engine = engines.all()[0].engine
+        loaders = engine.get_template_loaders(
+            [('django.template.loaders.cached.Loader', engine.loaders)]
+        )
+        with mock.patch.object(engine, 'template_loaders', loaders):
+            compiled, failed = warmup.compile_templates()
+        loader, = loaders
+        self.assertEqual(failed, [])
+        self.assertGreaterEqual(len(loader.get_template_cache), compiled)
+        self.assertIn('posts/includes/paginator.html',
+                      loader.get_template_cache)
+
+
+class TestSqlitePragmas(TestCase):
+    def test_pragmas_are_set_on_connection(self):
+        pragmas = {}
+        with connection.cursor() as cursor:
+            for name in ('synchronous', 'busy_timeout', 'cache_size',
+                         'temp_store'):
+                cursor.execute(f'PRAGMA {name}')
+                pragmas[name] = cursor.fetchone()[0]
+        self.assertEqual(pragmas, {'synchronous': 1, 'busy_timeout': 5000,
+                                   'cache_size': -20000, 'temp_store': 2})
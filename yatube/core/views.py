@@ -1,5 +1,10 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from .metrics import registry
+from .profiling import profiler
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -7,3 +12,27 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403_csrf.html')
+
+
+def internal(request, enabled):
+    if (not enabled or request.META.get('REMOTE_ADDR')
+            not in settings.METRICS_ALLOWED_IPS):
+        raise Http404
+
+
+def metrics(request):
+    """Метрики в формате Prometheus, только с адресов METRICS_ALLOWED_IPS"""
+    internal(request, settings.METRICS_ENABLED)
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4; '
+                                     'charset=utf-8')
+
+
+def template_profile(request):
+    """Профиль шаблонов: таблица или collapsed stacks (?format=collapsed)"""
+    internal(request, settings.TEMPLATE_PROFILING)
+    if request.GET.get('format') == 'collapsed':
+        body = profiler.collapsed()
+    else:
+        body = profiler.table()
+    return HttpResponse(body, content_type='text/plain; charset=utf-8')
@@ -0,0 +1,112 @@
+import logging
+import os
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template import TemplateSyntaxError, engines
+from django.urls import NoReverseMatch, URLResolver, get_resolver, reverse
+from django.utils import formats, translation
+
+logger = logging.getLogger(__name__)
+
+
+def template_dirs(engine):
+    """Каталоги, в которых ищут шаблоны загрузчики движка"""
+    dirs = []
+    for loader in engine.template_loaders:
+        for inner in getattr(loader, 'loaders', [loader]):
+            for directory in inner.get_dirs():
+                if directory not in dirs:
+                    dirs.append(directory)
+    return dirs
+
+
+def compile_templates():
+    """Компилирует все шаблоны движков Django
+
+    С кеширующим загрузчиком скомпилированные шаблоны остаются в нём до
+    конца жизни процесса. Имя ищется обычным порядком загрузчиков, поэтому
+    переопределённый шаблон компилируется в том виде, в каком его
+    отдаст get_template(). Возвращает число шаблонов и список имён,
+    которые не компилируются.
+    """
+    compiled = 0
+    failed = []
+    for backend in engines.all():
+        engine = getattr(backend, 'engine', None)
+        if engine is None:
+            continue
+        for directory in template_dirs(engine):
+            for root, _, files in os.walk(directory):
+                for file in files:
+                    name = os.path.relpath(os.path.join(root, file),
+                                           directory).replace(os.sep, '/')
+                    try:
+                        engine.get_template(name)
+                    except (TemplateSyntaxError, UnicodeDecodeError):
+                        failed.append(name)
+                    else:
+                        compiled += 1
+    return compiled, failed
+
+
+def url_names(resolver, namespace=''):
+    """Полные имена маршрутов, попутно компилирует их выражения"""
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            prefix = namespace
+            if pattern.namespace:
+                prefix += pattern.namespace + ':'
+            yield from url_names(pattern, prefix)
+        elif pattern.name:
+            yield namespace + pattern.name
+
+
+def resolve_urls():
+    """Импортирует все URLconf и view и собирает таблицы reverse()
+
+    Таблицы reverse() у каждого пространства имён свои и собираются при
+    первом обращении к нему, поэтому каждое имя разрешается по разу;
+    NoReverseMatch для маршрутов с аргументами ожидаем. Запросы работают
+    с резолвером, закешированным под именем ROOT_URLCONF, а не под None,
+    поэтому urlconf передаётся явно. Возвращает число именованных
+    маршрутов.
+    """
+    urlconf = settings.ROOT_URLCONF
+    names = set(url_names(get_resolver(urlconf)))
+    for name in names:
+        try:
+            reverse(name, urlconf=urlconf)
+        except NoReverseMatch:
+            pass
+    return len(names)
+
+
+def warmup():
+    """Готовит процесс к первым запросам
+
+    Всё, что Django иначе делает лениво на первых запросах: импорт
+    URLconf и view, компиляция маршрутов и шаблонов, загрузка каталогов
+    переводов и форматов локали, импорт бэкендов кеша и сессий.
+    """
+    started = time.perf_counter()
+    urls = resolve_urls()
+    templates, failed = compile_templates()
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('')
+        formats.get_format('DATETIME_FORMAT')
+    for alias in settings.CACHES:
+        caches[alias]
+    import_module(settings.SESSION_ENGINE)
+    stats = {
+        'urls': urls,
+        'templates': templates,
+        'failed': failed,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    if failed:
+        logger.warning('Не компилируются шаблоны: %s', ', '.join(failed))
+    return stats
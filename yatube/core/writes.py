@@ -0,0 +1,233 @@
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import (IntegrityError, OperationalError, connection,
+                       transaction)
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def is_lock_error(error):
+    """"database is locked" и "database table is locked" от SQLite"""
+    return isinstance(error, OperationalError) and 'is locked' in str(error)
+
+
+@contextmanager
+def immediate():
+    """Транзакция, сразу берущая блокировку записи (BEGIN IMMEDIATE)
+
+    На бэкенде core.backends.sqlite3; на остальных — обычный atomic().
+    """
+    previous = getattr(connection, 'begin_immediate', None)
+    if previous is not None:
+        connection.begin_immediate = True
+    try:
+        with transaction.atomic():
+            if previous is not None:
+                connection.begin_immediate = previous
+            yield
+    finally:
+        if previous is not None:
+            connection.begin_immediate = previous
+
+
+class Job:
+    __slots__ = ('func', 'args', 'kwargs', 'batch', 'stats', 'hooks',
+                 'future')
+
+    def __init__(self, func, args, kwargs, batch):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.batch = batch
+        self.stats = None
+        self.hooks = []
+        self.future = Future()
+
+    def run(self):
+        """Выполняет запись в точке сохранения; ошибка, кроме блокировки,
+        откатывает только эту запись
+
+        Функции transaction.on_commit этой записи забираются из
+        соединения: их выполняет вызывающий поток в result().
+        """
+        hooks = len(connection.run_on_commit)
+        try:
+            with ExitStack() as stack:
+                if self.stats is not None:
+                    stack.enter_context(
+                        connection.execute_wrapper(self.stats)
+                    )
+                with transaction.atomic():
+                    value = self.func(*self.args, **self.kwargs)
+        except Exception as error:
+            if is_lock_error(error):
+                raise
+            return False, error
+        finally:
+            # Функции откаченной точки сохранения Django уже убрал
+            self.hooks = [func for _, func
+                          in connection.run_on_commit[hooks:]]
+            del connection.run_on_commit[hooks:]
+        return True, value
+
+    def result(self, timeout=None):
+        """Результат записи; после него — её функции on_commit
+
+        Запись к этому моменту уже зафиксирована, поэтому ошибка в
+        функции on_commit только пишется в лог.
+        """
+        value = self.future.result(timeout)
+        hooks, self.hooks = self.hooks, []
+        for func in hooks:
+            try:
+                func()
+            except Exception:
+                logger.exception('Ошибка в on_commit после записи')
+        return value
+
+
+class Writer:
+    """Поток, через который идут все транзакции записи процесса
+
+    SQLite допускает одного пишущего, поэтому потоки процесса не
+    соревнуются за блокировку, а ставят записи в очередь. Писатель
+    начинает транзакцию с BEGIN IMMEDIATE и, если БД занята другим
+    процессом, повторяет её WRITE_RETRIES раз с экспоненциальной
+    задержкой со случайным разбросом. Мелкие записи (batch=True),
+    накопившиеся в очереди, пока шла предыдущая транзакция, фиксируются
+    одной транзакцией, до GROUP_COMMIT_SIZE штук: каждая в своей точке
+    сохранения, так что ошибка одной не отменяет остальные. Внешние
+    ключи SQLite проверяет только при COMMIT: если он не прошёл, записи
+    пачки повторяются по одной. Функции
+    transaction.on_commit записей выполняют ждущие их потоки, а не
+    писатель: тяжёлая работа в них не задерживает чужие записи.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.thread = None
+        self.queue = None
+        self.pending = None
+        self.stats = {'transactions': 0, 'writes': 0, 'retries': 0}
+
+    def submit(self, func, args, kwargs, batch):
+        job = Job(func, args, kwargs, batch)
+        # Запросы записи учитываются в метриках запроса, который её ждёт
+        job.stats = metrics.current()
+        with self.lock:
+            # После fork потока-писателя в дочернем процессе нет
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.queue = queue.Queue()
+                self.pending = None
+                self.thread = None
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.loop, args=(self.queue,),
+                    name='db-writer', daemon=True
+                )
+                self.thread.start()
+            self.queue.put(job)
+        return job
+
+    def loop(self, jobs):
+        while True:
+            batch = self.next_batch(jobs)
+            try:
+                connection.close_if_unusable_or_obsolete()
+            except Exception:
+                logger.exception('Не удалось закрыть соединение писателя')
+            self.commit(batch)
+
+    def next_batch(self, jobs):
+        job = self.pending or jobs.get()
+        self.pending = None
+        batch = [job]
+        while job.batch and len(batch) < settings.GROUP_COMMIT_SIZE:
+            try:
+                job = jobs.get_nowait()
+            except queue.Empty:
+                break
+            if not job.batch:
+                self.pending = job
+                break
+            batch.append(job)
+        return batch
+
+    def commit(self, batch):
+        """Фиксирует batch одной транзакцией и отдаёт результаты"""
+        results = self.attempt(batch)
+        for job, (ok, value) in zip(batch, results):
+            if ok:
+                job.future.set_result(value)
+            else:
+                job.future.set_exception(value)
+
+    def attempt(self, batch):
+        try:
+            return self.run(batch)
+        except Exception as error:
+            for job in batch:
+                job.hooks = []
+            # Нарушение отложенного внешнего ключа одной записи отменяет
+            # всю транзакцию, поэтому остальные записи фиксируются отдельно
+            if isinstance(error, IntegrityError) and len(batch) > 1:
+                return [self.attempt([job])[0] for job in batch]
+            return [(False, error)] * len(batch)
+
+    def run(self, batch):
+        for attempt in range(settings.WRITE_RETRIES + 1):
+            try:
+                with immediate():
+                    results = [job.run() for job in batch]
+            except OperationalError as error:
+                if (not is_lock_error(error)
+                        or attempt == settings.WRITE_RETRIES):
+                    raise
+                with self.lock:
+                    self.stats['retries'] += 1
+                time.sleep(random.uniform(
+                    0, settings.WRITE_RETRY_DELAY * 2 ** attempt
+                ))
+            else:
+                with self.lock:
+                    self.stats['transactions'] += 1
+                    self.stats['writes'] += len(batch)
+                return results
+
+
+writer = Writer()
+
+
+def write(func, *args, batch=False, **kwargs):
+    """Выполняет func(*args, **kwargs) в транзакции записи
+
+    Возвращает результат func или поднимает её исключение. batch=True —
+    мелкая запись, которую можно зафиксировать вместе с соседними по
+    очереди. Внутри уже открытой транзакции func выполняется в ней же:
+    часть чужой транзакции нельзя передать в другой поток. При
+    WRITE_QUEUE_ENABLED = False транзакция с повторами выполняется в
+    вызывающем потоке. Если писатель не ответил за WRITE_TIMEOUT секунд,
+    поднимается concurrent.futures.TimeoutError; запись из очереди при
+    этом не снимается.
+    """
+    if connection.in_atomic_block:
+        return func(*args, **kwargs)
+    if not settings.WRITE_QUEUE_ENABLED:
+        job = Job(func, args, kwargs, batch)
+        writer.commit([job])
+        return job.result()
+    return writer.submit(func, args, kwargs, batch).result(
+        settings.WRITE_TIMEOUT
+    )
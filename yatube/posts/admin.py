@@ -1,6 +1,22 @@
 from django.contrib import admin
 
-from .models import Group, Post, Comment, Follow
+from .export import export_response
+from .models import Group, Post, Comment, Follow, ImageBlob, Profile
+from .search import fts_available, fts_query, matching_ids
+
+
+def export_jsonl(modeladmin, request, queryset):
+    return export_response(queryset, 'jsonl')
+
+
+export_jsonl.short_description = 'Выгрузить в JSONL'
+
+
+def export_csv(modeladmin, request, queryset):
+    return export_response(queryset, 'csv')
+
+
+export_csv.short_description = 'Выгрузить в CSV'
 
 
 @admin.register(Post)
@@ -10,12 +26,24 @@ class PostAdmin(admin.ModelAdmin):
                     'pub_date',
                     'author',
                     'group',
-                    'image'
+                    'image',
+                    'image_original_size',
+                    'image_size'
                     )
     list_editable = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    actions = (export_jsonl, export_csv)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по индексу FTS5 вместо LIKE '%...%' по всей таблице"""
+        if not fts_available():
+            return super().get_search_results(request, queryset,
+                                              search_term)
+        if fts_query(search_term) is None:
+            return queryset, False
+        return queryset.filter(pk__in=matching_ids(search_term)), False
 
 
 @admin.register(Group)
@@ -28,6 +56,7 @@ class GroupAdmin(admin.ModelAdmin):
     search_fields = ('description',)
     list_filter = ('title',)
     empty_value_display = '-пусто-'
+    actions = (export_jsonl, export_csv)
 
 
 @admin.register(Comment)
@@ -42,6 +71,7 @@ class CommentAdmin(admin.ModelAdmin):
     search_fields = ('author',)
     list_filter = ('post',)
     empty_value_display = '-пусто-'
+    actions = (export_jsonl, export_csv)
 
 
 @admin.register(Follow)
@@ -54,3 +84,29 @@ class FollowAdmin(admin.ModelAdmin):
         'user',
     )
     empty_value_display = '-пусто-'
+    actions = (export_jsonl, export_csv)
+
+
+@admin.register(Profile)
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        'user',
+        'posts_count',
+        'followers_count',
+        'following_count'
+    )
+    search_fields = (
+        'user__username',
+    )
+    empty_value_display = '-пусто-'
+
+
+@admin.register(ImageBlob)
+class ImageBlobAdmin(admin.ModelAdmin):
+    list_display = (
+        'name',
+        'refcount'
+    )
+    search_fields = (
+        'name',
+    )
@@ -0,0 +1,336 @@
+import csv
+import io
+import json
+import sys
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_slug
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import bump_generation
+from .counters import reconcile_comments, reconcile_profiles
+from .feeds import (author_feed_key, chunked, rebuild_inboxes,
+                    sync_pull_authors)
+from .models import Comment, Follow, Group, Post
+from .utils import pk_chunks
+
+User = get_user_model()
+
+# Столько параметров SQLite принимает в одном запросе (SQLITE_MAX_VARIABLE_
+# NUMBER в старых сборках), поэтому IN (...) и пересчёты идут такими пачками.
+LOOKUP_CHUNK_SIZE = 500
+
+
+def read_records(stream, format_):
+    """Построчно читает записи JSONL или CSV: (номер строки, dict)"""
+    if format_ == 'jsonl':
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                yield number, line
+    elif format_ == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), 1):
+            yield number, row
+    else:
+        raise ValueError(f'Неизвестный формат {format_}')
+
+
+def parse_record(raw):
+    if isinstance(raw, dict):
+        return {key: value for key, value in raw.items() if value != ''}
+    record = json.loads(raw)
+    if not isinstance(record, dict):
+        raise ValueError('запись должна быть объектом')
+    return record
+
+
+def open_text(path):
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+    return open(path, encoding='utf-8', newline='')
+
+
+class IdMap:
+    """Кеш «естественный ключ -> pk» с вытеснением самых старых ключей
+
+    Недостающие ключи пачки загружаются одним запросом на каждые
+    LOOKUP_CHUNK_SIZE ключей.
+    """
+
+    def __init__(self, queryset, field, max_size=100000):
+        self.queryset = queryset
+        self.field = field
+        self.max_size = max_size
+        self.ids = OrderedDict()
+
+    def load(self, keys):
+        missing = {key for key in keys if key not in self.ids}
+        for chunk in chunked(sorted(missing), LOOKUP_CHUNK_SIZE):
+            found = self.queryset.filter(
+                **{f'{self.field}__in': chunk}
+            ).values_list(self.field, 'pk')
+            self.add(found)
+
+    def add(self, pairs):
+        for key, pk in pairs:
+            self.ids[key] = pk
+            self.ids.move_to_end(key)
+        while len(self.ids) > self.max_size:
+            self.ids.popitem(last=False)
+
+    def get(self, key):
+        return self.ids.get(key)
+
+
+@contextmanager
+def explicit_dates(model, *field_names):
+    """Отключает auto_now_add, чтобы bulk_create сохранил даты из файла"""
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, saved):
+            field.auto_now_add = value
+
+
+def parse_date(value, now):
+    if value is None:
+        return now
+    date = parse_datetime(str(value))
+    if date is None:
+        raise ValueError(f'некорректная дата {value!r}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+def require(record, *fields):
+    for field in fields:
+        if not record.get(field):
+            raise ValueError(f'нет поля {field}')
+
+
+class Importer:
+    """Импорт одной модели: разбор пачки записей и запись в БД"""
+    model = None
+    dates = ()
+    ignore_conflicts = False
+
+    def __init__(self, create_users=False):
+        self.create_users = create_users
+        self.users = IdMap(User.objects, 'username')
+        self.touched_users = set()
+        self.touched_posts = set()
+        self.readers = set()
+
+    def resolve(self, records):
+        """Заполняет id-карты для ключей всей пачки"""
+
+    def build(self, record, now):
+        """Объект модели по записи или ValueError"""
+        raise NotImplementedError
+
+    def resolve_users(self, usernames):
+        usernames = {str(name) for name in usernames if name}
+        self.users.load(usernames)
+        missing = [name for name in usernames if self.users.get(name) is None]
+        if missing and self.create_users:
+            password = make_password(None)
+            User.objects.bulk_create(
+                [User(username=name, password=password) for name in missing],
+                batch_size=self.batch_size(User, 1),
+                ignore_conflicts=True,
+            )
+            self.users.load(missing)
+            self.touched_users.update(
+                self.users.get(name) for name in missing
+            )
+
+    def user_id(self, username):
+        user_id = self.users.get(str(username))
+        if user_id is None:
+            raise ValueError(f'нет пользователя {username!r}')
+        return user_id
+
+    @staticmethod
+    def batch_size(model, requested):
+        """batch_size для bulk_create не больше лимита параметров СУБД"""
+        fields = [field for field in model._meta.concrete_fields]
+        limit = connection.ops.bulk_batch_size(fields, [None] * requested)
+        return max(1, min(requested, limit))
+
+    def save(self, objects, batch_size):
+        self.model.objects.bulk_create(
+            objects,
+            batch_size=self.batch_size(self.model, batch_size),
+            ignore_conflicts=self.ignore_conflicts,
+        )
+        self.touch(objects)
+
+    def touch(self, objects):
+        """Запоминает, чьи производные данные нужно пересчитать"""
+
+
+class GroupImporter(Importer):
+    model = Group
+    ignore_conflicts = True
+
+    def build(self, record, now):
+        require(record, 'slug', 'title')
+        try:
+            validate_slug(record['slug'])
+        except ValidationError:
+            raise ValueError(f'некорректный slug {record["slug"]!r}')
+        if len(record['title']) > Group._meta.get_field('title').max_length:
+            raise ValueError('слишком длинное название')
+        return Group(slug=record['slug'], title=record['title'],
+                     description=record.get('description', ''))
+
+
+class PostImporter(Importer):
+    model = Post
+    dates = ('pub_date',)
+    ignore_conflicts = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.groups = IdMap(Group.objects, 'slug')
+
+    def resolve(self, records):
+        self.resolve_users(record.get('author') for record in records)
+        self.groups.load({record['group'] for record in records
+                          if record.get('group')})
+
+    def build(self, record, now):
+        require(record, 'author', 'text')
+        group_id = None
+        if record.get('group'):
+            group_id = self.groups.get(record['group'])
+            if group_id is None:
+                raise ValueError(f'нет группы {record["group"]!r}')
+        return Post(pk=record.get('id'),
+                    author_id=self.user_id(record['author']),
+                    group_id=group_id,
+                    text=record['text'],
+                    pub_date=parse_date(record.get('pub_date'), now))
+
+    def touch(self, objects):
+        self.touched_users.update(post.author_id for post in objects)
+
+
+class CommentImporter(Importer):
+    model = Comment
+    dates = ('created',)
+    ignore_conflicts = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.posts = IdMap(Post.objects, 'pk')
+
+    def resolve(self, records):
+        self.resolve_users(record.get('author') for record in records)
+        post_ids = set()
+        for record in records:
+            try:
+                post_ids.add(int(record.get('post')))
+            except (TypeError, ValueError):
+                pass
+        self.posts.load(post_ids)
+
+    def build(self, record, now):
+        require(record, 'post', 'author', 'text')
+        try:
+            post_id = self.posts.get(int(record['post']))
+        except (TypeError, ValueError):
+            post_id = None
+        if post_id is None:
+            raise ValueError(f'нет поста {record["post"]!r}')
+        return Comment(pk=record.get('id'),
+                       post_id=post_id,
+                       author_id=self.user_id(record['author']),
+                       text=record['text'],
+                       created=parse_date(record.get('created'), now))
+
+    def touch(self, objects):
+        self.touched_posts.update(comment.post_id for comment in objects)
+
+
+class FollowImporter(Importer):
+    model = Follow
+    ignore_conflicts = True
+
+    def resolve(self, records):
+        self.resolve_users(
+            name for record in records
+            for name in (record.get('user'), record.get('author'))
+        )
+
+    def build(self, record, now):
+        require(record, 'user', 'author')
+        user_id = self.user_id(record['user'])
+        author_id = self.user_id(record['author'])
+        if user_id == author_id:
+            raise ValueError('подписка на самого себя')
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def touch(self, objects):
+        for follow in objects:
+            self.touched_users.update((follow.user_id, follow.author_id))
+            self.readers.add(follow.user_id)
+
+
+IMPORTERS = {
+    'groups': GroupImporter,
+    'posts': PostImporter,
+    'comments': CommentImporter,
+    'follows': FollowImporter,
+}
+
+
+def refresh_derived(importer=None, full=False, inboxes=True):
+    """Пересчитывает то, что bulk_create обошёл мимо сигналов
+
+    Счётчики профилей и комментариев, ленты подписок, кеши авторов и
+    поколения кеша. При full пересчитывается всё, а не только затронутое
+    текущим запуском (нужно после возобновления прерванного импорта).
+    Без inboxes ленты подписок не пересобираются.
+    """
+    if full:
+        users = list(User.objects.values_list('pk', flat=True))
+        posts = (pk for chunk in pk_chunks(Post.objects.all(),
+                                           LOOKUP_CHUNK_SIZE)
+                 for pk in chunk)
+        readers = set()
+        if inboxes:
+            readers.update(Follow.objects.values_list('user_id', flat=True))
+    else:
+        users = importer.touched_users
+        posts = importer.touched_posts
+        readers = set(importer.readers) if inboxes else set()
+        if inboxes and isinstance(importer, PostImporter):
+            for chunk in chunked(sorted(users), LOOKUP_CHUNK_SIZE):
+                readers.update(Follow.objects.filter(
+                    author_id__in=chunk
+                ).values_list('user_id', flat=True))
+    for chunk in chunked(sorted(users), LOOKUP_CHUNK_SIZE):
+        with transaction.atomic():
+            reconcile_profiles(chunk)
+        cache.delete_many([author_feed_key(user_id) for user_id in chunk])
+    for chunk in chunked(posts, LOOKUP_CHUNK_SIZE):
+        with transaction.atomic():
+            reconcile_comments(chunk)
+    for chunk in chunked(sorted(readers), LOOKUP_CHUNK_SIZE):
+        with transaction.atomic():
+            rebuild_inboxes(chunk)
+    sync_pull_authors(backfill=inboxes)
+    for name in ('users', 'groups', 'posts', 'comments'):
+        bump_generation(name)
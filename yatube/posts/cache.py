@@ -0,0 +1,107 @@
+import time
+
+from django.core.cache import cache
+
+
+def generation_key(name):
+    return f'generation:{name}'
+
+
+def get_generation(name):
+    """Текущее поколение данных name для версионирования ключей кеша"""
+    key = generation_key(name)
+    generation = cache.get(key)
+    if generation is None:
+        # Начинаем со времени, а не с 1: после вытеснения ключа поколение
+        # не должно совпасть с одним из уже использованных.
+        cache.add(key, int(time.time() * 1000), None)
+        generation = cache.get(key)
+    return generation
+
+
+def modified_key(name):
+    return f'generation:{name}:modified'
+
+
+def bump_generation(name):
+    """Делает устаревшими все ключи, построенные на поколении name"""
+    try:
+        cache.incr(generation_key(name))
+    except ValueError:
+        get_generation(name)
+    cache.set(modified_key(name), time.time(), None)
+
+
+def last_modified(names):
+    """Время последней записи данных names (unix time)"""
+    keys = [modified_key(name) for name in names]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, time.time(), None)
+            values[key] = cache.get(key)
+    return max(values.values())
+
+
+FRAGMENT_GENERATIONS = ('posts', 'groups', 'users', 'thumbnails')
+
+FRAGMENTS = ('index_page', 'group_page', 'profile_page')
+
+
+def generations(names=FRAGMENT_GENERATIONS):
+    """Поколения нескольких видов данных за одно обращение к кешу"""
+    keys = [generation_key(name) for name in names]
+    values = cache.get_many(keys)
+    return tuple(
+        values[key] if key in values else get_generation(name)
+        for key, name in zip(keys, names)
+    )
+
+
+def incr(key, delta=1):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key, delta)
+
+
+def record_fragment(name, hit):
+    """Учитывает попадание или промах кеша фрагмента name"""
+    incr(f'fragment:{name}:{"hits" if hit else "misses"}')
+
+
+def fragment_stats(names=FRAGMENTS):
+    """{фрагмент: (попадания, промахи)}"""
+    keys = {name: (f'fragment:{name}:hits', f'fragment:{name}:misses')
+            for name in names}
+    values = cache.get_many([key for pair in keys.values() for key in pair])
+    return {name: (values.get(hits, 0), values.get(misses, 0))
+            for name, (hits, misses) in keys.items()}
+
+
+def reset_fragment_stats(names=FRAGMENTS):
+    cache.delete_many([f'fragment:{name}:{kind}'
+                       for name in names for kind in ('hits', 'misses')])
+
+
+THUMBNAIL_STATS = ('lookups', 'hits', 'misses', 'microseconds')
+
+
+def record_thumbnails(hits, misses, seconds):
+    """Учитывает один пакетный поиск миниатюр страницы"""
+    values = (1, hits, misses, int(seconds * 1_000_000))
+    for kind, value in zip(THUMBNAIL_STATS, values):
+        if value:
+            incr(f'thumbnails:{kind}', value)
+
+
+def thumbnail_stats():
+    """{'lookups', 'hits', 'misses', 'microseconds'}"""
+    keys = {kind: f'thumbnails:{kind}' for kind in THUMBNAIL_STATS}
+    values = cache.get_many(keys.values())
+    return {kind: values.get(key, 0) for kind, key in keys.items()}
+
+
+def reset_thumbnail_stats():
+    cache.delete_many([f'thumbnails:{kind}' for kind in THUMBNAIL_STATS])
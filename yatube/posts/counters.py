@@ -0,0 +1,86 @@
+from django.db.models import Count, F
+
+from .models import Comment, Follow, Post, Profile
+
+PROFILE_COUNTERS = ('posts_count', 'followers_count', 'following_count')
+
+
+def grouped_counts(queryset, field, ids):
+    """{id: число строк} для строк queryset с field из ids"""
+    return dict(
+        queryset.filter(**{f'{field}__in': ids})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values_list(field, 'total')
+    )
+
+
+def profile_counts(user_ids):
+    """Фактические значения счётчиков профилей по данным БД"""
+    posts = grouped_counts(Post.objects, 'author_id', user_ids)
+    followers = grouped_counts(Follow.objects, 'author_id', user_ids)
+    following = grouped_counts(Follow.objects, 'user_id', user_ids)
+    return {
+        user_id: {
+            'posts_count': posts.get(user_id, 0),
+            'followers_count': followers.get(user_id, 0),
+            'following_count': following.get(user_id, 0),
+        }
+        for user_id in user_ids
+    }
+
+
+def change_profile(user_id, field, delta):
+    """Атомарно изменяет счётчик профиля на delta
+
+    Если профиля ещё нет, он создаётся с пересчитанными значениями. При
+    уменьшении отсутствующий профиль не создаётся: так бывает, когда
+    пользователь удаляется вместе со своими постами и подписками.
+    """
+    updated = Profile.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta}
+    )
+    if not updated and delta > 0:
+        counts = profile_counts([user_id])[user_id]
+        Profile.objects.get_or_create(user_id=user_id, defaults=counts)
+
+
+def change_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def reconcile_profiles(user_ids):
+    """Исправляет расхождения счётчиков профилей, возвращает их число"""
+    actual = profile_counts(user_ids)
+    profiles = Profile.objects.in_bulk(user_ids, field_name='user_id')
+    fixed = 0
+    for user_id, counts in actual.items():
+        profile = profiles.get(user_id)
+        if profile is None:
+            Profile.objects.create(user_id=user_id, **counts)
+        elif any(getattr(profile, field) != counts[field]
+                 for field in PROFILE_COUNTERS):
+            Profile.objects.filter(pk=profile.pk).update(**counts)
+        else:
+            continue
+        fixed += 1
+    return fixed
+
+
+def reconcile_comments(post_ids):
+    """Исправляет расхождения счётчиков комментариев, возвращает их число"""
+    actual = grouped_counts(Comment.objects, 'post_id', post_ids)
+    stored = Post.objects.filter(pk__in=post_ids).values_list(
+        'pk', 'comments_count'
+    )
+    fixed = 0
+    for post_id, comments_count in stored:
+        if comments_count != actual.get(post_id, 0):
+            Post.objects.filter(pk=post_id).update(
+                comments_count=actual.get(post_id, 0)
+            )
+            fixed += 1
+    return fixed
@@ -0,0 +1,181 @@
+import csv
+import gzip
+import json
+import os
+import time
+
+from django.db import connections
+from django.http import StreamingHttpResponse
+from django.db.models import Max, Min
+
+from .models import Comment, Follow, Group, Post
+
+# Поля выгрузки: имя в файле -> путь для values_list. Имена совпадают с
+# теми, что ждёт import_data, поэтому выгрузку можно загрузить обратно.
+EXPORTS = {
+    'groups': (Group, {
+        'id': 'pk',
+        'slug': 'slug',
+        'title': 'title',
+        'description': 'description',
+    }),
+    'posts': (Post, {
+        'id': 'pk',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'image': 'image',
+    }),
+    'comments': (Comment, {
+        'id': 'pk',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }),
+    'follows': (Follow, {
+        'id': 'pk',
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+}
+
+FORMATS = ('jsonl', 'csv')
+
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Псевдофайл для csv.writer: writerow возвращает готовую строку"""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(kind, queryset=None, pk_range=None, chunk_size=CHUNK_SIZE):
+    """Строки выгрузки kind пачками по pk, без долгого курсора и OFFSET
+
+    В памяти одновременно держится не больше chunk_size строк.
+    """
+    model, fields = EXPORTS[kind]
+    if queryset is None:
+        queryset = model.objects.all()
+    queryset = queryset.order_by('pk')
+    if pk_range is not None:
+        queryset = queryset.filter(pk__range=pk_range)
+    columns = list(fields.values())
+    last_pk = None
+    while True:
+        chunk = queryset
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        chunk = list(chunk.values_list(*columns)[:chunk_size])
+        if not chunk:
+            return
+        yield from chunk
+        last_pk = chunk[-1][0]
+
+
+def to_text(value):
+    if value is None:
+        return None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, (int, str)):
+        return value
+    return str(value)
+
+
+def export_lines(kind, format_, rows, header=True):
+    """Строки файла выгрузки: JSONL или CSV с заголовком"""
+    names = list(EXPORTS[kind][1])
+    if format_ == 'jsonl':
+        for row in rows:
+            record = dict(zip(names, map(to_text, row)))
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+    elif format_ == 'csv':
+        writer = csv.writer(Echo())
+        if header:
+            yield writer.writerow(names)
+        for row in rows:
+            yield writer.writerow(
+                ['' if value is None else to_text(value) for value in row]
+            )
+    else:
+        raise ValueError(f'Неизвестный формат {format_}')
+
+
+def kind_for(model):
+    return next(kind for kind, (exported, _) in EXPORTS.items()
+                if exported is model)
+
+
+def export_response(queryset, format_):
+    """Потоковый ответ с выгрузкой queryset, для действий админки"""
+    kind = kind_for(queryset.model)
+    lines = export_lines(kind, format_, export_rows(kind, queryset))
+    response = StreamingHttpResponse(
+        (line.encode('utf-8') for line in lines),
+        content_type=CONTENT_TYPES[format_],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{kind}.{format_}"'
+    )
+    return response
+
+
+def shard_ranges(kind, shards):
+    """Делит диапазон pk модели на shards смежных отрезков"""
+    model = EXPORTS[kind][0]
+    bounds = model.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return [None]
+    low, high = bounds['low'], bounds['high']
+    shards = max(1, min(shards, high - low + 1))
+    step = (high - low + 1) / shards
+    edges = [low + round(step * num) for num in range(shards)] + [high + 1]
+    return [(start, end - 1) for start, end in zip(edges, edges[1:])]
+
+
+def shard_path(path, number, shards):
+    if shards == 1:
+        return path
+    directory, name = os.path.split(path)
+    base, dot, extension = name.partition('.')
+    name = f'{base}-{number + 1:05d}-of-{shards:05d}{dot}{extension}'
+    return os.path.join(directory, name)
+
+
+def open_output(path, compress):
+    if compress:
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def export_file(kind, format_, path, compress=False, pk_range=None,
+                chunk_size=CHUNK_SIZE):
+    """Пишет выгрузку в файл, возвращает (строк, секунд)"""
+    started = time.perf_counter()
+    count = 0
+    rows = export_rows(kind, pk_range=pk_range, chunk_size=chunk_size)
+    with open_output(path, compress) as output:
+        for line in export_lines(kind, format_, rows):
+            output.write(line)
+            count += 1
+    if format_ == 'csv':
+        count -= 1
+    return count, time.perf_counter() - started
+
+
+def export_shard(*args, **kwargs):
+    """Задача процесса пула: своё соединение с БД на процесс"""
+    try:
+        return export_file(*args, **kwargs)
+    finally:
+        connections.close_all()
@@ -0,0 +1,414 @@
+import heapq
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.db.models import Count
+from django.utils.functional import cached_property
+
+from core.writes import write
+
+from .models import Follow, Inbox, Post, Profile
+
+_executor = None
+
+
+def chunked(iterable, size):
+    """Разбивает итерируемый объект на списки длиной size"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def trim_inbox(user_id):
+    """Удаляет из ленты записи сверх FEED_INBOX_LIMIT"""
+    stale = list(
+        Inbox.objects.filter(user_id=user_id)
+        .order_by('-pub_date', '-post_id')
+        .values_list('pk', flat=True)[settings.FEED_INBOX_LIMIT:]
+    )
+    if stale:
+        Inbox.objects.filter(pk__in=stale).delete()
+
+
+def trim_inboxes(user_ids):
+    """Обрезает ленты тех пользователей, у кого превышен лимит"""
+    overflowing = (
+        Inbox.objects.filter(user_id__in=user_ids)
+        .order_by()
+        .values('user_id')
+        .annotate(size=Count('pk'))
+        .filter(size__gt=settings.FEED_INBOX_LIMIT)
+        .values_list('user_id', flat=True)
+    )
+    for user_id in overflowing:
+        trim_inbox(user_id)
+
+
+def author_feed_key(author_id):
+    return f'feed:author:{author_id}'
+
+
+def pull_authors_key():
+    return 'feed:pull_authors'
+
+
+def pull_author_ids():
+    """Авторы, чьи посты не рассылаются по лентам, а подтягиваются при
+    чтении (Profile.pull_author, см. followers_changed)"""
+    author_ids = cache.get(pull_authors_key())
+    if author_ids is None:
+        author_ids = set(
+            Profile.objects.filter(pull_author=True)
+            .values_list('user_id', flat=True)
+        )
+        cache.set(pull_authors_key(), author_ids,
+                  settings.FEED_CACHE_TIMEOUT)
+    return author_ids
+
+
+def demote_limit():
+    """Число подписчиков, ниже которого pull-автор снова рассылает посты
+
+    Порог ниже FEED_FANOUT_FOLLOWER_LIMIT на FEED_FANOUT_HYSTERESIS, чтобы
+    автор, чьё число подписчиков колеблется у порога, не переключался
+    туда и обратно на каждой подписке.
+    """
+    return (settings.FEED_FANOUT_FOLLOWER_LIMIT
+            * (1 - settings.FEED_FANOUT_HYSTERESIS))
+
+
+def followers_changed(author_id, created):
+    """Переключает автора между рассылкой и слиянием при чтении
+
+    Автор становится pull-автором, набрав FEED_FANOUT_FOLLOWER_LIMIT
+    подписчиков, и перестаёт им быть ниже demote_limit(). Пока он был
+    pull-автором, его посты не рассылались, поэтому после понижения они
+    дописываются в ленты подписчиков в фоне (schedule_author_backfill).
+    """
+    profiles = Profile.objects.filter(user_id=author_id)
+    if created:
+        changed = profiles.filter(
+            pull_author=False,
+            followers_count__gte=settings.FEED_FANOUT_FOLLOWER_LIMIT
+        ).update(pull_author=True)
+    else:
+        changed = profiles.filter(
+            pull_author=True, followers_count__lt=demote_limit()
+        ).update(pull_author=False)
+    if changed:
+        cache.delete(pull_authors_key())
+        if not created:
+            schedule_author_backfill(author_id)
+
+
+def sync_pull_authors(backfill=True):
+    """Выставляет Profile.pull_author по порогам для всех профилей
+
+    Нужно после массовой правки счётчиков мимо сигналов. Посты
+    пониженных авторов ещё не разосланы: при backfill они сразу
+    дописываются в ленты подписчиков.
+    """
+    Profile.objects.filter(
+        pull_author=False,
+        followers_count__gte=settings.FEED_FANOUT_FOLLOWER_LIMIT
+    ).update(pull_author=True)
+    demoted = list(
+        Profile.objects.filter(pull_author=True,
+                               followers_count__lt=demote_limit())
+        .values_list('user_id', flat=True)
+    )
+    Profile.objects.filter(user_id__in=demoted).update(pull_author=False)
+    cache.delete(pull_authors_key())
+    if backfill:
+        for author_id in demoted:
+            backfill_author(author_id)
+
+
+def insert_author_posts(author_id, user_ids):
+    """Один INSERT ... SELECT: FEED_AUTHOR_CACHE_SIZE последних постов
+    автора в ленту каждого из user_ids, уже лежащие строки пропускаются"""
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    sql = (
+        f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+        f'{quote(Inbox._meta.db_table)} (user_id, post_id, pub_date) '
+        f'SELECT f.user_id, p.id, p.pub_date '
+        f'FROM {quote(Follow._meta.db_table)} f, ('
+        f'SELECT id, pub_date FROM {quote(Post._meta.db_table)} '
+        f'WHERE author_id = %s ORDER BY pub_date DESC, id DESC LIMIT %s'
+        f') p WHERE f.author_id = %s AND f.user_id IN ({placeholders})'
+        f'{connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [author_id, settings.FEED_AUTHOR_CACHE_SIZE,
+                             author_id, *user_ids])
+
+
+def backfill_author(author_id):
+    """Дописывает последние посты автора в ленты всех его подписчиков
+
+    Подписчики идут пачками по FEED_FANOUT_BATCH_SIZE, каждая пачка —
+    отдельная запись через core.writes, так что между ними проходят
+    чужие записи. Лишнее сверх FEED_INBOX_LIMIT обрежет следующая
+    рассылка.
+    """
+    follower_ids = list(
+        Follow.objects.filter(author_id=author_id)
+        .values_list('user_id', flat=True)
+    )
+    for chunk in chunked(follower_ids, settings.FEED_FANOUT_BATCH_SIZE):
+        write(insert_author_posts, author_id, chunk)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1,
+                                       thread_name_prefix='feeds')
+    return _executor
+
+
+def run_in_worker(author_id):
+    """Задача фонового потока: соединения с БД потока закрываются"""
+    try:
+        backfill_author(author_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_author_backfill(author_id):
+    """Ставит backfill_author в фоновую очередь после коммита
+
+    Дописывание может занять миллионы строк, поэтому оно не выполняется
+    ни в потоке запроса, ни в транзакции потока-писателя, где идёт
+    отписка. При FEED_BACKFILL_BACKGROUND = False — сразу после коммита.
+    """
+    if not settings.FEED_BACKFILL_BACKGROUND:
+        transaction.on_commit(lambda: backfill_author(author_id))
+        return
+    transaction.on_commit(lambda: get_executor().submit(
+        run_in_worker, author_id
+    ))
+
+
+def recent_posts(author_ids):
+    """Последние посты авторов из кеша: {author_id: (count, entries)}
+
+    entries — список (pub_date, post_id) не длиннее
+    FEED_AUTHOR_CACHE_SIZE в порядке убывания даты.
+    """
+    keys = {author_feed_key(author_id): author_id
+            for author_id in author_ids}
+    cached = cache.get_many(keys)
+    lists = {keys[key]: value for key, value in cached.items()}
+    missing = [author_id for author_id in author_ids
+               if author_id not in lists]
+    if missing:
+        counts = dict(
+            Post.objects.filter(author_id__in=missing)
+            .order_by()
+            .values('author_id')
+            .annotate(posts=Count('pk'))
+            .values_list('author_id', 'posts')
+        )
+        fresh = {}
+        for author_id in missing:
+            entries = list(
+                Post.objects.filter(author_id=author_id)
+                .order_by('-pub_date', '-pk')
+                .values_list('pub_date', 'pk')
+                [:settings.FEED_AUTHOR_CACHE_SIZE]
+            )
+            lists[author_id] = (counts.get(author_id, 0), entries)
+            fresh[author_feed_key(author_id)] = lists[author_id]
+        cache.set_many(fresh, settings.FEED_CACHE_TIMEOUT)
+    return lists
+
+
+def fan_out_post(post):
+    """Записывает новый пост в ленты всех подписчиков автора
+
+    Посты pull-авторов не рассылаются: их подписчики получают их слиянием
+    при чтении ленты.
+    """
+    cache.delete(author_feed_key(post.author_id))
+    if post.author_id in pull_author_ids():
+        return
+    follower_ids = (
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+        .iterator()
+    )
+    for chunk in chunked(follower_ids, settings.FEED_FANOUT_BATCH_SIZE):
+        Inbox.objects.bulk_create(
+            [Inbox(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+             for user_id in chunk],
+            ignore_conflicts=True
+        )
+        trim_inboxes(chunk)
+
+
+def backfill_inbox(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки"""
+    if author_id in pull_author_ids():
+        return
+    recent = (
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date')
+        .values_list('pk', 'pub_date')[:settings.FEED_INBOX_LIMIT]
+    )
+    Inbox.objects.bulk_create(
+        [Inbox(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in recent],
+        ignore_conflicts=True
+    )
+    trim_inbox(user_id)
+
+
+def prune_inbox(user_id, author_id):
+    """Убирает из ленты посты автора после отписки"""
+    Inbox.objects.filter(user_id=user_id,
+                         post__author_id=author_id).delete()
+
+
+def rebuild_inbox(user_id):
+    """Полностью пересобирает ленту пользователя по его подпискам"""
+    Inbox.objects.filter(user_id=user_id).delete()
+    recent = (
+        Post.objects.filter(author__following__user_id=user_id)
+        .order_by('-pub_date')
+        .values_list('pk', 'pub_date')[:settings.FEED_INBOX_LIMIT]
+    )
+    Inbox.objects.bulk_create(
+        [Inbox(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in recent]
+    )
+
+
+class HybridFeed(Sequence):
+    """Лента подписок, собранная k-way слиянием через кучу.
+
+    Сливаются лента Inbox пользователя и закешированные списки последних
+    постов pull-авторов; за пределами закешированного окна посты
+    pull-авторов читаются из БД одним запросом.
+    """
+
+    def __init__(self, user, pull_author_ids):
+        self.user = user
+        self.pull_author_ids = list(pull_author_ids)
+
+    @cached_property
+    def author_lists(self):
+        return recent_posts(self.pull_author_ids)
+
+    @cached_property
+    def count(self):
+        # В Inbox могут остаться посты, разосланные до того, как автор
+        # стал pull-автором: они уже учтены в счётчиках его постов
+        inbox = Inbox.objects.filter(user=self.user).exclude(
+            post__author_id__in=self.pull_author_ids
+        ).count()
+        return inbox + sum(posts for posts, _ in self.author_lists.values())
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, _ = index.indices(len(self))
+            return self.get_posts(start, stop)
+        posts = self.get_posts(index, index + 1)
+        if not posts:
+            raise IndexError(index)
+        return posts[0]
+
+    def entries(self, stop):
+        """Потоки (pub_date, post_id) в порядке убывания"""
+        inbox = (
+            Inbox.objects.filter(user=self.user)
+            .order_by('-pub_date', '-post_id')
+            .values_list('pub_date', 'post_id')[:stop]
+        )
+        if stop <= settings.FEED_AUTHOR_CACHE_SIZE:
+            pulled = [entries[:stop]
+                      for _, entries in self.author_lists.values()]
+        else:
+            pulled = [
+                Post.objects.filter(author_id__in=self.pull_author_ids)
+                .order_by('-pub_date', '-pk')
+                .values_list('pub_date', 'pk')[:stop]
+            ]
+        return heapq.merge(inbox, *pulled, reverse=True)
+
+    def get_posts(self, start, stop):
+        post_ids = []
+        seen = set()
+        for _, post_id in self.entries(stop):
+            if post_id in seen:
+                continue
+            seen.add(post_id)
+            post_ids.append(post_id)
+            if len(post_ids) == stop:
+                break
+        post_ids = post_ids[start:stop]
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            post_ids
+        )
+        return [posts[pk] for pk in post_ids if pk in posts]
+
+
+def follow_feed(user):
+    """Лента подписок пользователя
+
+    Без pull-авторов это одно чтение диапазона индекса Inbox, иначе —
+    слияние Inbox с постами pull-авторов (HybridFeed).
+    """
+    pull_ids = pull_author_ids()
+    if pull_ids:
+        followed = set(
+            Follow.objects.filter(user=user)
+            .values_list('author_id', flat=True)
+        )
+        if followed & pull_ids:
+            return HybridFeed(user, followed & pull_ids)
+    return Post.objects.filter(
+        inbox_entries__user=user
+    ).select_related('author', 'group').order_by('-inbox_entries__pub_date')
+
+
+def rebuild_inboxes(user_ids):
+    """Пересобирает ленты пачки пользователей одним INSERT ... SELECT
+
+    Результат тот же, что у rebuild_inbox для каждого из user_ids, но
+    строки не проходят через ORM: при массовой пересборке это в разы
+    быстрее. Последние FEED_INBOX_LIMIT постов отбирает ROW_NUMBER().
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    Inbox.objects.filter(user_id__in=user_ids).delete()
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    sql = (
+        f'INSERT INTO {quote(Inbox._meta.db_table)} '
+        f'(user_id, post_id, pub_date) '
+        f'SELECT user_id, post_id, pub_date FROM ('
+        f'SELECT f.user_id AS user_id, p.id AS post_id, '
+        f'p.pub_date AS pub_date, ROW_NUMBER() OVER ('
+        f'PARTITION BY f.user_id ORDER BY p.pub_date DESC, p.id DESC'
+        f') AS position '
+        f'FROM {quote(Follow._meta.db_table)} f '
+        f'JOIN {quote(Post._meta.db_table)} p ON p.author_id = f.author_id '
+        f'WHERE f.user_id IN ({placeholders})'
+        f') recent WHERE position <= %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*user_ids, settings.FEED_INBOX_LIMIT])
@@ -1,5 +1,10 @@
 from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
 
+from .images import normalize_image
 from .models import Post, Comment
 
 
@@ -12,6 +17,34 @@ class PostForm(forms.ModelForm):
             'image'
         )
 
+    def clean_image(self):
+        """Нормализует новую картинку, запоминая размеры до и после"""
+        image = self.cleaned_data['image']
+        self.image_sizes = None
+        if image is False:
+            self.image_sizes = (None, None)
+        elif (isinstance(image, UploadedFile)
+              and settings.POST_IMAGE_PROCESSING):
+            # Проверка ImageField читает только заголовок: обрезанный
+            # файл или «бомба» обнаруживаются лишь при декодировании
+            try:
+                image, original_size, size = normalize_image(image)
+            except (OSError, Image.DecompressionBombError):
+                raise ValidationError(
+                    forms.ImageField.default_error_messages['invalid_image'],
+                    code='invalid_image'
+                )
+            self.image_sizes = (original_size, size)
+        elif isinstance(image, UploadedFile):
+            self.image_sizes = (image.size, image.size)
+        return image
+
+    def save(self, commit=True):
+        if getattr(self, 'image_sizes', None):
+            (self.instance.image_original_size,
+             self.instance.image_size) = self.image_sizes
+        return super().save(commit)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,86 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+# Ключи image.info, которые не нужны для показа картинки (EXIF с
+# геометкой, XMP, комментарии). ICC-профиль сохраняется ради цветов.
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop')
+
+EXIF_ORIENTATION = 0x0112
+
+
+def has_alpha(image):
+    return (image.mode in ('RGBA', 'LA', 'PA')
+            or (image.mode == 'P' and 'transparency' in image.info))
+
+
+def encode(image, format_, quality, icc_profile):
+    buffer = BytesIO()
+    options = {'optimize': True}
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    if format_ in ('JPEG', 'WEBP'):
+        options['quality'] = quality
+    if format_ == 'JPEG':
+        options['progressive'] = True
+    image.save(buffer, format_, **options)
+    return buffer.getvalue()
+
+
+def encode_with_budget(image, format_, icc_profile):
+    """Кодирует image, понижая качество, пока файл не уложится в бюджет"""
+    quality = settings.POST_IMAGE_QUALITY
+    data = encode(image, format_, quality, icc_profile)
+    budget = settings.POST_IMAGE_MAX_BYTES
+    while (budget and len(data) > budget and format_ != 'PNG'
+           and quality > settings.POST_IMAGE_MIN_QUALITY):
+        quality = max(quality - 10, settings.POST_IMAGE_MIN_QUALITY)
+        data = encode(image, format_, quality, icc_profile)
+    return data
+
+
+def normalize_image(uploaded):
+    """Уменьшает, очищает от метаданных и пережимает загруженную картинку
+
+    Возвращает (файл, исходный размер в байтах, итоговый размер). Анимации
+    не трогаются. Если картинку не нужно уменьшать, в ней нет метаданных и
+    пережатая версия не меньше исходной, возвращается исходный файл.
+    """
+    original_size = uploaded.size
+    uploaded.seek(0)
+    image = Image.open(uploaded)
+    if getattr(image, 'is_animated', False):
+        uploaded.seek(0)
+        return uploaded, original_size, original_size
+    has_metadata = any(key in image.info for key in METADATA_KEYS)
+    max_size = settings.POST_IMAGE_MAX_DIMENSIONS
+    if image.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+        max_size = max_size[1], max_size[0]
+    resized = image.width > max_size[0] or image.height > max_size[1]
+    icc_profile = image.info.get('icc_profile')
+    # thumbnail() для JPEG декодирует сразу в уменьшенном масштабе
+    image.thumbnail(max_size, Image.LANCZOS)
+    image = ImageOps.exif_transpose(image)
+
+    format_ = settings.POST_IMAGE_FORMAT
+    if format_ == 'JPEG' and has_alpha(image):
+        format_ = 'PNG'
+    if format_ == 'JPEG':
+        image = image.convert('RGB')
+    data = encode_with_budget(image, format_, icc_profile)
+
+    if not resized and not has_metadata and len(data) >= original_size:
+        uploaded.seek(0)
+        return uploaded, original_size, original_size
+    name = os.path.splitext(os.path.basename(uploaded.name))[0]
+    normalized = SimpleUploadedFile(
+        name + EXTENSIONS[format_],
+        data,
+        content_type=Image.MIME[format_],
+    )
+    return normalized, original_size, len(data)
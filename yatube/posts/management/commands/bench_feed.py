@@ -0,0 +1,78 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core.benchmark import benchmark_database, measure, summary
+from posts.bulk import refresh_derived
+from posts.feeds import HybridFeed, follow_feed, sync_pull_authors
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает ленту подписок: JOIN через Follow, Inbox и '
+            'слияние списков pull-авторов. Работает на временной БД.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--follows', type=int, nargs='+', default=[10, 1000, 10000],
+            help='Числа подписок читателя, для которых проводится замер'
+        )
+        parser.add_argument('--posts-per-author', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, follows, posts_per_author, repeat, **options):
+        with benchmark_database():
+            for count in follows:
+                result = self.run_case(count, posts_per_author, repeat)
+                self.stdout.write(json.dumps(result))
+
+    def run_case(self, count, posts_per_author, repeat):
+        Follow.objects.all().delete()
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        cache.clear()
+        reader = User.objects.create(username='reader')
+        User.objects.bulk_create(
+            [User(username=f'author{num}') for num in range(count)]
+        )
+        authors = list(User.objects.exclude(pk=reader.pk))
+        Follow.objects.bulk_create(
+            [Follow(user=reader, author=author) for author in authors]
+        )
+        Post.objects.bulk_create(
+            [Post(author=author, text=f'Пост {num}')
+             for author in authors for num in range(posts_per_author)]
+        )
+        # bulk_create обходит сигналы: без профилей нет followers_count,
+        # и pull-авторов не находится даже при пороге в одного подписчика
+        refresh_derived(full=True)
+
+        def first_page(feed):
+            return lambda: list(feed()[:10])
+
+        def join():
+            return Post.objects.filter(author__following__user=reader)
+
+        def inbox():
+            return follow_feed(reader)
+
+        result = {
+            'follows': count,
+            'join': summary(measure(first_page(join), repeat)),
+            'inbox': summary(measure(first_page(inbox), repeat)),
+        }
+        with override_settings(FEED_FANOUT_FOLLOWER_LIMIT=1):
+            cache.clear()
+            sync_pull_authors()
+            if not isinstance(follow_feed(reader), HybridFeed):
+                raise CommandError('Лента подписок не сливает pull-авторов')
+            list(follow_feed(reader)[:10])
+            result['pull_merge'] = summary(
+                measure(first_page(inbox), repeat)
+            )
+        return result
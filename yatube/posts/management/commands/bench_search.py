@@ -0,0 +1,70 @@
+import json
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core.benchmark import benchmark_database, measure, summary
+from posts.models import Post
+from posts.search import SearchPaginator, fts_available
+
+User = get_user_model()
+
+WORDS = ('кот', 'собака', 'город', 'море', 'весна', 'поезд', 'книга',
+         'музыка', 'дорога', 'солнце', 'дождь', 'работа', 'друг', 'вечер',
+         'утро', 'лес', 'река', 'песня', 'окно', 'письмо')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает первую страницу поиска через FTS5 и через '
+            "LIKE '%...%'. Работает на временной БД.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, nargs='+',
+                            default=[10000, 100000])
+        parser.add_argument('--words-per-post', type=int, default=30)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, posts, words_per_post, repeat, **options):
+        if not fts_available():
+            self.stderr.write('Индекс FTS5 есть только в SQLite')
+            return
+        with benchmark_database():
+            author = User.objects.create(username='author')
+            created = 0
+            for count in posts:
+                self.fill(author, count - created, words_per_post)
+                created = count
+                self.stdout.write(json.dumps(self.run_case(count, repeat),
+                                             ensure_ascii=False))
+
+    @staticmethod
+    def fill(author, count, words_per_post):
+        rng = random.Random(count)
+        # Редкое слово есть в пяти постах партии, частые — почти везде.
+        rare_step = max(count // 5, 1)
+        Post.objects.bulk_create(
+            [Post(author=author,
+                  text=' '.join(rng.choices(WORDS, k=words_per_post))
+                  + (' редкость' if num % rare_step == 0 else ''))
+             for num in range(count)],
+            batch_size=500,
+        )
+
+    @staticmethod
+    def run_case(count, repeat):
+        result = {'posts': count}
+        for word in ('редкость', 'кот'):
+            def like():
+                return list(Post.objects.filter(
+                    text__icontains=word
+                ).order_by('-pub_date')[:10])
+
+            def fts():
+                return list(SearchPaginator(word, 10).get_page(None))
+
+            result[word] = {
+                'like': summary(measure(like, repeat)),
+                'fts': summary(measure(fts, repeat)),
+            }
+        return result
@@ -0,0 +1,149 @@
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.test import Client, override_settings
+
+from core.benchmark import benchmark_database, summary
+from posts.management.commands.bench_views import targets
+from posts.models import Comment, Post
+from posts.synthetic import DatasetGenerator, dataset_sizes
+
+User = get_user_model()
+
+# Профиль по умолчанию: журнал отката, соединение на каждый запрос
+PROFILES = {
+    'default': ({'journal_mode': 'DELETE'}, False),
+    'production': (None, True),
+}
+
+
+def read(urls, reader_id, persistent, start, seconds):
+    """Читатель: страницы лент по кругу до истечения seconds"""
+    client = Client()
+    client.force_login(User.objects.get(pk=reader_id))
+    connection.close()
+    timings = []
+    errors = 0
+    time.sleep(max(0, start - time.time()))
+    deadline = start + seconds
+    while time.time() < deadline:
+        for url in urls:
+            started = time.perf_counter()
+            try:
+                client.get(url)
+            except OperationalError:
+                errors += 1
+            else:
+                timings.append((time.perf_counter() - started) * 1000)
+            if not persistent:
+                connection.close()
+    return 'read', timings, errors
+
+
+def write(author_ids, post_ids, persistent, start, seconds, seed):
+    """Писатель: посты и комментарии вперемешку, как post_create и
+    add_comment"""
+    rng = random.Random(seed)
+    timings = []
+    errors = 0
+    time.sleep(max(0, start - time.time()))
+    deadline = start + seconds
+    while time.time() < deadline:
+        author_id = rng.choice(author_ids)
+        started = time.perf_counter()
+        try:
+            if rng.random() < 0.5:
+                Post.objects.create(author_id=author_id, text='Новый пост')
+            else:
+                Comment.objects.create(post_id=rng.choice(post_ids),
+                                       author_id=author_id,
+                                       text='Новый комментарий')
+        except OperationalError:
+            errors += 1
+        else:
+            timings.append((time.perf_counter() - started) * 1000)
+        if not persistent:
+            connection.close()
+    return 'write', timings, errors
+
+
+class Command(BaseCommand):
+    help = ('Замеряет чтение страниц лент одновременно с записью постов и '
+            'комментариев: SQLite по умолчанию и с SQLITE_PRAGMAS и '
+            'постоянными соединениями. Работает на временной БД в файле.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, posts, readers, writers, seconds, seed,
+               **options):
+        results = {}
+        for profile, (pragmas, persistent) in PROFILES.items():
+            if pragmas is None:
+                pragmas = settings.SQLITE_PRAGMAS
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                results[profile] = self.run_profile(
+                    persistent, posts, readers, writers, seconds, seed
+                )
+            self.stdout.write(json.dumps({profile: results[profile]}))
+
+    def run_profile(self, persistent, posts, readers, writers, seconds,
+                    seed):
+        with tempfile.TemporaryDirectory() as directory:
+            with benchmark_database(os.path.join(directory, 'bench.db')):
+                DatasetGenerator(seed=seed).generate(
+                    **dataset_sizes(posts), inboxes=False
+                )
+                urls, reader = targets()
+                urls = list(urls.values())
+                author_ids = list(User.objects.values_list('pk', flat=True))
+                post_ids = list(Post.objects.values_list('pk', flat=True)
+                                .order_by('-pub_date')[:1000])
+                # Прагмы (и режим журнала) ставит первое соединение до
+                # запуска воркеров, унаследованные соединения закрываются
+                connections.close_all()
+                connection.ensure_connection()
+                connections.close_all()
+                start = time.time() + 2
+                context = multiprocessing.get_context('fork')
+                with ProcessPoolExecutor(readers + writers,
+                                         mp_context=context) as pool:
+                    futures = [
+                        pool.submit(read, urls, reader.pk, persistent,
+                                    start, seconds)
+                        for _ in range(readers)
+                    ]
+                    futures += [
+                        pool.submit(write, author_ids, post_ids, persistent,
+                                    start, seconds, (seed or 0) + num)
+                        for num in range(writers)
+                    ]
+                    outcomes = [future.result() for future in futures]
+        return {role: self.summarize(role, outcomes, seconds)
+                for role in ('read', 'write')}
+
+    def summarize(self, role, outcomes, seconds):
+        timings = [timing for outcome_role, outcome_timings, _ in outcomes
+                   if outcome_role == role for timing in outcome_timings]
+        result = {
+            'per_second': round(len(timings) / seconds, 1),
+            'errors': sum(errors for outcome_role, _, errors in outcomes
+                          if outcome_role == role),
+        }
+        if timings:
+            result.update({name: round(value, 2)
+                           for name, value in summary(timings).items()})
+        return result
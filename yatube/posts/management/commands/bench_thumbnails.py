@@ -0,0 +1,86 @@
+import gc
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+from PIL import Image
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.parsers import parse_geometry
+
+from core.benchmark import measure, peak_rss, reset_peak_rss, summary
+
+ENGINES = {
+    'default': 'sorl.thumbnail.engines.pil_engine.Engine',
+    'draft': 'posts.thumbnails.DraftEngine',
+}
+
+
+class Sink:
+    """Приёмник engine.write(), отбрасывающий готовую миниатюру"""
+    def write(self, content):
+        self.size = len(content)
+
+
+def run_engine(path, data, geometry_string, options, repeat):
+    """Замер одного движка; запускается в отдельном процессе, чтобы
+    пиковый RSS не зависел от памяти, оставшейся после другого движка"""
+    engine = import_string(path)()
+    options = dict(ThumbnailBackend.default_options, **options)
+    options['format'] = 'JPEG'
+
+    def thumbnail():
+        image = Image.open(BytesIO(data))
+        ratio = engine.get_image_ratio(image, options)
+        geometry = parse_geometry(geometry_string, ratio)
+        engine.write(engine.create(image, geometry, options), options, Sink())
+
+    gc.collect()
+    baseline = peak_rss() if reset_peak_rss() else None
+    result = summary(measure(thumbnail, repeat))
+    if baseline is not None:
+        result['peak_rss_kb'] = peak_rss() - baseline
+    return result
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время и пиковую память движков sorl-thumbnail на '
+            'миниатюре карточки поста')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', nargs='+', default=[],
+            help='JPEG-файлы; по умолчанию генерируется снимок 4032x3024'
+        )
+        parser.add_argument('--size', default='card',
+                            choices=list(settings.POST_THUMBNAILS))
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, source, size, repeat, **options):
+        sources = []
+        for path in source:
+            with open(path, 'rb') as image:
+                sources.append((path, image.read()))
+        if not sources:
+            sources = [('synthetic 4032x3024', self.synthetic_photo())]
+        geometry_string, thumbnail_options = settings.POST_THUMBNAILS[size]
+        context = multiprocessing.get_context('fork')
+        for name, data in sources:
+            result = {'source': name, 'geometry': geometry_string}
+            for engine, path in ENGINES.items():
+                with ProcessPoolExecutor(1, mp_context=context) as pool:
+                    result[engine] = pool.submit(
+                        run_engine, path, data, geometry_string,
+                        thumbnail_options, repeat,
+                    ).result()
+            self.stdout.write(json.dumps(result))
+
+    def synthetic_photo(self):
+        """JPEG размера фото с телефона; шум не даёт ему сильно сжаться"""
+        buffer = BytesIO()
+        image = Image.effect_noise((4032, 3024), 64).convert('RGB')
+        image.save(buffer, 'JPEG', quality=90)
+        return buffer.getvalue()
@@ -0,0 +1,130 @@
+import json
+import platform
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.benchmark import benchmark_database, measure, summary
+from posts.feeds import rebuild_inboxes
+from posts.management.commands.generate_data import add_dataset_arguments
+from posts.models import Group, Post, Profile
+from posts.synthetic import DatasetGenerator, dataset_sizes
+
+User = get_user_model()
+
+
+def targets():
+    """Самые тяжёлые страницы: популярные группа, автор и пост
+
+    Возвращает адреса страниц и самого активного читателя, для которого
+    заново собирается лента: при генерации ленты не заполнялись.
+    """
+    group = (Group.objects.annotate(count=Count('posts'))
+             .order_by('-count').first())
+    author = Profile.objects.select_related('user').order_by(
+        '-posts_count'
+    ).first().user
+    reader = Profile.objects.select_related('user').order_by(
+        '-following_count'
+    ).first().user
+    post = Post.objects.order_by('-comments_count').first()
+    urls = {'index': reverse('posts:index')}
+    if group is not None:
+        urls['group_posts'] = reverse('posts:group_list',
+                                      kwargs={'slug': group.slug})
+    urls['profile'] = reverse('posts:profile',
+                              kwargs={'username': author.username})
+    if post is not None:
+        urls['post_detail'] = reverse('posts:post_detail',
+                                      kwargs={'post_id': post.pk})
+    urls['follow_index'] = reverse('posts:follow_index')
+    with transaction.atomic():
+        rebuild_inboxes([reader.pk])
+    return urls, reader
+
+
+class Command(BaseCommand):
+    help = ('Замеряет p50/p95 и число запросов основных страниц на '
+            'синтетических данных разного объёма. Работает на временной БД.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, nargs='+',
+            default=[10000, 1000000, 10000000],
+            help='Объёмы набора данных в постах'
+        )
+        add_dataset_arguments(parser)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--db-file', default=None,
+            help='Файл временной БД вместо памяти (для больших объёмов)'
+        )
+        parser.add_argument(
+            '--output', default=None,
+            help='Куда дополнительно записать результаты в JSON'
+        )
+
+    def handle(self, *args, posts, users, groups, comments, follows, skew,
+               seed, batch_size, repeat, db_file, output, **options):
+        results = []
+        for count in posts:
+            try:
+                sizes = dataset_sizes(count, users, groups, comments,
+                                      follows)
+            except ValueError as error:
+                raise CommandError(error)
+            with benchmark_database(db_file):
+                started = time.perf_counter()
+                generator = DatasetGenerator(
+                    seed=seed, skew=skew, batch_size=batch_size,
+                    log=lambda message: self.stderr.write(message),
+                )
+                generator.generate(**sizes, inboxes=False)
+                result = {
+                    'dataset': sizes,
+                    'generate_seconds': round(
+                        time.perf_counter() - started, 3
+                    ),
+                    'views': self.run_views(repeat),
+                }
+            result['python'] = platform.python_version()
+            result['database'] = connection.vendor
+            self.stdout.write(json.dumps(result))
+            results.append(result)
+        if output:
+            with open(output, 'w') as file:
+                json.dump(results, file, indent=2)
+
+    def run_views(self, repeat):
+        urls, reader = targets()
+        client = Client()
+        client.force_login(reader)
+        results = {}
+        for name, url in urls.items():
+            cache.clear()
+            # Журнал запросов ограничен 9000 строками и после генерации
+            # заполнен: без очистки CaptureQueriesContext насчитает ноль.
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: {response.status_code}')
+
+            def cold():
+                cache.clear()
+                client.get(url)
+
+            results[name] = {
+                'url': url,
+                'queries': len(queries),
+                'cold': summary(measure(cold, repeat)),
+                'warm': summary(measure(lambda: client.get(url), repeat)),
+            }
+        return results
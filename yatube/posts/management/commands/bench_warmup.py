@@ -0,0 +1,70 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import benchmark_database, summary
+from posts.management.commands.bench_views import targets
+from posts.synthetic import DatasetGenerator, dataset_sizes
+
+CHILD = '''
+import json, sys
+from core.benchmark import first_requests
+print(json.dumps(first_requests(*json.loads(sys.argv[1]))))
+'''
+
+
+class Command(BaseCommand):
+    help = ('Замеряет запуск и первые запросы свежего продакшен-воркера '
+            'без прогрева и с прогревом (core.warmup). Каждый запуск — '
+            'отдельный процесс на временной БД.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, posts, runs, seed, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, 'bench.sqlite3')
+            with benchmark_database(database):
+                DatasetGenerator(seed=seed).generate(
+                    **dataset_sizes(posts), inboxes=False
+                )
+                urls, _ = targets()
+                urls.pop('follow_index')
+                urls = list(urls.values())
+                results = {'cold': [], 'warm': []}
+                for _ in range(runs):
+                    for mode, runs_ in results.items():
+                        runs_.append(self.child(database, urls,
+                                                mode == 'warm'))
+        self.stdout.write(json.dumps(
+            {mode: self.summarize(runs_, urls)
+             for mode, runs_ in results.items()},
+            indent=2
+        ))
+
+    def child(self, database, urls, warm):
+        process = subprocess.run(
+            [sys.executable, '-c', CHILD,
+             json.dumps([database, urls, warm])],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'yatube.settings'},
+        )
+        if process.returncode:
+            raise CommandError(process.stderr)
+        return json.loads(process.stdout.splitlines()[-1])
+
+    def summarize(self, runs, urls):
+        result = {'boot': summary([run['boot'] for run in runs])}
+        for key in ('first', 'second'):
+            result[key] = {url: summary([run[key][url] for run in runs])
+                           for url in urls}
+        result['first_request'] = summary([run['first'][urls[0]]
+                                           for run in runs])
+        return result
@@ -0,0 +1,132 @@
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import (OperationalError, connection, connections,
+                       transaction)
+
+from core.benchmark import benchmark_database, summary
+from core.writes import write, writer
+from posts.models import Comment, Follow, Post
+from posts.synthetic import DatasetGenerator, dataset_sizes
+
+User = get_user_model()
+
+
+def follow(user_id, author_id):
+    """Как profile_follow/profile_unfollow: чтение, затем запись"""
+    follow, created = Follow.objects.get_or_create(user_id=user_id,
+                                                   author_id=author_id)
+    if not created:
+        follow.delete()
+
+
+def comment(user_id, post_id):
+    """Как add_comment: пост, затем комментарий к нему"""
+    post = Post.objects.get(pk=post_id)
+    Comment.objects.create(post=post, author_id=user_id, text='Комментарий')
+
+
+def run_process(mode, threads, user_ids, post_ids, start, seconds, seed):
+    """Процесс-воркер: threads потоков пишут до истечения seconds"""
+    results = []
+
+    def run_thread(rng):
+        timings = []
+        errors = 0
+        time.sleep(max(0, start - time.time()))
+        deadline = start + seconds
+        while time.time() < deadline:
+            user_id = rng.choice(user_ids)
+            if rng.random() < 0.5:
+                func, args = follow, (user_id, rng.choice(user_ids))
+            else:
+                func, args = comment, (user_id, rng.choice(post_ids))
+            started = time.perf_counter()
+            try:
+                if mode == 'queue':
+                    write(func, *args, batch=True)
+                else:
+                    with transaction.atomic():
+                        func(*args)
+            except OperationalError:
+                errors += 1
+            else:
+                timings.append((time.perf_counter() - started) * 1000)
+        connection.close()
+        results.append((timings, errors))
+
+    workers = [
+        threading.Thread(target=run_thread,
+                         args=(random.Random(seed * 1000 + num),))
+        for num in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    timings = [timing for thread_timings, _ in results
+               for timing in thread_timings]
+    return timings, sum(errors for _, errors in results), dict(writer.stats)
+
+
+class Command(BaseCommand):
+    help = ('Замеряет запись подписок и комментариев из нескольких '
+            'процессов и потоков: транзакции в потоках запросов против '
+            'очереди core.writes. Работает на временной БД в файле.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, posts, processes, threads, seconds, seed,
+               **options):
+        with tempfile.TemporaryDirectory() as directory:
+            with benchmark_database(os.path.join(directory, 'bench.db')):
+                DatasetGenerator(seed=seed).generate(
+                    **dataset_sizes(posts), inboxes=False
+                )
+                user_ids = list(User.objects.values_list('pk', flat=True))
+                post_ids = list(Post.objects.values_list('pk', flat=True)
+                                .order_by('-pub_date')[:1000])
+                for mode in ('atomic', 'queue'):
+                    result = self.run_mode(mode, processes, threads,
+                                           user_ids, post_ids, seconds, seed)
+                    self.stdout.write(json.dumps({mode: result}))
+
+    def run_mode(self, mode, processes, threads, user_ids, post_ids,
+                 seconds, seed):
+        connections.close_all()
+        start = time.time() + 1
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(processes, mp_context=context) as pool:
+            outcomes = list(pool.map(
+                run_process, [mode] * processes, [threads] * processes,
+                [user_ids] * processes, [post_ids] * processes,
+                [start] * processes, [seconds] * processes,
+                [seed + num for num in range(processes)]
+            ))
+        timings = [timing for outcome_timings, _, _ in outcomes
+                   for timing in outcome_timings]
+        result = {
+            'per_second': round(len(timings) / seconds, 1),
+            'errors': sum(errors for _, errors, _ in outcomes),
+        }
+        if timings:
+            result.update({name: round(value, 2)
+                           for name, value in summary(timings).items()})
+        if mode == 'queue':
+            stats = [outcome_stats for _, _, outcome_stats in outcomes]
+            result.update({key: sum(item[key] for item in stats)
+                           for key in ('transactions', 'writes', 'retries')})
+        return result
@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts.cache import bump_generation
+from posts.media import reconcile_blobs
+from posts.models import Post
+from posts.storage import is_content_addressed, post_image_storage
+from posts.utils import pk_chunks
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов в хранилище с именами по хешу '
+            'содержимого, удаляя дубликаты')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько постов обновлять в одной транзакции'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать дубликаты, ничего не меняя'
+        )
+
+    def handle(self, *args, chunk_size, dry_run, **options):
+        self.dry_run = dry_run
+        self.renamed = {}
+        self.hashed = set()
+        self.missing = self.freed = 0
+        queryset = Post.objects.exclude(image='')
+        for chunk in pk_chunks(queryset, chunk_size):
+            updates = self.hash_chunk(chunk)
+            if dry_run:
+                continue
+            with transaction.atomic():
+                for name, pks in updates.items():
+                    Post.objects.filter(pk__in=pks).update(image=name)
+        if not dry_run:
+            for old_name in self.renamed:
+                default.kvstore.delete(ImageFile(old_name, post_image_storage))
+                post_image_storage.delete(old_name)
+            with transaction.atomic():
+                fixed = reconcile_blobs()
+            bump_generation('posts')
+            bump_generation('thumbnails')
+            self.stdout.write(f'Исправлено счётчиков ссылок: {fixed}')
+        self.stdout.write(
+            f'Файлов перенесено: {len(self.renamed)}, '
+            f'уникальных: {len(self.hashed)}, '
+            f'освобождено байт: {self.freed}, не найдено: {self.missing}'
+        )
+
+    def hash_chunk(self, pks):
+        """{новое имя: [pk]} для постов pks со старыми именами файлов"""
+        updates = {}
+        posts = Post.objects.filter(pk__in=pks).values_list('pk', 'image')
+        for pk, name in posts:
+            if is_content_addressed(name):
+                continue
+            if name not in self.renamed:
+                if not post_image_storage.exists(name):
+                    self.missing += 1
+                    continue
+                self.renamed[name] = self.hash_file(name)
+            updates.setdefault(self.renamed[name], []).append(pk)
+        return updates
+
+    def hash_file(self, name):
+        """Копирует файл под имя по хешу, если такого содержимого ещё нет"""
+        storage = post_image_storage
+        size = storage.size(name)
+        with storage.open(name) as content:
+            hashed = storage.hashed_name(name, content)
+            if hashed in self.hashed or storage.exists(hashed):
+                self.freed += size
+            elif not self.dry_run:
+                content.seek(0)
+                storage.save(name, content)
+        self.hashed.add(hashed)
+        return hashed
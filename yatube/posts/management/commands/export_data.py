@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from posts.export import (CHUNK_SIZE, EXPORTS, FORMATS, export_file,
+                          export_shard, shard_path, shard_ranges)
+
+
+class Command(BaseCommand):
+    help = ('Потоково выгружает группы, посты, комментарии или подписки '
+            'в JSONL или CSV, при необходимости в несколько файлов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument(
+            'path', help='Файл выгрузки, при --shards к имени '
+                         'добавляется номер части'
+        )
+        parser.add_argument(
+            '--format', dest='format_', choices=FORMATS,
+            help='Формат файла, по умолчанию по расширению'
+        )
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Сжимать файлы (включается само для *.gz)'
+        )
+        parser.add_argument(
+            '--shards', type=int, default=1,
+            help='На сколько файлов разбить выгрузку по диапазонам pk'
+        )
+        parser.add_argument(
+            '--processes', type=int, default=None,
+            help='Сколько процессов пишут части, по умолчанию по числу CPU'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько строк читать из БД одним запросом'
+        )
+
+    def handle(self, *args, kind, path, format_, gzip, shards, processes,
+               chunk_size, **options):
+        name = path.lower()
+        if name.endswith('.gz'):
+            gzip, name = True, name[:-len('.gz')]
+        if format_ is None:
+            format_ = 'csv' if name.endswith('.csv') else 'jsonl'
+        if shards < 1 or chunk_size < 1:
+            raise CommandError('Число частей и размер пачки должны быть '
+                               'положительными')
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        ranges = shard_ranges(kind, shards)
+        tasks = [
+            (kind, format_, shard_path(path, number, len(ranges)), gzip,
+             pk_range, chunk_size)
+            for number, pk_range in enumerate(ranges)
+        ]
+        if processes is None:
+            processes = os.cpu_count() or 1
+        processes = min(processes, len(tasks))
+        started = time.perf_counter()
+        if processes > 1:
+            results = self.run_pool(tasks, processes)
+        else:
+            results = [export_file(*task) for task in tasks]
+        elapsed = time.perf_counter() - started
+        total = size = 0
+        for task, (count, seconds) in zip(tasks, results):
+            file_size = os.path.getsize(task[2])
+            total += count
+            size += file_size
+            self.stdout.write(
+                f'{task[2]}: {count} строк, {file_size} байт, '
+                f'{count / max(seconds, 1e-9):.0f} строк/с'
+            )
+        self.stdout.write(
+            f'Выгружено: {total} строк в {len(tasks)} файл(ах), '
+            f'{total / max(elapsed, 1e-9):.0f} строк/с, '
+            f'{size / max(elapsed, 1e-9) / 2 ** 20:.1f} МБ/с'
+        )
+
+    def run_pool(self, tasks, processes):
+        """Пишет части в дочерних процессах, каждый со своим соединением"""
+        # Открытые соединения не должны достаться дочерним процессам
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(processes, mp_context=context) as pool:
+            futures = [pool.submit(export_shard, *task) for task in tasks]
+            return [future.result() for future in futures]
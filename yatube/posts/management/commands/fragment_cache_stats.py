@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from posts.cache import (fragment_stats, reset_fragment_stats,
+                         reset_thumbnail_stats, thumbnail_stats)
+
+
+class Command(BaseCommand):
+    help = ('Показывает попадания и промахи кеша фрагментов лент '
+            'и пакетного поиска миниатюр')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Обнулить счётчики после вывода')
+
+    def handle(self, *args, reset, **options):
+        for name, (hits, misses) in fragment_stats().items():
+            total = hits + misses
+            rate = hits / total * 100 if total else 0
+            self.stdout.write(
+                f'{name}: hits={hits} misses={misses} hit_rate={rate:.1f}%'
+            )
+        stats = thumbnail_stats()
+        total = stats['hits'] + stats['misses']
+        rate = stats['hits'] / total * 100 if total else 0
+        lookups = stats['lookups']
+        average = stats['microseconds'] / lookups / 1000 if lookups else 0
+        self.stdout.write(
+            f'thumbnails: hits={stats["hits"]} misses={stats["misses"]} '
+            f'hit_rate={rate:.1f}% lookups={lookups} '
+            f'avg_lookup={average:.2f}ms'
+        )
+        if reset:
+            reset_fragment_stats()
+            reset_thumbnail_stats()
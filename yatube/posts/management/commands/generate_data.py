@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.synthetic import DatasetGenerator, dataset_sizes
+
+
+def add_dataset_arguments(parser):
+    """Параметры набора данных, общие с bench_views"""
+    parser.add_argument(
+        '--users', type=int, default=None,
+        help='Число пользователей, по умолчанию posts / 20'
+    )
+    parser.add_argument(
+        '--groups', type=int, default=None,
+        help='Число групп, по умолчанию posts / 2000'
+    )
+    parser.add_argument(
+        '--comments', type=int, default=None,
+        help='Число комментариев, по умолчанию posts / 2'
+    )
+    parser.add_argument(
+        '--follows', type=int, default=20,
+        help='Среднее число подписок на пользователя'
+    )
+    parser.add_argument(
+        '--skew', type=float, default=2.0,
+        help='Перекос популярности авторов, групп и постов (0 — без него)'
+    )
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument(
+        '--batch-size', type=int, default=5000,
+        help='Сколько строк писать в одной транзакции'
+    )
+
+
+class Command(BaseCommand):
+    help = ('Наполняет БД синтетическими пользователями, группами, постами, '
+            'комментариями и подписками')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10000)
+        add_dataset_arguments(parser)
+        parser.add_argument(
+            '--no-inboxes', action='store_true',
+            help='Не заполнять ленты подписок (Inbox) всех читателей'
+        )
+
+    def handle(self, *args, posts, users, groups, comments, follows, skew,
+               seed, batch_size, no_inboxes, **options):
+        try:
+            sizes = dataset_sizes(posts, users, groups, comments, follows)
+        except ValueError as error:
+            raise CommandError(error)
+        generator = DatasetGenerator(
+            seed=seed, skew=skew, batch_size=batch_size,
+            log=lambda message: self.stderr.write(message),
+        )
+        stats = generator.generate(**sizes, inboxes=not no_inboxes)
+        self.stdout.write(json.dumps(stats, ensure_ascii=False))
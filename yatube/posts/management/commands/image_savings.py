@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Показывает, сколько места сэкономила обработка картинок '
+            'постов при загрузке')
+
+    def handle(self, *args, **options):
+        totals = Post.objects.filter(
+            image_original_size__isnull=False
+        ).aggregate(
+            images=Count('pk'),
+            original=Sum('image_original_size'),
+            stored=Sum('image_size'),
+        )
+        original = totals['original'] or 0
+        stored = totals['stored'] or 0
+        saved = original - stored
+        rate = saved / original * 100 if original else 0
+        self.stdout.write(
+            f'images={totals["images"]} original={original} '
+            f'stored={stored} saved={saved} ({rate:.1f}%)'
+        )
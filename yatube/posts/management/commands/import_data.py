@@ -0,0 +1,126 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from posts.bulk import (IMPORTERS, explicit_dates, open_text, parse_record,
+                        read_records, refresh_derived)
+from posts.models import ImportCheckpoint
+
+
+class Command(BaseCommand):
+    help = ('Массово импортирует группы, посты, комментарии или подписки '
+            'из JSONL или CSV с возобновлением после прерывания')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path', help='Файл с данными, - для stdin')
+        parser.add_argument(
+            '--format', dest='format_', choices=('jsonl', 'csv'),
+            help='Формат файла, по умолчанию по расширению'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк вставлять одним INSERT'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Сколько записей сохранять в одной транзакции'
+        )
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Создавать незнакомых авторов без пароля'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить с места, где остановился прошлый запуск'
+        )
+        parser.add_argument(
+            '--no-refresh', action='store_true',
+            help='Не пересчитывать счётчики, ленты и кеши после импорта'
+        )
+
+    def handle(self, *args, kind, path, format_, batch_size, chunk_size,
+               create_users, resume, no_refresh, **options):
+        if format_ is None:
+            format_ = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+        if batch_size < 1 or chunk_size < 1:
+            raise CommandError('Размеры пачек должны быть положительными')
+        key = kind if path == '-' else f'{kind}:{os.path.abspath(path)}'
+        self.checkpoint, _ = ImportCheckpoint.objects.get_or_create(key=key)
+        if not resume:
+            self.checkpoint.position = 0
+            self.checkpoint.imported = self.checkpoint.skipped = 0
+            self.checkpoint.save()
+        start = self.checkpoint.position
+        if start:
+            self.stdout.write(f'Продолжение после записи {start}')
+        self.importer = IMPORTERS[kind](create_users=create_users)
+        self.batch_size = batch_size
+        self.imported = self.skipped = 0
+        started = time.perf_counter()
+        try:
+            self.import_file(path, format_, start, chunk_size)
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
+        elapsed = time.perf_counter() - started
+        if not no_refresh:
+            refresh_derived(self.importer, full=bool(start))
+        self.stdout.write(
+            f'Импортировано: {self.imported}, пропущено: {self.skipped}, '
+            f'{self.imported / max(elapsed, 1e-9):.0f} строк/с'
+        )
+
+    def import_file(self, path, format_, start, chunk_size):
+        """Читает файл потоком и сохраняет записи после start пачками"""
+        with open_text(path) as stream, explicit_dates(
+            self.importer.model, *self.importer.dates
+        ):
+            chunk = []
+            for number, raw in read_records(stream, format_):
+                if number <= start:
+                    continue
+                chunk.append((number, raw))
+                if len(chunk) == chunk_size:
+                    self.import_chunk(chunk)
+                    chunk = []
+            if chunk:
+                self.import_chunk(chunk)
+
+    def import_chunk(self, chunk):
+        """Сохраняет пачку записей и позицию в одной транзакции"""
+        started = time.perf_counter()
+        records = []
+        skipped = 0
+        for number, raw in chunk:
+            try:
+                records.append((number, parse_record(raw)))
+            except ValueError as error:
+                skipped += self.report(number, error)
+        now = timezone.now()
+        with transaction.atomic():
+            self.importer.resolve([record for _, record in records])
+            objects = []
+            for number, record in records:
+                try:
+                    objects.append(self.importer.build(record, now))
+                except ValueError as error:
+                    skipped += self.report(number, error)
+            self.importer.save(objects, self.batch_size)
+            self.checkpoint.position = chunk[-1][0]
+            self.checkpoint.imported += len(objects)
+            self.checkpoint.skipped += skipped
+            self.checkpoint.save()
+        self.imported += len(objects)
+        self.skipped += skipped
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Записи до {chunk[-1][0]}: +{len(objects)}, '
+            f'{len(objects) / max(elapsed, 1e-9):.0f} строк/с'
+        )
+
+    def report(self, number, error):
+        self.stderr.write(f'Запись {number} пропущена: {error}')
+        return 1
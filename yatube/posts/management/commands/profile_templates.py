@@ -0,0 +1,58 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.template import engines
+from django.test import Client, override_settings
+
+from core import profiling
+from core.templates import metrics_templates
+from core.benchmark import benchmark_database
+from posts.management.commands.bench_views import targets
+from posts.management.commands.generate_data import add_dataset_arguments
+from posts.synthetic import DatasetGenerator, dataset_sizes
+
+
+class Command(BaseCommand):
+    help = ('Раскладывает время рендеринга основных страниц по шаблонам, '
+            'include, тегам и фильтрам на синтетических данных. Работает '
+            'на временной БД.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10000)
+        add_dataset_arguments(parser)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Не очищать кеш перед запросами (фрагменты из кеша)'
+        )
+        parser.add_argument(
+            '--output', default=None,
+            help='Файл для профиля в формате collapsed stacks'
+        )
+
+    def handle(self, *args, posts, users, groups, comments, follows, skew,
+               seed, batch_size, repeat, warm, output, **options):
+        try:
+            sizes = dataset_sizes(posts, users, groups, comments, follows)
+        except ValueError as error:
+            raise CommandError(error)
+        with benchmark_database():
+            DatasetGenerator(
+                seed=seed, skew=skew, batch_size=batch_size,
+                log=lambda message: self.stderr.write(message),
+            ).generate(**sizes, inboxes=False)
+            urls, reader = targets()
+            client = Client()
+            client.force_login(reader)
+            profiling.profiler.reset()
+            with override_settings(TEMPLATE_PROFILING=True,
+                                   TEMPLATES=metrics_templates()):
+                profiling.install(engines.all()[0].engine)
+                for _ in range(repeat):
+                    for url in urls.values():
+                        if not warm:
+                            cache.clear()
+                        client.get(url)
+        self.stdout.write(profiling.profiler.table())
+        if output:
+            with open(output, 'w') as file:
+                file.write(profiling.profiler.collapsed())
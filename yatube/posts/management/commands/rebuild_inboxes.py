@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.feeds import rebuild_inboxes
+from posts.utils import pk_chunks
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок (Inbox) пачками пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько пользователей пересобирать в одной транзакции'
+        )
+        parser.add_argument(
+            '--user', action='append', dest='usernames', default=[],
+            help='Пересобрать только ленту указанного пользователя'
+        )
+
+    def handle(self, *args, chunk_size, usernames, **options):
+        users = User.objects.all()
+        if usernames:
+            users = users.filter(username__in=usernames)
+        done = 0
+        for chunk in pk_chunks(users, chunk_size):
+            with transaction.atomic():
+                rebuild_inboxes(chunk)
+            done += len(chunk)
+            self.stdout.write(f'Пересобрано лент: {done}')
+        self.stdout.write(self.style.SUCCESS(f'Готово, лент: {done}'))
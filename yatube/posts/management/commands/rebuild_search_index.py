@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.search import fts_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс FTS5 по постам'
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            raise CommandError('Индекс FTS5 есть только в SQLite')
+        rebuild_index()
+        self.stdout.write('Индекс перестроен')
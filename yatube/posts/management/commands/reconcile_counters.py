@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import reconcile_comments, reconcile_profiles
+from posts.models import Post
+from posts.utils import pk_chunks
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сверяет денормализованные счётчики постов, комментариев и '
+            'подписок с данными и исправляет расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько строк сверять в одной транзакции'
+        )
+
+    def handle(self, *args, chunk_size, **options):
+        fixed = self.reconcile(User.objects.all(), reconcile_profiles,
+                               chunk_size)
+        self.stdout.write(f'Исправлено профилей: {fixed}')
+        fixed = self.reconcile(Post.objects.all(), reconcile_comments,
+                               chunk_size)
+        self.stdout.write(f'Исправлено постов: {fixed}')
+
+    @staticmethod
+    def reconcile(queryset, reconcile_chunk, chunk_size):
+        fixed = 0
+        for chunk in pk_chunks(queryset, chunk_size):
+            with transaction.atomic():
+                fixed += reconcile_chunk(chunk)
+        return fixed
@@ -0,0 +1,17 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.warmup import warmup
+
+
+class Command(BaseCommand):
+    help = ('Компилирует все шаблоны и маршруты, как wsgi.py при запуске '
+            'воркера. Перед выкладкой проверяет, что шаблоны компилируются.')
+
+    def handle(self, *args, **options):
+        stats = warmup()
+        if stats['failed']:
+            raise CommandError('Не компилируются шаблоны: '
+                               + ', '.join(stats['failed']))
+        self.stdout.write(json.dumps(stats))
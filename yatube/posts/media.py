@@ -0,0 +1,95 @@
+import logging
+
+from django.db import transaction
+from django.db.models import Count, F
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from core.writes import write
+
+from .models import ImageBlob, Post
+from .storage import is_content_addressed, post_image_storage
+
+logger = logging.getLogger(__name__)
+
+
+def acquire(name):
+    """Учитывает ещё одну ссылку поста на файл name"""
+    if not is_content_addressed(name):
+        return
+    blob, created = ImageBlob.objects.get_or_create(
+        name=name, defaults={'refcount': 1}
+    )
+    if not created:
+        ImageBlob.objects.filter(pk=blob.pk).update(
+            refcount=F('refcount') + 1
+        )
+
+
+def release(name):
+    """Снимает ссылку на name; файл без ссылок удаляется после коммита"""
+    if not is_content_addressed(name):
+        return
+    ImageBlob.objects.filter(name=name, refcount__gt=0).update(
+        refcount=F('refcount') - 1
+    )
+    deleted, _ = ImageBlob.objects.filter(name=name, refcount=0).delete()
+    if deleted:
+        transaction.on_commit(lambda: delete_file(name))
+
+
+def delete_file(name):
+    """Удаляет файл и его миниатюры, если на него снова не сослались
+
+    Проверка и удаление идут через core.writes, как и сохранение поста:
+    иначе они могли бы вклиниться между записью файла такой же загрузки
+    (ContentAddressedStorage._save находит его и не пишет свой) и
+    коммитом её acquire(), оставив новый пост без файла.
+    """
+    write(remove_unreferenced, name)
+
+
+def remove_unreferenced(name):
+    if ImageBlob.objects.filter(name=name).exists():
+        return
+    try:
+        default.kvstore.delete(ImageFile(name, post_image_storage))
+        post_image_storage.delete(name)
+    except OSError:
+        logger.exception('Не удалось удалить %s', name)
+
+
+def image_references(names=None):
+    """{имя файла: число постов} по данным таблицы Post"""
+    queryset = Post.objects.exclude(image='')
+    if names is not None:
+        queryset = queryset.filter(image__in=names)
+    return dict(
+        queryset.order_by()
+        .values('image')
+        .annotate(total=Count('pk'))
+        .values_list('image', 'total')
+    )
+
+
+def reconcile_blobs():
+    """Пересчитывает ImageBlob по постам, возвращает число исправлений"""
+    actual = {name: total for name, total in image_references().items()
+              if is_content_addressed(name)}
+    blobs = {blob.name: blob for blob in ImageBlob.objects.all()}
+    fixed = 0
+    for name, total in actual.items():
+        blob = blobs.pop(name, None)
+        if blob is None:
+            ImageBlob.objects.create(name=name, refcount=total)
+            fixed += 1
+        elif blob.refcount != total:
+            blob.refcount = total
+            blob.save(update_fields=['refcount'])
+            fixed += 1
+    if blobs:
+        ImageBlob.objects.filter(name__in=blobs).delete()
+        for name in blobs:
+            transaction.on_commit(lambda name=name: delete_file(name))
+        fixed += len(blobs)
+    return fixed
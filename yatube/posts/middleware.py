@@ -0,0 +1,74 @@
+import hashlib
+from math import ceil
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .cache import generations, last_modified
+
+PAGE_GENERATIONS = ('posts', 'groups', 'users', 'comments', 'follows',
+                    'thumbnails')
+
+
+class AnonymousPageCacheMiddleware:
+    """Кеш целых страниц для анонимных пользователей с условным GET
+
+    Ключ страницы — путь с query string и поколения постов, групп,
+    пользователей, комментариев и подписок, поэтому любая их запись сразу
+    делает кеш и ETag устаревшими. Last-Modified — время последней такой
+    записи.
+    Должен стоять после AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        cache_key = getattr(request, 'page_cache_key', None)
+        if cache_key is None:
+            return response
+        if (response.status_code == 200 and not response.streaming
+                and not response.cookies):
+            cache.set(cache_key, response, settings.PAGE_CACHE_TIMEOUT)
+        return self.add_validators(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.is_cacheable(request):
+            return None
+        page_generations = generations(PAGE_GENERATIONS)
+        full_path = request.get_full_path()
+        signature = hashlib.md5(
+            f'{full_path}{page_generations}'.encode()
+        ).hexdigest()
+        request.page_etag = quote_etag(signature)
+        request.page_last_modified = ceil(last_modified(PAGE_GENERATIONS))
+        conditional = get_conditional_response(
+            request,
+            etag=request.page_etag,
+            last_modified=request.page_last_modified
+        )
+        if conditional is not None:
+            return self.add_validators(request, conditional)
+        request.page_cache_key = f'page:{signature}'
+        cached = cache.get(request.page_cache_key)
+        if cached is not None:
+            request.page_cache_key = None
+            return self.add_validators(request, cached)
+        return None
+
+    @staticmethod
+    def is_cacheable(request):
+        return (settings.PAGE_CACHE_ENABLED
+                and request.method in ('GET', 'HEAD')
+                and not request.user.is_authenticated
+                and request.resolver_match.view_name
+                in settings.PAGE_CACHE_VIEWS)
+
+    @staticmethod
+    def add_validators(request, response):
+        response['ETag'] = request.page_etag
+        response['Last-Modified'] = http_date(request.page_last_modified)
+        return response
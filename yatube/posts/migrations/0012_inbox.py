@@ -0,0 +1,59 @@
+# Generated by Django 2.2.16 on 2026-10-18 12:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_inboxes(apps, schema_editor):
+    """Ленты подписок по уже существующим подпискам: последние
+    FEED_INBOX_LIMIT постов на пользователя, как rebuild_inboxes"""
+    Follow = apps.get_model('posts', 'Follow')
+    Inbox = apps.get_model('posts', 'Inbox')
+    Post = apps.get_model('posts', 'Post')
+    quote = schema_editor.connection.ops.quote_name
+    schema_editor.execute(
+        f'INSERT INTO {quote(Inbox._meta.db_table)} '
+        f'(user_id, post_id, pub_date) '
+        f'SELECT user_id, post_id, pub_date FROM ('
+        f'SELECT f.user_id AS user_id, p.id AS post_id, '
+        f'p.pub_date AS pub_date, ROW_NUMBER() OVER ('
+        f'PARTITION BY f.user_id ORDER BY p.pub_date DESC, p.id DESC'
+        f') AS position '
+        f'FROM {quote(Follow._meta.db_table)} f '
+        f'JOIN {quote(Post._meta.db_table)} p ON p.author_id = f.author_id'
+        f') recent WHERE position <= %s',
+        [settings.FEED_INBOX_LIMIT]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0011_auto_20230313_1331'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Inbox',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Publication date')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to='posts.Post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-pub_date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='inbox',
+            index=models.Index(fields=['user', '-pub_date'], name='posts_inbox_user_pub_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='inbox',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='Пост в ленте один раз'),
+        ),
+        migrations.RunPython(fill_inboxes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 13:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True, verbose_name='Import key')),
+                ('position', models.BigIntegerField(default=0, verbose_name='Last imported record')),
+                ('imported', models.BigIntegerField(default=0, verbose_name='Imported rows')),
+                ('skipped', models.BigIntegerField(default=0, verbose_name='Skipped rows')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Updated')),
+            ],
+            options={
+                'verbose_name': 'Точка импорта',
+                'verbose_name_plural': 'Точки импорта',
+            },
+        ),
+    ]
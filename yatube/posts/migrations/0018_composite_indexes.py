@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Одностолбцовые индексы внешних ключей, которые заменяются составными.
+# AlterField(db_index=False) в SQLite пересоздаёт таблицу: это копия всех
+# строк и потеря триггеров FTS на posts_post (см. 0016_post_fts), поэтому
+# в БД индексы удаляются напрямую, а AlterField меняет только состояние.
+REPLACED = [
+    ('Post', 'author'),
+    ('Post', 'group'),
+    ('Comment', 'post'),
+    ('Follow', 'author'),
+]
+
+
+def single_column_indexes(schema_editor, model, field):
+    column = model._meta.get_field(field).column
+    table = model._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        constraints = schema_editor.connection.introspection.get_constraints(
+            cursor, table
+        )
+    return [
+        name for name, info in constraints.items()
+        if info['index'] and not info['unique'] and not info['primary_key']
+        and info['columns'] == [column]
+    ]
+
+
+def drop_indexes(apps, schema_editor):
+    for model_name, field in REPLACED:
+        model = apps.get_model('posts', model_name)
+        for name in single_column_indexes(schema_editor, model, field):
+            schema_editor.execute(
+                schema_editor._delete_index_sql(model, name)
+            )
+
+
+def create_indexes(apps, schema_editor):
+    for model_name, field in REPLACED:
+        model = apps.get_model('posts', model_name)
+        if not single_column_indexes(schema_editor, model, field):
+            schema_editor.execute(schema_editor._create_index_sql(
+                model, [model._meta.get_field(field)]
+            ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0017_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(drop_indexes, create_indexes),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='comment',
+                    name='post',
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='posts.Post'),
+                ),
+                migrations.AlterField(
+                    model_name='follow',
+                    name='author',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='following', to=settings.AUTH_USER_MODEL),
+                ),
+                migrations.AlterField(
+                    model_name='post',
+                    name='author',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='posts', to=settings.AUTH_USER_MODEL, verbose_name='Author'),
+                ),
+                migrations.AlterField(
+                    model_name='post',
+                    name='group',
+                    field=models.ForeignKey(blank=True, db_index=False, help_text='Группа, к которой будет относиться пост', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='posts', to='posts.Group', verbose_name='Группа'),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='posts_comment_post_created'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'user'], name='posts_follow_author_user'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'pub_date'], name='posts_post_author_pub_date'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'pub_date'], name='posts_post_group_pub_date'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['followers_count', 'user'], name='posts_profile_followers'),
+        ),
+    ]
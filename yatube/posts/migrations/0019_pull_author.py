@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-18 14:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pull_authors(apps, schema_editor):
+    Profile = apps.get_model('posts', 'Profile')
+    Profile.objects.filter(
+        followers_count__gte=settings.FEED_FANOUT_FOLLOWER_LIMIT
+    ).update(pull_author=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='profile',
+            name='posts_profile_followers',
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='pull_author',
+            field=models.BooleanField(default=False, verbose_name='Pull author'),
+        ),
+        migrations.RunPython(mark_pull_authors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['pull_author', 'user'], name='posts_profile_pull_author'),
+        ),
+    ]
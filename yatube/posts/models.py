@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import post_image_storage
+
 User = get_user_model()
 
 
@@ -18,7 +20,8 @@ class Post(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Author'
+        verbose_name='Author',
+        db_index=False
     )
     group = models.ForeignKey(
         'Group',
@@ -27,18 +30,49 @@ class Post(models.Model):
         blank=True,
         related_name='posts',
         verbose_name='Группа',
-        help_text='Группа, к которой будет относиться пост'
+        help_text='Группа, к которой будет относиться пост',
+        db_index=False
     )
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=post_image_storage,
         blank=True
     )
+    image_original_size = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Original image size, bytes'
+    )
+    image_size = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Stored image size, bytes'
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Comments count'
+    )
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Ленты автора и группы: поиск по первому столбцу и порядок по
+        # второму; отдельные индексы author и group ими заменены. Индекс
+        # по возрастанию: SQLite читает его с конца, и к pub_date DESC
+        # бесплатно добавляется id DESC, которым KeysetPaginator
+        # разрешает совпадения дат.
+        indexes = [
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='posts_post_author_pub_date'
+            ),
+            models.Index(
+                fields=['group', 'pub_date'],
+                name='posts_post_group_pub_date'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
@@ -71,7 +105,8 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
         null=True,
         blank=True,
-        related_name='comments'
+        related_name='comments',
+        db_index=False
     )
     author = models.ForeignKey(
         User,
@@ -93,6 +128,12 @@ class Comment(models.Model):
         ordering = ['-created']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='posts_comment_post_created'
+            )
+        ]
 
     def __str__(self):
         return self.text[:10]
@@ -107,7 +148,8 @@ class Follow(models.Model):
     author = models.ForeignKey(
         User,
         related_name='following',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
 
     class Meta:
@@ -117,3 +159,134 @@ class Follow(models.Model):
                 name='Подписка один раз'
             )
         ]
+        # Подписчики автора читаются только из индекса
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='posts_follow_author_user'
+            )
+        ]
+
+
+class Inbox(models.Model):
+    """Материализованная лента подписок: пост в ленте пользователя"""
+    user = models.ForeignKey(
+        User,
+        related_name='inbox',
+        on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='inbox_entries',
+        on_delete=models.CASCADE
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Publication date'
+    )
+
+    class Meta:
+        ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'],
+                name='posts_inbox_user_pub_date'
+            )
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='Пост в ленте один раз'
+            )
+        ]
+
+
+class Profile(models.Model):
+    """Денормализованные счётчики пользователя"""
+    user = models.OneToOneField(
+        User,
+        related_name='profile',
+        on_delete=models.CASCADE
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Posts count'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Followers count'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Following count'
+    )
+    # Посты не рассылаются по лентам (см. posts.feeds.followers_changed)
+    pull_author = models.BooleanField(
+        default=False,
+        verbose_name='Pull author'
+    )
+
+    class Meta:
+        verbose_name = 'Профиль'
+        verbose_name_plural = 'Профили'
+        # Поиск pull-авторов (posts.feeds.pull_author_ids) только по индексу
+        indexes = [
+            models.Index(
+                fields=['pull_author', 'user'],
+                name='posts_profile_pull_author'
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f'Профиль {self.user_id}'
+
+
+class ImageBlob(models.Model):
+    """Файл картинки поста и число ссылающихся на него постов"""
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='File name'
+    )
+    refcount = models.PositiveIntegerField(
+        default=0,
+        verbose_name='References'
+    )
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class ImportCheckpoint(models.Model):
+    """Позиция, до которой файл импорта уже записан в БД"""
+    key = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='Import key'
+    )
+    position = models.BigIntegerField(
+        default=0,
+        verbose_name='Last imported record'
+    )
+    imported = models.BigIntegerField(
+        default=0,
+        verbose_name='Imported rows'
+    )
+    skipped = models.BigIntegerField(
+        default=0,
+        verbose_name='Skipped rows'
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Updated'
+    )
+
+    class Meta:
+        verbose_name = 'Точка импорта'
+        verbose_name_plural = 'Точки импорта'
+
+    def __str__(self) -> str:
+        return f'{self.key}: {self.position}'
@@ -0,0 +1,139 @@
+import base64
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .utils import KeysetPage
+
+FTS_TABLE = 'posts_post_fts'
+
+# Маркеры подсветки в snippet(): управляющие символы не встречаются в
+# тексте постов, поэтому их можно заменить на <mark> после экранирования.
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+WORD = re.compile(r'\w+')
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def fts_query(text):
+    """Запрос FTS5 из пользовательского ввода: все слова как префиксы"""
+    words = WORD.findall(text or '')
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def highlight(snippet):
+    """Экранирует фрагмент текста и превращает маркеры в <mark>"""
+    html = escape(snippet)
+    html = html.replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+    return mark_safe(html)
+
+
+def matching_ids(text):
+    """Подзапрос pk постов, подходящих под text, для фильтра pk__in"""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [fts_query(text)],
+    )
+
+
+class SearchPaginator:
+    """Курсорная пагинация результатов FTS5 по (rank, pk)
+
+    Страницы упорядочены по релевантности bm25 (меньше — лучше), при
+    равенстве — по pk. Как и у KeysetPaginator, OFFSET не используется.
+    """
+
+    def __init__(self, text, per_page):
+        self.query = fts_query(text)
+        self.per_page = int(per_page)
+
+    def encode_cursor(self, post, direction):
+        raw = f'{direction}|{post.search_rank!r}|{post.pk}'
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает (направление, rank, pk) или None."""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode()).decode()
+            direction, rank, pk = raw.split('|')
+            rank, pk = float(rank), int(pk)
+        except (TypeError, ValueError):
+            return None
+        if direction not in ('n', 'p'):
+            return None
+        return direction, rank, pk
+
+    def fetch(self, position):
+        """[(pk, rank, snippet)] для страницы после/до position"""
+        sql = (
+            f'SELECT rowid, rank, snippet({FTS_TABLE}, 0, %s, %s, %s, 24) '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        )
+        params = [MARK_START, MARK_END, '…', self.query]
+        order = 'rank, rowid'
+        if position is not None:
+            direction, rank, pk = position
+            if direction == 'p':
+                sql += ' AND (rank < %s OR (rank = %s AND rowid < %s))'
+                order = 'rank DESC, rowid DESC'
+            else:
+                sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+            params += [rank, rank, pk]
+        sql += f' ORDER BY {order} LIMIT %s'
+        params.append(self.per_page + 1)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def get_page(self, cursor):
+        """Возвращает страницу по курсору, при ошибке — первую страницу"""
+        if self.query is None:
+            return KeysetPage([], self, None,
+                              has_next=False, has_previous=False)
+        position = self.decode_cursor(cursor) if cursor else None
+        if position is None:
+            cursor = None
+        rows = self.fetch(position)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        backwards = position is not None and position[0] == 'p'
+        if backwards:
+            rows.reverse()
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, _, _ in rows]
+        )
+        object_list = []
+        for pk, rank, snippet in rows:
+            post = posts.get(pk)
+            if post is None:
+                continue
+            post.search_rank = rank
+            post.search_snippet = highlight(snippet)
+            object_list.append(post)
+        if backwards:
+            return KeysetPage(object_list, self, cursor,
+                              has_next=True, has_previous=has_more)
+        return KeysetPage(object_list, self, cursor,
+                          has_next=has_more, has_previous=cursor is not None)
+
+
+def rebuild_index():
+    """Перестраивает индекс FTS5 по таблице постов"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"
+        )
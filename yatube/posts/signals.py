@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_generation
+from .counters import change_comments, change_profile
+from .feeds import (author_feed_key, backfill_inbox, fan_out_post,
+                    followers_changed, prune_inbox)
+from .media import acquire, release
+from .models import Comment, Follow, Group, Post, Profile
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if update_fields != frozenset(['last_login']):
+        bump_generation('users')
+    if created and not raw:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    bump_generation('users')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    bump_generation('groups')
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    instance._previous_image = None
+    if not instance._state.adding:
+        instance._previous_image = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('image', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    bump_generation('posts')
+    if created and not raw:
+        change_profile(instance.author_id, 'posts_count', 1)
+        fan_out_post(instance)
+    image, previous = instance.image.name, instance._previous_image
+    if image != previous:
+        acquire(image)
+        release(previous)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump_generation('posts')
+    release(instance.image.name)
+    change_profile(instance.author_id, 'posts_count', -1)
+    cache.delete(author_feed_key(instance.author_id))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    bump_generation('comments')
+    if created and not raw:
+        change_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    bump_generation('comments')
+    change_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    # Счётчики профиля меняются через update() без сигналов, а они
+    # показываются на закешированной странице автора
+    bump_generation('follows')
+    if created and not raw:
+        change_profile(instance.user_id, 'following_count', 1)
+        change_profile(instance.author_id, 'followers_count', 1)
+        backfill_inbox(instance.user_id, instance.author_id)
+        followers_changed(instance.author_id, created=True)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    bump_generation('follows')
+    change_profile(instance.user_id, 'following_count', -1)
+    change_profile(instance.author_id, 'followers_count', -1)
+    prune_inbox(instance.user_id, instance.author_id)
+    followers_changed(instance.author_id, created=False)
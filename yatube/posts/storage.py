@@ -0,0 +1,74 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME = re.compile(r'(^|/)([0-9a-f]{2})/\2[0-9a-f]{62}(\.\w+)?$')
+
+
+def is_content_addressed(name):
+    return bool(name and HASHED_NAME.search(name))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, называющее файлы по SHA-256 содержимого
+
+    Хеш считается во время записи загрузки во временный файл, который
+    затем переименовывается в ``<каталог>/<2 символа>/<sha256><расширение>``.
+    Одинаковые загрузки получают одно имя и хранятся один раз, поэтому
+    и миниатюры sorl-thumbnail у них общие. Удалять файлы нужно только
+    когда на них не осталось ссылок (см. posts.media).
+    """
+    @staticmethod
+    def content_name(name, hexdigest):
+        """Имя в хранилище для файла name с хешем содержимого hexdigest"""
+        directory, basename = posixpath.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        return posixpath.join(directory, hexdigest[:2], hexdigest + extension)
+
+    def hashed_name(self, name, content):
+        """Имя, под которым будет сохранён content, без записи на диск"""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        return self.content_name(name, digest.hexdigest())
+
+    def get_available_name(self, name, max_length=None):
+        # Имя всё равно определяется содержимым в _save().
+        return name
+
+    def _save(self, name, content):
+        full_directory = self.path(posixpath.dirname(name))
+        os.makedirs(full_directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=full_directory,
+                                         prefix='.upload-')
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+            name = self.content_name(name, digest.hexdigest())
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                os.replace(temp_path, full_path)
+                # mkstemp() создаёт файл с правами 0600.
+                os.chmod(full_path, self.file_permissions_mode or 0o644)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+
+post_image_storage = ContentAddressedStorage()
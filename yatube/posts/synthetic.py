@@ -0,0 +1,215 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from .bulk import Importer, explicit_dates, refresh_derived
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Тексты собираются из заранее сгенерированных фраз: вызывать Faker на
+# каждый из миллионов постов слишком медленно.
+PHRASE_POOL_SIZE = 2000
+
+
+def skewed_index(rng, count, skew):
+    """Индекс от 0 до count - 1, малые индексы выпадают чаще
+
+    При skew = 0 распределение равномерное, с ростом skew всё больше
+    выборок приходится на первые индексы (популярных авторов и посты).
+    """
+    return min(count - 1, int(count * rng.random() ** (1 + skew)))
+
+
+def dataset_sizes(posts, users=None, groups=None, comments=None,
+                  follows=20):
+    """Размеры набора данных; не заданные явно выводятся из числа постов"""
+    sizes = {
+        'users': users if users is not None else max(10, posts // 20),
+        'groups': groups if groups is not None else max(5, posts // 2000),
+        'posts': posts,
+        'comments': comments if comments is not None else posts // 2,
+        'follows': follows,
+    }
+    if sizes['users'] < 1 or any(value < 0 for value in sizes.values()):
+        raise ValueError('Нужен хотя бы один пользователь, а числа строк '
+                         'не могут быть отрицательными')
+    return sizes
+
+
+class DatasetGenerator:
+    """Наполняет БД правдоподобными данными через bulk_create"""
+
+    def __init__(self, seed=None, locale='ru_RU', batch_size=5000,
+                 skew=2.0, days=365, log=None):
+        self.random = random.Random(seed)
+        self.faker = Faker(locale)
+        self.faker.seed_instance(seed)
+        self.batch_size = batch_size
+        self.skew = skew
+        self.days = days
+        self.log = log or (lambda message: None)
+        self.phrases = [self.faker.sentence(nb_words=10)
+                        for _ in range(PHRASE_POOL_SIZE)]
+        self.stats = {}
+
+    def pick(self, ids):
+        """Элемент ids с перекосом в пользу первых"""
+        return ids[skewed_index(self.random, len(ids), self.skew)]
+
+    def text(self, sentences=3):
+        count = self.random.randint(1, sentences)
+        return ' '.join(self.random.choices(self.phrases, k=count))
+
+    def insert(self, model, objects, total):
+        """Пишет объекты пачками по транзакции, замеряя строк в секунду"""
+        started = time.perf_counter()
+        batch_size = Importer.batch_size(model, self.batch_size)
+        written = 0
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                written += self.flush(model, batch, batch_size)
+                batch = []
+                self.log(f'{model._meta.verbose_name_plural}: '
+                         f'{written}/{total}')
+        if batch:
+            written += self.flush(model, batch, batch_size)
+        elapsed = time.perf_counter() - started
+        self.stats[model._meta.model_name] = {
+            'rows': written,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(written / max(elapsed, 1e-9)),
+        }
+
+    def flush(self, model, batch, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=batch_size,
+                                      ignore_conflicts=model is Follow)
+        return len(batch)
+
+    def new_ids(self, model, after):
+        """pk строк, вставленных после after, в случайном порядке
+
+        Порядок задаёт популярность: чем ближе к началу, тем чаще
+        skewed_index выбирает эту строку.
+        """
+        ids = list(model.objects.filter(pk__gt=after)
+                   .order_by('pk').values_list('pk', flat=True))
+        self.random.shuffle(ids)
+        return ids
+
+    def last_pk(self, model):
+        return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+    def users(self, count):
+        after = self.last_pk(User)
+        password = make_password(None)
+        self.insert(User, (
+            User(username=f'{self.faker.user_name()}_{after + num}',
+                 first_name=self.faker.first_name(),
+                 last_name=self.faker.last_name(),
+                 password=password)
+            for num in range(count)
+        ), count)
+        return self.new_ids(User, after)
+
+    def groups(self, count):
+        after = self.last_pk(Group)
+        self.insert(Group, (
+            Group(title=self.faker.catch_phrase()[:200],
+                  slug=f'group-{after + num}',
+                  description=self.text())
+            for num in range(count)
+        ), count)
+        return self.new_ids(Group, after)
+
+    def posts(self, count, user_ids, group_ids, group_share=0.7):
+        """Посты популярных авторов и групп, даты растут вместе с pk
+
+        Возвращает pk новых постов по возрастанию. Они не обязательно идут
+        подряд от last_pk + 1: AUTOINCREMENT в SQLite не переиспользует
+        pk удалённых постов.
+        """
+        after = self.last_pk(Post)
+        self.start = timezone.now() - timedelta(days=self.days)
+        self.step = timedelta(days=self.days) / max(count, 1)
+
+        def build(num):
+            group_id = None
+            if group_ids and self.random.random() < group_share:
+                group_id = self.pick(group_ids)
+            return Post(
+                author_id=self.pick(user_ids),
+                group_id=group_id,
+                text=self.text(),
+                pub_date=self.start + self.step * num,
+            )
+
+        with explicit_dates(Post, 'pub_date'):
+            self.insert(Post, (build(num) for num in range(count)), count)
+        return list(Post.objects.filter(pk__gt=after)
+                    .order_by('pk').values_list('pk', flat=True))
+
+    def comments(self, count, user_ids, post_ids):
+        """Комментарии, чаще к свежим постам, позже самих постов"""
+        if not post_ids:
+            return
+        now = timezone.now()
+
+        def build():
+            num = len(post_ids) - 1 - skewed_index(
+                self.random, len(post_ids), self.skew
+            )
+            pub_date = self.start + self.step * num
+            return Comment(
+                post_id=post_ids[num],
+                author_id=self.random.choice(user_ids),
+                text=self.text(1),
+                created=min(now, pub_date + timedelta(
+                    minutes=self.random.expovariate(1 / 120)
+                )),
+            )
+
+        with explicit_dates(Comment, 'created'):
+            self.insert(Comment, (build() for _ in range(count)), count)
+
+    def follows(self, per_user, user_ids):
+        """Подписки: в среднем per_user на читателя, чаще на популярных"""
+        def build():
+            for user_id in user_ids:
+                count = self.random.randint(0, 2 * per_user)
+                authors = {self.pick(user_ids) for _ in range(count)}
+                authors.discard(user_id)
+                for author_id in authors:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        self.insert(Follow, build(), len(user_ids) * per_user)
+
+    def generate(self, users, groups, posts, comments, follows,
+                 inboxes=True):
+        """Создаёт набор данных и пересчитывает производные данные
+
+        Без inboxes ленты подписок не материализуются: на миллионах
+        постов это FEED_INBOX_LIMIT строк на каждого читателя.
+        """
+        user_ids = self.users(users)
+        group_ids = self.groups(groups)
+        post_ids = self.posts(posts, user_ids, group_ids)
+        self.comments(comments, user_ids, post_ids)
+        self.follows(follows, user_ids)
+        started = time.perf_counter()
+        self.log('Пересчёт счётчиков и лент')
+        refresh_derived(full=True, inboxes=inboxes)
+        self.stats['refresh_seconds'] = round(
+            time.perf_counter() - started, 3
+        )
+        return self.stats
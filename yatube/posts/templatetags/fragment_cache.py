@@ -0,0 +1,53 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+from ..cache import generations, record_fragment
+
+register = template.Library()
+
+
+class GenerationCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        vary_on = [generations()]
+        vary_on += [var.resolve(context) for var in self.vary_on]
+        cache_key = make_template_fragment_key(self.fragment_name, vary_on)
+        value = cache.get(cache_key)
+        record_fragment(self.fragment_name, hit=value is not None)
+        if value is None:
+            value = self.nodelist.render(context)
+            cache.set(cache_key, value, settings.FRAGMENT_CACHE_TIMEOUT)
+        return value
+
+
+@register.tag('gencache')
+def do_gencache(parser, token):
+    """Кеширует фрагмент до записи Post, Group, User или новых миниатюр
+
+    Использование::
+
+        {% gencache [fragment_name] [var1] [var2] .. %}
+            ...
+        {% endgencache %}
+
+    В отличие от ``{% cache %}`` ключ включает поколения данных, поэтому
+    время жизни (FRAGMENT_CACHE_TIMEOUT) можно делать большим.
+    """
+    nodelist = parser.parse(('endgencache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 2:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 1 argument.'
+        )
+    return GenerationCacheNode(
+        nodelist,
+        tokens[1],
+        [parser.compile_filter(token) for token in tokens[2:]],
+    )
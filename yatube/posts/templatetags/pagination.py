@@ -0,0 +1,10 @@
+from django import template
+
+from ..utils import elided_page_range as page_range
+
+register = template.Library()
+
+
+@register.filter
+def elided_page_range(page_obj, on_each_side=2):
+    return page_range(page_obj.paginator, page_obj.number, on_each_side)
@@ -0,0 +1,68 @@
+from django import template
+from django.conf import settings
+from PIL import Image
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts):
+    """Готовит миниатюры всех постов страницы одним пакетным поиском
+
+    Использование::
+
+        {% prefetch_thumbnails page_obj %}
+        {% for post in page_obj %} ... {% post_image post %} ...
+    """
+    thumbnails.prefetch_thumbnails(posts)
+    return ''
+
+
+def srcset(variants):
+    return ', '.join(f'{thumbnail.url} {width}w'
+                     for width, thumbnail in sorted(variants.items()))
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post, size='card'):
+    """Адаптивная миниатюра картинки поста или заглушка
+
+    Готовые варианты размера size попадают в srcset: формат по умолчанию —
+    в <img>, остальные (WEBP) — в <source> элемента <picture>. Миниатюры
+    не создаются во время запроса: если каких-то вариантов ещё нет,
+    создание ставится в фоновую очередь, а без основного варианта
+    выводится заглушка тех же пропорций.
+    """
+    image = post.image
+    if not image:
+        return {'image': None}
+    found = getattr(post, '_prefetched_thumbnails', None)
+    if found is None:
+        found, = thumbnails.cached_thumbnails([image])
+    formats = {}
+    missing = False
+    for (variant_size, width, format_), thumbnail in found.items():
+        if variant_size != size:
+            continue
+        if thumbnail is None:
+            missing = True
+        else:
+            formats.setdefault(format_, {})[width] = thumbnail
+    if missing:
+        thumbnails.schedule_thumbnails(image)
+    geometry, _ = settings.POST_THUMBNAILS[size]
+    width, _, height = geometry.partition('x')
+    fallback = formats.pop(None, {})
+    thumbnail = fallback.get(int(width))
+    return {
+        'image': image,
+        'thumbnail': thumbnail,
+        'srcset': srcset(fallback),
+        'sources': [(Image.MIME[format_], srcset(variants))
+                    for format_, variants in formats.items()],
+        'sizes': settings.POST_THUMBNAIL_SIZES,
+        'width': width,
+        'height': height or width,
+    }
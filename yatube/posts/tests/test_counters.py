@@ -0,0 +1,82 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post, Profile
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    """Тесты денормализованных счётчиков"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Reader')
+        cls.author = User.objects.create(username='Writer')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(CountersTest.user)
+
+    def profile(self, user):
+        return Profile.objects.get(user=user)
+
+    def test_post_and_comment_counters(self):
+        """Создание и удаление постов и комментариев меняют счётчики"""
+        self.authorized_client.post(reverse('posts:post_create'),
+                                    data={'text': 'Новый пост'})
+        post = Post.objects.get(text='Новый пост')
+        self.assertEqual(self.profile(CountersTest.user).posts_count, 1)
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'коммент'}
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        Comment.objects.get(post=post).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        post.delete()
+        self.assertEqual(self.profile(CountersTest.user).posts_count, 0)
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют счётчики подписчиков и подписок"""
+        kwargs = {'username': CountersTest.author.username}
+        self.authorized_client.get(reverse('posts:profile_follow',
+                                           kwargs=kwargs))
+        self.assertEqual(self.profile(CountersTest.user).following_count, 1)
+        self.assertEqual(self.profile(CountersTest.author).followers_count, 1)
+        self.authorized_client.get(reverse('posts:profile_unfollow',
+                                           kwargs=kwargs))
+        self.assertEqual(self.profile(CountersTest.user).following_count, 0)
+        self.assertEqual(self.profile(CountersTest.author).followers_count, 0)
+
+    def test_profile_page_reads_counters(self):
+        """Страница профиля не считает посты через COUNT(*)"""
+        Post.objects.create(author=CountersTest.author, text='Пост')
+        url = reverse('posts:profile',
+                      kwargs={'username': CountersTest.author.username})
+        with self.assertNumQueries(6):
+            response = self.authorized_client.get(url)
+        self.assertContains(response, 'Всего постов: 1')
+
+    def test_reconcile_counters_repairs_drift(self):
+        """Команда reconcile_counters исправляет расхождения"""
+        post = Post.objects.create(author=CountersTest.author, text='Пост')
+        Comment.objects.create(post=post, author=CountersTest.user,
+                               text='коммент')
+        Profile.objects.filter(user=CountersTest.author).update(
+            posts_count=10
+        )
+        Profile.objects.filter(user=CountersTest.user).delete()
+        Post.objects.filter(pk=post.pk).update(comments_count=5)
+        call_command('reconcile_counters', chunk_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.profile(CountersTest.author).posts_count, 1)
+        self.assertTrue(Profile.objects.filter(user=CountersTest.user)
+                        .exists())
@@ -0,0 +1,211 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.paginator import Page
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from ..feeds import follow_feed, rebuild_inbox, rebuild_inboxes
+from ..models import Follow, Inbox, Post, Profile
+
+User = get_user_model()
+
+
+class InboxTest(TestCase):
+    """Тесты материализованной ленты подписок"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Reader')
+        cls.author = User.objects.create(username='Writer')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(InboxTest.user)
+
+    def follow(self):
+        self.authorized_client.get(
+            reverse('posts:profile_follow',
+                    kwargs={'username': InboxTest.author.username})
+        )
+
+    def test_follow_backfills_and_new_post_fans_out(self):
+        """Подписка заполняет ленту, новый пост попадает в неё сразу"""
+        self.follow()
+        self.assertTrue(Inbox.objects.filter(
+            user=InboxTest.user, post=InboxTest.old_post).exists())
+        new_post = Post.objects.create(author=InboxTest.author,
+                                       text='Пост после подписки')
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [new_post, InboxTest.old_post])
+
+    def test_unfollow_and_delete_prune_inbox(self):
+        """Отписка и удаление поста убирают записи из ленты"""
+        self.follow()
+        post = Post.objects.create(author=InboxTest.author, text='Пост')
+        post.delete()
+        self.assertEqual(Inbox.objects.filter(user=InboxTest.user).count(),
+                         1)
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow',
+                    kwargs={'username': InboxTest.author.username})
+        )
+        self.assertFalse(Inbox.objects.filter(user=InboxTest.user).exists())
+
+    @override_settings(FEED_INBOX_LIMIT=2)
+    def test_inbox_is_capped(self):
+        """Лента не превышает FEED_INBOX_LIMIT записей"""
+        self.follow()
+        posts = [Post.objects.create(author=InboxTest.author,
+                                     text=f'Пост {num}') for num in range(3)]
+        inbox = Inbox.objects.filter(user=InboxTest.user)
+        self.assertEqual(sorted(inbox.values_list('post_id', flat=True)),
+                         [posts[1].pk, posts[2].pk])
+
+    def test_rebuild_inboxes_command(self):
+        """Команда rebuild_inboxes восстанавливает ленты"""
+        Follow.objects.create(user=InboxTest.user, author=InboxTest.author)
+        Inbox.objects.all().delete()
+        call_command('rebuild_inboxes', chunk_size=1, stdout=StringIO())
+        self.assertTrue(Inbox.objects.filter(
+            user=InboxTest.user, post=InboxTest.old_post).exists())
+
+    @override_settings(FEED_INBOX_LIMIT=2)
+    def test_batch_rebuild_matches_single(self):
+        """rebuild_inboxes собирает те же ленты, что и rebuild_inbox"""
+        fan = User.objects.create(username='Fan')
+        for reader in (InboxTest.user, fan):
+            Follow.objects.create(user=reader, author=InboxTest.author)
+        for num in range(3):
+            Post.objects.create(author=InboxTest.author, text=f'Пост {num}')
+
+        def inboxes():
+            return sorted(Inbox.objects.values_list('user_id', 'post_id',
+                                                    'pub_date'))
+
+        for reader in (InboxTest.user, fan):
+            rebuild_inbox(reader.pk)
+        expected = inboxes()
+        Inbox.objects.all().delete()
+        rebuild_inboxes([InboxTest.user.pk, fan.pk])
+        self.assertEqual(inboxes(), expected)
+        self.assertEqual(len(expected), 4)
+
+
+@override_settings(FEED_FANOUT_FOLLOWER_LIMIT=2)
+class HybridFeedTest(TestCase):
+    """Тесты слияния Inbox с лентами pull-авторов"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Reader')
+        cls.fan = User.objects.create(username='Fan')
+        cls.star = User.objects.create(username='Star')
+        cls.author = User.objects.create(username='Writer')
+
+    def setUp(self):
+        cache.clear()
+        Follow.objects.create(user=HybridFeedTest.user,
+                              author=HybridFeedTest.star)
+        Follow.objects.create(user=HybridFeedTest.fan,
+                              author=HybridFeedTest.star)
+        Follow.objects.create(user=HybridFeedTest.user,
+                              author=HybridFeedTest.author)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(HybridFeedTest.user)
+
+    def test_star_posts_are_not_fanned_out(self):
+        """Посты автора с множеством подписчиков не пишутся в Inbox"""
+        post = Post.objects.create(author=HybridFeedTest.star, text='Звезда')
+        self.assertFalse(Inbox.objects.filter(post=post).exists())
+
+    def test_follow_feed_merges_inbox_and_star_posts(self):
+        """Лента подписок сливает Inbox и посты pull-автора по дате"""
+        posts = [
+            Post.objects.create(author=author, text=f'Пост {num}')
+            for num, author in enumerate([HybridFeedTest.star,
+                                          HybridFeedTest.author] * 6)
+        ]
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        page_obj = response.context['page_obj']
+        self.assertIs(type(page_obj), Page)
+        self.assertEqual(list(page_obj), posts[::-1][:10])
+        response = self.authorized_client.get(
+            reverse('posts:follow_index') + '?page=2'
+        )
+        self.assertEqual(list(response.context['page_obj']),
+                         posts[::-1][10:])
+
+    def test_count_skips_inbox_rows_of_pull_authors(self):
+        """Посты, попавшие в Inbox до повышения автора, не считаются
+        дважды"""
+        Follow.objects.filter(user=HybridFeedTest.fan,
+                              author=HybridFeedTest.star).delete()
+        posts = [
+            Post.objects.create(author=author, text=f'Пост {num}')
+            for num, author in enumerate([HybridFeedTest.star,
+                                          HybridFeedTest.author] * 6)
+        ]
+        Follow.objects.create(user=HybridFeedTest.fan,
+                              author=HybridFeedTest.star)
+        feed = follow_feed(HybridFeedTest.user)
+        self.assertEqual(len(feed), len(posts))
+        self.assertEqual(list(feed[:len(feed)]), posts[::-1])
+
+
+@override_settings(FEED_FANOUT_FOLLOWER_LIMIT=4, FEED_FANOUT_HYSTERESIS=0.25,
+                   FEED_BACKFILL_BACKGROUND=False)
+class PullAuthorSwitchTest(TransactionTestCase):
+    """Переключение автора между рассылкой и слиянием при чтении"""
+
+    def setUp(self):
+        cache.clear()
+        self.star = User.objects.create(username='Star')
+        self.user = User.objects.create(username='Reader')
+        self.fans = [User.objects.create(username=f'Fan{num}')
+                     for num in range(3)]
+        for follower in [self.user, *self.fans]:
+            Follow.objects.create(user=follower, author=self.star)
+
+    def is_pull_author(self):
+        return Profile.objects.get(user=self.star).pull_author
+
+    def unfollow(self, fan):
+        Follow.objects.filter(user=fan, author=self.star).delete()
+
+    def test_demotion_has_hysteresis(self):
+        """Автор остаётся pull-автором, пока подписчиков не меньше трёх
+        четвертей порога, и снова становится им лишь на пороге"""
+        self.assertTrue(self.is_pull_author())
+        self.unfollow(self.fans[0])
+        self.assertTrue(self.is_pull_author())
+        self.unfollow(self.fans[1])
+        self.assertFalse(self.is_pull_author())
+        Follow.objects.create(user=self.fans[0], author=self.star)
+        self.assertFalse(self.is_pull_author())
+        Follow.objects.create(user=self.fans[1], author=self.star)
+        self.assertTrue(self.is_pull_author())
+
+    def test_demoted_author_posts_stay_in_feed(self):
+        """Посты, созданные, пока автор был pull-автором, дописываются в
+        ленты подписчиков после его понижения"""
+        post = Post.objects.create(author=self.star, text='Звезда')
+        self.assertFalse(Inbox.objects.filter(post=post).exists())
+        self.assertIn(post, list(follow_feed(self.user)))
+        self.unfollow(self.fans[0])
+        self.unfollow(self.fans[1])
+        self.assertIn(post, list(follow_feed(self.user)))
+        self.assertEqual(
+            set(Inbox.objects.filter(post=post)
+                .values_list('user_id', flat=True)),
+            {self.user.pk, self.fans[2].pk}
+        )
@@ -1,13 +1,24 @@
+import hashlib
+import shutil
+import tempfile
 from http import HTTPStatus
+from io import BytesIO
 
+from django import forms
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Post
+from ..storage import is_content_addressed, post_image_storage
 
 User = get_user_model()
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
 
 class FormsPostTest(TestCase):
     """Тестирование форм"""
@@ -68,3 +79,105 @@ class FormsPostTest(TestCase):
                                      kwargs={'post_id': old_post.pk}))
         edit_post = Post.objects.get(pk=old_post.pk)
         self.assertEqual(edit_post.text, form_data['text'])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT,
+                   POST_IMAGE_MAX_DIMENSIONS=(800, 800))
+class PostImageNormalizationTest(TestCase):
+    """Тесты обработки картинок постов при загрузке"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(
+            PostImageNormalizationTest.user
+        )
+
+    def create_post(self, name, content):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': name,
+                'image': SimpleUploadedFile(name, content),
+            }
+        )
+        return Post.objects.get(text=name)
+
+    def test_large_photo_is_resized_and_stripped(self):
+        """Большое фото уменьшается, теряет EXIF и весит меньше"""
+        buffer = BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = 'Phone'
+        Image.effect_noise((1600, 1200), 32).convert('RGB').save(
+            buffer, 'PNG', exif=exif
+        )
+        post = self.create_post('photo.png', buffer.getvalue())
+        self.assertTrue(is_content_addressed(post.image.name))
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        self.assertEqual(post.image_original_size, len(buffer.getvalue()))
+        self.assertEqual(post.image_size, post.image.size)
+        self.assertLess(post.image_size, post.image_original_size)
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (800, 600))
+            self.assertNotIn('exif', image.info)
+
+    def test_small_image_is_kept_when_reencoding_does_not_help(self):
+        """Маленькую картинку без метаданных не пережимают"""
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        post = self.create_post('small.gif', small_gif)
+        self.assertEqual(
+            post.image.name,
+            post_image_storage.content_name(
+                'posts/small.gif', hashlib.sha256(small_gif).hexdigest()
+            )
+        )
+        self.assertEqual(post.image_original_size, post.image_size)
+
+    def test_truncated_image_is_rejected(self):
+        """Обрезанный JPEG — ошибка формы, а не 500"""
+        buffer = BytesIO()
+        Image.effect_noise((3000, 3000), 32).convert('RGB').save(
+            buffer, 'JPEG'
+        )
+        content = buffer.getvalue()
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Обрезанная картинка',
+                'image': SimpleUploadedFile('cut.jpg',
+                                            content[:len(content) // 2]),
+            }
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFormError(
+            response, 'form', 'image',
+            forms.ImageField.default_error_messages['invalid_image']
+        )
+        self.assertFalse(
+            Post.objects.filter(text='Обрезанная картинка').exists()
+        )
+
+    def test_transparent_image_stays_png(self):
+        """Картинка с прозрачностью не превращается в JPEG"""
+        buffer = BytesIO()
+        Image.new('RGBA', (1000, 500), (255, 0, 0, 128)).save(buffer, 'PNG')
+        post = self.create_post('alpha.png', buffer.getvalue())
+        self.assertTrue(post.image.name.endswith('.png'))
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (800, 400))
+            self.assertEqual(image.mode, 'RGBA')
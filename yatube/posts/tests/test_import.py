@@ -0,0 +1,130 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import (Comment, Follow, Group, ImportCheckpoint, Inbox, Post,
+                      Profile)
+
+User = get_user_model()
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class ImportDataTest(TestCase):
+    """Тесты массового импорта import_data"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Writer')
+        cls.reader = User.objects.create(username='Reader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(TEMP_DIR, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def write_jsonl(self, name, records):
+        return self.write(name, ''.join(
+            (record if isinstance(record, str) else json.dumps(record)) + '\n'
+            for record in records
+        ))
+
+    def posts_count(self, user):
+        return Profile.objects.get(user=user).posts_count
+
+    def run_import(self, *args, **options):
+        out, err = StringIO(), StringIO()
+        call_command('import_data', *args, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_groups_posts_comments_and_follows(self):
+        """Импорт всех моделей с пересчётом счётчиков и лент"""
+        groups = self.write('groups.csv',
+                            'slug,title,description\ncats,Котики,\n')
+        self.run_import('groups', groups)
+        group = Group.objects.get(slug='cats')
+        follows = self.write_jsonl('follows.jsonl', [
+            {'user': 'Reader', 'author': 'Writer'},
+        ])
+        self.run_import('follows', follows)
+        self.assertTrue(Follow.objects.filter(
+            user=ImportDataTest.reader, author=ImportDataTest.author
+        ).exists())
+        posts = self.write_jsonl('posts.jsonl', [
+            {'id': 500, 'author': 'Writer', 'text': 'Первый', 'group': 'cats',
+             'pub_date': '2020-01-02T03:04:05'},
+            {'author': 'Writer', 'text': 'Второй'},
+        ])
+        out, _ = self.run_import('posts', posts, batch_size=1)
+        self.assertIn('строк/с', out)
+        post = Post.objects.get(pk=500)
+        self.assertEqual(post.group, group)
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(self.posts_count(ImportDataTest.author), 2)
+        self.assertEqual(
+            Inbox.objects.filter(user=ImportDataTest.reader).count(), 2
+        )
+        comments = self.write('comments.csv',
+                              'post,author,text\n500,Reader,Класс\n')
+        self.run_import('comments', comments)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Comment.objects.get().author, ImportDataTest.reader)
+
+    def test_invalid_rows_are_skipped(self):
+        """Битые записи пропускаются с номером строки, остальные пишутся"""
+        path = self.write_jsonl('broken.jsonl', [
+            {'author': 'Writer', 'text': 'Хороший'},
+            'не json',
+            {'author': 'Nobody', 'text': 'Чужой'},
+            {'author': 'Writer', 'text': 'Без группы', 'group': 'nope'},
+        ])
+        out, err = self.run_import('posts', path)
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertIn('Запись 2 пропущена', err)
+        self.assertIn('Запись 3 пропущена', err)
+        self.assertIn('Запись 4 пропущена', err)
+        self.assertIn('Импортировано: 1, пропущено: 3', out)
+
+    def test_create_users(self):
+        """С --create-users незнакомые авторы создаются без пароля"""
+        path = self.write_jsonl('new_users.jsonl', [
+            {'author': 'Newbie', 'text': 'Привет'},
+        ])
+        self.run_import('posts', path, create_users=True)
+        user = User.objects.get(username='Newbie')
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(self.posts_count(user), 1)
+
+    def test_resume_from_checkpoint(self):
+        """--resume продолжает после последней сохранённой пачки"""
+        path = self.write_jsonl('resume.jsonl', [
+            {'author': 'Writer', 'text': f'Пост {num}'} for num in range(5)
+        ])
+        self.run_import('posts', path, chunk_size=2)
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual(checkpoint.position, 5)
+        # Имитируем падение после первой пачки
+        Post.objects.filter(text__in=['Пост 2', 'Пост 3', 'Пост 4']).delete()
+        checkpoint.position = 2
+        checkpoint.save()
+        out, _ = self.run_import('posts', path, chunk_size=2, resume=True)
+        self.assertIn('Продолжение после записи 2', out)
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            [f'Пост {num}' for num in range(5)]
+        )
+        self.assertEqual(self.posts_count(ImportDataTest.author), 5)
@@ -0,0 +1,156 @@
+import os
+import shutil
+import tempfile
+import threading
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from core.writes import writer
+
+from ..media import acquire, delete_file
+from ..models import ImageBlob, Post
+from ..storage import is_content_addressed, post_image_storage
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    """Тесты хранения картинок постов по хешу содержимого"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ContentAddressedStorageTest.user)
+
+    def create_post(self, text, name):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': text,
+                  'image': SimpleUploadedFile(name, SMALL_GIF)}
+        )
+        return Post.objects.get(text=text)
+
+    def test_identical_uploads_share_one_file(self):
+        """Одинаковые картинки хранятся один раз со счётчиком ссылок"""
+        first = self.create_post('Мем', 'meme.gif')
+        second = self.create_post('Репост мема', 'repost.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(is_content_addressed(first.image.name))
+        blob = ImageBlob.objects.get(name=first.image.name)
+        self.assertEqual(blob.refcount, 2)
+        first.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.refcount, 1)
+        self.assertTrue(post_image_storage.exists(second.image.name))
+
+    def test_file_is_deleted_with_last_reference(self):
+        """Файл без ссылок удаляется вместе с записью ImageBlob"""
+        post = self.create_post('Единственный', 'single.gif')
+        name = post.image.name
+        post.delete()
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
+        # В TestCase on_commit не срабатывает, вызываем удаление сами.
+        delete_file(name)
+        self.assertFalse(post_image_storage.exists(name))
+
+    def test_dedupe_command_moves_legacy_files(self):
+        """dedupe_media переносит старые файлы и склеивает дубликаты"""
+        legacy = FileSystemStorage()
+        names = [legacy.save(f'posts/legacy_{i}.gif', ContentFile(SMALL_GIF))
+                 for i in range(2)]
+        posts = [Post.objects.create(author=ContentAddressedStorageTest.user,
+                                     text=f'Старый пост {i}', image=name)
+                 for i, name in enumerate(names)]
+        out = StringIO()
+        call_command('dedupe_media', stdout=out)
+        for post in posts:
+            post.refresh_from_db()
+        self.assertEqual(posts[0].image.name, posts[1].image.name)
+        self.assertTrue(is_content_addressed(posts[0].image.name))
+        self.assertEqual(
+            ImageBlob.objects.get(name=posts[0].image.name).refcount, 2
+        )
+        for name in names:
+            self.assertFalse(
+                os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name))
+            )
+        self.assertIn(f'освобождено байт: {len(SMALL_GIF)}', out.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DeleteFileRaceTest(TransactionTestCase):
+    """Удаление файла без ссылок и загрузка того же содержимого"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_delete_waits_for_upload_in_writer(self):
+        """Файл, найденный загрузкой до коммита её ссылки, не удаляется"""
+        name = post_image_storage.save('posts/orphan.gif',
+                                       ContentFile(SMALL_GIF))
+        saved = threading.Event()
+        proceed = threading.Event()
+
+        def upload():
+            uploaded = post_image_storage.save('posts/again.gif',
+                                               ContentFile(SMALL_GIF))
+            saved.set()
+            proceed.wait(5)
+            acquire(uploaded)
+            return uploaded
+
+        errors = []
+
+        def remove():
+            try:
+                delete_file(name)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        job = writer.submit(upload, (), {}, False)
+        saved.wait(5)
+        remover = threading.Thread(target=remove)
+        remover.start()
+        remover.join(0.2)
+        # Проверка ссылок ждёт, пока писатель закончит загрузку
+        self.assertTrue(remover.is_alive())
+        proceed.set()
+        self.assertEqual(job.result(), name)
+        remover.join()
+        self.assertEqual(errors, [])
+        self.assertTrue(post_image_storage.exists(name))
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 1)
@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class AnonymousPageCacheTest(TestCase):
+    """Тесты кеша страниц для анонимных пользователей"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Поклонники',
+            slug='Fan',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Текстовый пост',
+            group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(AnonymousPageCacheTest.user)
+
+    def test_repeat_request_is_served_from_cache(self):
+        """Повторный запрос отдаётся из кеша без рендеринга шаблона"""
+        url = reverse('posts:index')
+        first = self.guest_client.get(url)
+        self.assertIsNotNone(first.context)
+        second = self.guest_client.get(url)
+        self.assertIsNone(second.context)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_conditional_get_returns_not_modified(self):
+        """ETag и Last-Modified дают ответ 304"""
+        url = reverse('posts:group_list',
+                      kwargs={'slug': AnonymousPageCacheTest.group.slug})
+        response = self.guest_client.get(url)
+        self.assertEqual(
+            self.guest_client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            ).status_code,
+            304
+        )
+        self.assertEqual(
+            self.guest_client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            ).status_code,
+            304
+        )
+
+    def test_writes_invalidate_page(self):
+        """Новый комментарий и правка группы сразу видны"""
+        url = reverse('posts:post_detail',
+                      kwargs={'post_id': AnonymousPageCacheTest.post.pk})
+        etag = self.guest_client.get(url)['ETag']
+        Comment.objects.create(post=AnonymousPageCacheTest.post,
+                               author=AnonymousPageCacheTest.user,
+                               text='Новый комментарий')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый комментарий')
+        group = AnonymousPageCacheTest.group
+        group.title = 'Новое название'
+        group.save()
+        self.assertContains(self.guest_client.get(url), 'Новое название')
+
+    def test_follows_invalidate_profile(self):
+        """Подписка и отписка сразу меняют счётчики на странице автора"""
+        author = AnonymousPageCacheTest.user
+        fan = User.objects.create(username='Fan')
+        url = reverse('posts:profile', kwargs={'username': author.username})
+        etag = self.guest_client.get(url)['ETag']
+        follow = Follow.objects.create(user=fan, author=author)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Подписчиков: 1,')
+        etag = response['ETag']
+        follow.delete()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Подписчиков: 0,')
+
+    def test_authorized_requests_are_not_cached(self):
+        """Авторизованные пользователи всегда получают свежую страницу"""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        response = self.authorized_client.get(url)
+        self.assertIsNotNone(response.context)
+        self.assertFalse(response.has_header('ETag'))
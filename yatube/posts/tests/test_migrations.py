@@ -0,0 +1,43 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase, override_settings
+
+
+class InboxMigrationTest(TransactionTestCase):
+    """Миграция 0012 заполняет ленты по существующим подпискам"""
+    migrate_from = [('posts', '0011_auto_20230313_1331')]
+    migrate_to = [('posts', '0012_inbox')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    @override_settings(FEED_INBOX_LIMIT=2)
+    def test_inboxes_are_filled(self):
+        """Последние FEED_INBOX_LIMIT постов авторов, на которых подписан
+        пользователь"""
+        apps = self.migrate(self.migrate_from)
+        User = apps.get_model('auth', 'User')
+        Post = apps.get_model('posts', 'Post')
+        Follow = apps.get_model('posts', 'Follow')
+        reader = User.objects.create(username='Reader')
+        author = User.objects.create(username='Writer')
+        stranger = User.objects.create(username='Stranger')
+        posts = [Post.objects.create(author=author, text=f'Пост {num}')
+                 for num in range(3)]
+        Post.objects.create(author=stranger, text='Чужой пост')
+        Follow.objects.create(user=reader, author=author)
+
+        apps = self.migrate(self.migrate_to)
+        Inbox = apps.get_model('posts', 'Inbox')
+        self.assertEqual(
+            list(Inbox.objects.order_by('-pub_date')
+                 .values_list('user_id', 'post_id')),
+            [(reader.pk, post.pk) for post in posts[:0:-1]]
+        )
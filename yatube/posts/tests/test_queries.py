@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class QueryBudgetTest(TestCase):
+    """Число запросов страниц не зависит от числа объектов на них"""
+    SIZES = (1, 10, 100)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username='Reader')
+        cls.writer = User.objects.create(username='Writer')
+        cls.group = Group.objects.create(
+            title='Поклонники',
+            slug='Fan',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.writer,
+            text='Пост для комментариев',
+            group=cls.group
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': cls.writer.username}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+            reverse('posts:follow_index'),
+        )
+
+    def setUp(self):
+        self.created = 0
+        self.authorized_client = Client()
+        self.authorized_client.force_login(QueryBudgetTest.reader)
+
+    def grow(self, size):
+        """Добавляет авторов, посты, комментарии и подписки до size"""
+        while self.created < size:
+            num = self.created
+            author = User.objects.create(username=f'Author{num}')
+            Post.objects.create(author=author, text=f'Пост {num}',
+                                group=QueryBudgetTest.group)
+            Post.objects.create(author=QueryBudgetTest.writer,
+                                text=f'Пост автора {num}',
+                                group=QueryBudgetTest.group)
+            Comment.objects.create(post=QueryBudgetTest.post, author=author,
+                                   text=f'Комментарий {num}')
+            Follow.objects.create(user=QueryBudgetTest.reader, author=author)
+            self.created += 1
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        """Страницы лент и поста выполняют постоянное число запросов"""
+        counts = {url: [] for url in QueryBudgetTest.urls}
+        for size in QueryBudgetTest.SIZES:
+            self.grow(size)
+            for url in QueryBudgetTest.urls:
+                counts[url].append(self.count_queries(url))
+        for url, url_counts in counts.items():
+            with self.subTest(url=url):
+                self.assertEqual(len(set(url_counts)), 1,
+                                 f'{url}: {url_counts}')
@@ -0,0 +1,129 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, Profile
+from ..synthetic import DatasetGenerator, dataset_sizes
+
+User = get_user_model()
+
+# Полный проход таблицы без индекса и сортировка во временном B-дереве
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class QueryPlanTest(TestCase):
+    """Запросы страниц идут по индексам, без полных проходов и сортировок"""
+
+    @classmethod
+    def setUpTestData(cls):
+        DatasetGenerator(seed=3).generate(
+            **dataset_sizes(600, users=30, groups=4, comments=600, follows=5)
+        )
+        cls.reader = Profile.objects.order_by('-following_count').first().user
+        cls.author = Profile.objects.order_by('-posts_count').first().user
+        cls.post = Post.objects.order_by('-comments_count').first()
+        cls.group = Group.objects.first()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(QueryPlanTest.reader)
+
+    def plans(self, url):
+        """Планы всех SELECT, выполненных при запросе url"""
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [(query['sql'], query_plan(query['sql']))
+                for query in queries
+                if query['sql'].startswith('SELECT')]
+
+    def assertIndexedPlans(self, url):
+        plans = self.plans(url)
+        for sql, plan in plans:
+            for detail in plan:
+                with self.subTest(url=url, sql=sql, detail=detail):
+                    self.assertIsNone(FULL_SCAN.match(detail))
+                    self.assertNotIn(TEMP_SORT, detail)
+        return plans
+
+    def assertUsesIndex(self, plans, index):
+        self.assertTrue(
+            any(index in detail for _, plan in plans for detail in plan),
+            f'{index} не используется'
+        )
+
+    def test_index(self):
+        """Главная: посты по индексу pub_date"""
+        self.assertIndexedPlans(reverse('posts:index'))
+
+    def test_group_list(self):
+        """Лента группы"""
+        plans = self.assertIndexedPlans(reverse(
+            'posts:group_list', kwargs={'slug': QueryPlanTest.group.slug}
+        ))
+        self.assertUsesIndex(plans, 'posts_post_group_pub_date')
+
+    def test_profile(self):
+        """Лента автора"""
+        plans = self.assertIndexedPlans(reverse(
+            'posts:profile',
+            kwargs={'username': QueryPlanTest.author.username}
+        ))
+        self.assertUsesIndex(plans, 'posts_post_author_pub_date')
+
+    @override_settings(KEYSET_PAGINATION_VIEWS=['posts:profile'])
+    def test_keyset_pages(self):
+        """Следующая страница ленты автора по курсору"""
+        url = reverse('posts:profile',
+                      kwargs={'username': QueryPlanTest.author.username})
+        response = self.client.get(url)
+        cursor = response.context['page_obj'].next_cursor
+        plans = self.assertIndexedPlans(f'{url}?cursor={cursor}')
+        self.assertUsesIndex(plans, 'posts_post_author_pub_date')
+
+    def test_post_detail(self):
+        """Комментарии поста и их следующая страница по курсору"""
+        post_id = QueryPlanTest.post.pk
+        self.assertGreater(Comment.objects.filter(post_id=post_id).count(),
+                           20)
+        url = reverse('posts:post_detail', kwargs={'post_id': post_id})
+        plans = self.assertIndexedPlans(url)
+        self.assertUsesIndex(plans, 'posts_comment_post_created')
+        cursor = self.client.get(url).context['comments'].next_cursor
+        plans = self.assertIndexedPlans(
+            reverse('posts:post_comments', kwargs={'post_id': post_id})
+            + f'?cursor={cursor}'
+        )
+        self.assertUsesIndex(plans, 'posts_comment_post_created')
+
+    def test_follow_index(self):
+        """Лента подписок: Inbox и pull-авторы"""
+        plans = self.assertIndexedPlans(reverse('posts:follow_index'))
+        self.assertUsesIndex(plans, 'posts_inbox_user_pub_date')
+        self.assertUsesIndex(plans, 'posts_profile_pull_author')
+
+    def test_followers_lookup(self):
+        """Подписчики автора читаются из индекса (раздача постов в ленты)"""
+        author_id = QueryPlanTest.author.pk
+        plan = query_plan(str(
+            Follow.objects.filter(author_id=author_id)
+            .values_list('user_id', flat=True).query
+        ))
+        self.assertEqual(
+            plan, ['SEARCH posts_follow USING COVERING INDEX '
+                   'posts_follow_author_user (author_id=?)']
+        )
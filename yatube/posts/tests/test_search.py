@@ -0,0 +1,104 @@
+from io import StringIO
+
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..admin import PostAdmin
+from ..models import Post
+from ..search import FTS_TABLE, SearchPaginator
+from ..views import NUM_POST
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    """Тесты полнотекстового поиска по постам"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Котики <b>захватили</b> интернет'
+        )
+        Post.objects.create(author=cls.user, text='Собаки тоже ничего')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        return self.guest_client.get(reverse('posts:search'),
+                                     {'q': query, **params})
+
+    def test_search_highlights_and_escapes(self):
+        """Найденное слово подсвечивается, HTML из текста экранируется"""
+        response = self.search('котик')
+        page = response.context['page_obj']
+        self.assertEqual([post.pk for post in page], [SearchTest.post.pk])
+        self.assertContains(response, '<mark>Котики</mark>')
+        self.assertContains(response, '&lt;b&gt;захватили&lt;/b&gt;')
+        self.assertEqual(len(self.search('кошка').context['page_obj']), 0)
+
+    def test_index_follows_edit_and_delete(self):
+        """Индекс обновляется при правке и удалении поста"""
+        post = Post.objects.create(author=SearchTest.user,
+                                   text='Старый текст')
+        post.text = 'Новый текст про жирафа'
+        post.save()
+        self.assertEqual(len(self.search('старый').context['page_obj']), 0)
+        self.assertEqual(
+            [p.pk for p in self.search('жираф').context['page_obj']],
+            [post.pk]
+        )
+        post.delete()
+        self.assertEqual(len(self.search('жираф').context['page_obj']), 0)
+
+    def test_results_are_ranked_and_paginated_by_cursor(self):
+        """Более релевантные посты выше, страницы идут по курсору"""
+        best = Post.objects.create(author=SearchTest.user,
+                                   text='слон слон слон')
+        Post.objects.bulk_create([
+            Post(author=SearchTest.user,
+                 text=f'слон и ещё очень много других слов номер {num}')
+            for num in range(NUM_POST + 2)
+        ])
+        first = self.search('слон').context['page_obj']
+        self.assertEqual(first[0].pk, best.pk)
+        self.assertEqual(len(first), NUM_POST)
+        self.assertTrue(first.has_next())
+        second = self.search('слон', cursor=first.next_cursor)
+        second = second.context['page_obj']
+        self.assertEqual(len(second), 3)
+        self.assertFalse(second.has_next())
+        self.assertFalse(
+            {post.pk for post in first} & {post.pk for post in second}
+        )
+        previous = SearchPaginator('слон', NUM_POST).get_page(
+            second.previous_cursor
+        )
+        self.assertEqual([post.pk for post in previous],
+                         [post.pk for post in first])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через MATCH, а не через LIKE"""
+        admin = PostAdmin(Post, AdminSite())
+        queryset, distinct = admin.get_search_results(
+            None, Post.objects.all(), 'собаки'
+        )
+        self.assertIn('MATCH', str(queryset.query))
+        self.assertNotIn('LIKE', str(queryset.query))
+        self.assertEqual(queryset.count(), 1)
+
+    def test_rebuild_command_restores_index(self):
+        """rebuild_search_index заполняет очищенный индекс заново"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"
+            )
+        self.assertEqual(len(self.search('котики').context['page_obj']), 0)
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('котики').context['page_obj']), 1)
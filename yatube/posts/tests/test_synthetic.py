@@ -0,0 +1,69 @@
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Inbox, Post, Profile
+from ..synthetic import DatasetGenerator, dataset_sizes
+
+User = get_user_model()
+
+
+class DatasetGeneratorTest(TestCase):
+    """Тесты генератора синтетических данных"""
+
+    def test_generate_data_command(self):
+        """Команда создаёт заданные объёмы и согласованные счётчики"""
+        out = StringIO()
+        call_command('generate_data', posts=300, users=20, groups=3,
+                     comments=100, follows=4, seed=1, batch_size=50,
+                     stdout=out, stderr=StringIO())
+        stats = json.loads(out.getvalue())
+        self.assertEqual(stats['post']['rows'], 300)
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertTrue(Follow.objects.exists())
+        self.assertFalse(Follow.objects.filter(
+            user_id=F('author_id')).exists())
+        profile = Profile.objects.order_by('-posts_count').first()
+        self.assertEqual(profile.posts_count,
+                         Post.objects.filter(author=profile.user).count())
+        reader = Follow.objects.first().user
+        self.assertTrue(Inbox.objects.filter(user=reader).exists())
+
+    def test_popularity_is_skewed(self):
+        """Посты и комментарии сосредоточены у популярных авторов и постов"""
+        sizes = dataset_sizes(2000, users=50, comments=2000, follows=0)
+        DatasetGenerator(seed=2).generate(**sizes)
+        counts = sorted(
+            Post.objects.order_by().values('author')
+            .annotate(count=Count('pk')).values_list('count', flat=True),
+            reverse=True
+        )
+        self.assertGreater(counts[0], 5 * 2000 / 50)
+        last_posts = Post.objects.order_by('-pk')[:200]
+        recent = Comment.objects.filter(post__in=last_posts).count()
+        self.assertGreater(recent, 2000 * 200 / 2000 * 3)
+        self.assertFalse(Comment.objects.filter(
+            created__lt=F('post__pub_date')).exists())
+
+    def test_comments_after_deleted_posts(self):
+        """Комментарии ссылаются на новые посты, даже если pk последних
+        постов были удалены и новые идут не с last_pk + 1"""
+        sizes = dataset_sizes(50, users=5, comments=0, follows=0)
+        DatasetGenerator(seed=4).generate(**sizes)
+        Post.objects.exclude(pk=Post.objects.order_by('pk').first().pk
+                             ).delete()
+        sizes = dataset_sizes(50, users=5, comments=200, follows=0)
+        DatasetGenerator(seed=5).generate(**sizes)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertEqual(
+            Comment.objects.filter(post__isnull=True).count(), 0
+        )
+        self.assertFalse(Comment.objects.filter(
+            created__lt=F('post__pub_date')).exists())
@@ -0,0 +1,184 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail.base import ThumbnailBackend
+
+from ..cache import get_generation, thumbnail_stats
+from ..models import Post
+from ..thumbnails import (DraftEngine, all_variants, cached_thumbnail,
+                          generate_thumbnails, pending_key,
+                          prefetch_thumbnails, schedule_thumbnails,
+                          thumbnail_variants)
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def gif_bytes(color):
+    buffer = BytesIO()
+    Image.new('RGB', (2, 1), color).save(buffer, 'GIF')
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostThumbnailTest(TestCase):
+    """Тесты фонового создания миниатюр"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='thumb.gif',
+                content=SMALL_GIF,
+                content_type='image/gif'
+            )
+        )
+        cls.other_posts = [
+            Post.objects.create(
+                author=cls.user,
+                text=f'Пост {i}',
+                image=SimpleUploadedFile(
+                    name=f'thumb_{i}.gif',
+                    content=gif_bytes((i, 0, 0)),
+                    content_type='image/gif'
+                )
+            )
+            for i in range(3)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_page_shows_placeholder_until_thumbnail_exists(self):
+        """Без готовой миниатюры страница не ждёт её создания"""
+        image = PostThumbnailTest.post.image
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'aspect-ratio: 960 / 339')
+        self.assertIsNone(cached_thumbnail(image, 'card'))
+        self.assertTrue(cache.get(pending_key(image.name)))
+
+    def test_generated_thumbnail_is_rendered(self):
+        """После фоновой задачи страница показывает миниатюру"""
+        image = PostThumbnailTest.post.image
+        self.guest_client.get(reverse('posts:index'))
+        generation = get_generation('thumbnails')
+        generate_thumbnails(image.name)
+        thumbnail = cached_thumbnail(image, 'card')
+        self.assertIsNotNone(thumbnail)
+        self.assertGreater(get_generation('thumbnails'), generation)
+        self.assertIsNone(cache.get(pending_key(image.name)))
+        response = self.guest_client.get(
+            reverse('posts:post_detail',
+                    kwargs={'post_id': PostThumbnailTest.post.pk})
+        )
+        self.assertContains(response, thumbnail.url)
+
+    @override_settings(POST_THUMBNAIL_WIDTHS=(480,),
+                       POST_THUMBNAIL_FORMATS=('WEBP',))
+    def test_card_lists_width_and_format_variants(self):
+        """Карточка выводит srcset по ширинам и WEBP в <source>"""
+        self.assertEqual(
+            set(thumbnail_variants('card')),
+            {(480, None), (960, None), (480, 'WEBP'), (960, 'WEBP')}
+        )
+        generate_thumbnails(PostThumbnailTest.post.image.name)
+        response = self.guest_client.get(reverse('posts:index'))
+        found = response.content.decode()
+        self.assertIn('loading="lazy"', found)
+        self.assertIn('width="960" height="339"', found)
+        self.assertIn('<source type="image/webp"', found)
+        for width in (480, 960):
+            self.assertRegex(found, rf'srcset="[^"]*\.jpg {width}w')
+            self.assertRegex(found, rf'srcset="[^"]*\.webp {width}w')
+
+    def test_schedule_is_deduplicated(self):
+        """Пока задача в очереди, повторно она не ставится"""
+        image = PostThumbnailTest.post.image
+        schedule_thumbnails(image)
+        cache.set(pending_key(image.name), 'first')
+        schedule_thumbnails(image)
+        self.assertEqual(cache.get(pending_key(image.name)), 'first')
+
+    def test_prefetch_uses_one_batched_lookup(self):
+        """Миниатюры страницы ищутся одним запросом, затем только в кеше"""
+        posts = list(Post.objects.all())
+        generate_thumbnails(PostThumbnailTest.post.image.name)
+        cache.clear()
+        with self.assertNumQueries(1):
+            prefetch_thumbnails(posts)
+        ready = {post.pk for post in posts
+                 if post._prefetched_thumbnails['card', 960, None]}
+        self.assertEqual(ready, {PostThumbnailTest.post.pk})
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(0):
+            prefetch_thumbnails(posts)
+        variants = len(all_variants())
+        stats = thumbnail_stats()
+        self.assertEqual(stats['lookups'], 2)
+        self.assertEqual(stats['hits'], 2 * variants)
+        self.assertEqual(stats['misses'], 2 * 3 * variants)
+
+    def test_feed_page_does_not_look_up_thumbnails_per_post(self):
+        """Лента не ходит в KVStore отдельно за каждой картинкой"""
+        self.guest_client.get(reverse('posts:index'))
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(reverse('posts:index'))
+        kvstore_queries = [query for query in queries.captured_queries
+                           if 'thumbnail_kvstore' in query['sql']]
+        self.assertEqual(len(kvstore_queries), 1)
+
+
+class DraftEngineTest(TestCase):
+    """Тесты движка миниатюр с уменьшенным декодированием JPEG"""
+    def open_jpeg(self, size):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'white').save(buffer, 'JPEG')
+        return Image.open(BytesIO(buffer.getvalue()))
+
+    def test_large_jpeg_is_decoded_at_reduced_scale(self):
+        """Фото с телефона декодируется не в полном разрешении"""
+        image = self.open_jpeg((4000, 3000))
+        options = dict(ThumbnailBackend.default_options,
+                       crop='center', upscale=True)
+        thumbnail = DraftEngine().create(image, (960, 339), options)
+        self.assertEqual(thumbnail.size, (960, 339))
+        self.assertEqual(image.size, (2000, 1500))
+
+    def test_small_jpeg_is_decoded_in_full(self):
+        """Картинку меньше двойного размера миниатюры не уменьшают заранее"""
+        image = self.open_jpeg((1200, 900))
+        options = dict(ThumbnailBackend.default_options,
+                       crop='center', upscale=True)
+        thumbnail = DraftEngine().create(image, (960, 339), options)
+        self.assertEqual(thumbnail.size, (960, 339))
+        self.assertEqual(image.size, (1200, 900))
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -6,10 +7,17 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.paginator import Paginator
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from ..cache import fragment_stats
 from ..models import Comment, Follow, Group, Post
+from ..storage import post_image_storage
+from ..utils import CachedCountPaginator, elided_page_range
+from ..views import NUM_COMMENTS
 
 User = get_user_model()
 
@@ -216,11 +224,14 @@ class PostsPagesTest(TestCase):
             follow=True
         )
         self.assertEqual(Post.objects.count(), post_count + 1)
+        hashed_name = post_image_storage.content_name(
+            'posts/image.gif', hashlib.sha256(PostsPagesTest.image).hexdigest()
+        )
         self.assertTrue(
             Post.objects.filter(
                 text=form_data['text'],
                 group=form_data['group'],
-                image='posts/image.gif'
+                image=hashed_name
             ).exists()
         )
 
@@ -326,25 +337,42 @@ class PostsPagesTest(TestCase):
 
     def test_cache_index(self):
         """Проверка кеша главной страницы"""
+        cache.clear()
         response = self.authorized_client.get(
             reverse('posts:index')
         )
         content = response.content
+        response_cache = self.authorized_client.get(
+            reverse('posts:index')
+        )
+        self.assertEqual(content, response_cache.content)
+        self.assertEqual(fragment_stats()['index_page'], (1, 1))
         Post.objects.create(
             text='тестовый пост кеш',
             author=PostsPagesTest.user
         )
-        response_cache = self.authorized_client.get(
-            reverse('posts:index')
-        )
-        content_cache = response_cache.content
-        self.assertEqual(content, content_cache)
-        cache.clear()
         response_new = self.authorized_client.get(
             reverse('posts:index')
         )
-        content_new = response_new.content
-        self.assertNotEqual(content_cache, content_new)
+        self.assertNotEqual(content, response_new.content)
+        self.assertContains(response_new, 'тестовый пост кеш')
+        self.assertEqual(fragment_stats()['index_page'], (1, 2))
+
+    def test_cache_group_and_profile_invalidation(self):
+        """Правка группы и поста сразу видна на страницах"""
+        cache.clear()
+        group_url = reverse('posts:group_list',
+                            kwargs={'slug': PostsPagesTest.group.slug})
+        profile_url = reverse('posts:profile',
+                              kwargs={'username': PostsPagesTest.user})
+        self.guest_client.get(group_url)
+        self.guest_client.get(profile_url)
+        PostsPagesTest.post_2.text = 'Исправленный текст'
+        PostsPagesTest.post_2.save()
+        self.assertContains(self.guest_client.get(group_url),
+                            'Исправленный текст')
+        self.assertContains(self.guest_client.get(profile_url),
+                            'Исправленный текст')
 
 
 class PaginatorViewsTest(TestCase):
@@ -449,6 +477,162 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(post_author, user)
 
 
+@override_settings(
+    KEYSET_PAGINATION_VIEWS=['posts:index', 'posts:group_list']
+)
+class KeysetPaginatorViewsTest(TestCase):
+    """Тесты курсорной пагинации"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Поклонники',
+            slug='Fan',
+            description='Тестовое описание'
+        )
+        Post.objects.bulk_create([Post(
+            text=f'Тестовый пост {num}',
+            author=cls.user,
+            group=cls.group
+        ) for num in range(15)])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_keyset_pages_walk_forward_and_back(self):
+        """Курсоры ведут на следующую и предыдущую страницы"""
+        url = reverse('posts:group_list',
+                      kwargs={'slug': KeysetPaginatorViewsTest.group.slug})
+        first = self.guest_client.get(url).context['page_obj']
+        self.assertEqual(len(first), 10)
+        self.assertTrue(first.has_next())
+        self.assertFalse(first.has_previous())
+        second = self.guest_client.get(
+            url, {'cursor': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second), 5)
+        self.assertFalse(second.has_next())
+        self.assertTrue(second.has_previous())
+        self.assertFalse(set(first) & set(second))
+        back = self.guest_client.get(
+            url, {'cursor': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_keyset_page_does_not_count(self):
+        """Курсорная пагинация не выполняет COUNT(*) и OFFSET"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(reverse('posts:index'))
+        self.assertTrue(response.context['page_obj'].is_keyset)
+        for query in queries.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertNotIn('COUNT(', query['sql'])
+                self.assertNotIn('OFFSET', query['sql'])
+
+    def test_broken_cursor_returns_first_page(self):
+        """Неверный курсор открывает первую страницу"""
+        response = self.guest_client.get(reverse('posts:index'),
+                                         {'cursor': '%%%'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 10)
+        self.assertFalse(page_obj.has_previous())
+
+
+class CachedCountPaginatorTest(TestCase):
+    """Тесты пажинатора с кешированным числом постов"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        for num in range(3):
+            Post.objects.create(text=f'Пост {num}', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_count_is_cached_until_post_write(self):
+        """COUNT(*) кешируется и сбрасывается при записи поста"""
+        queryset = Post.objects.all()
+        self.assertEqual(CachedCountPaginator(queryset, 10).count, 3)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(CachedCountPaginator(queryset, 10).count, 3)
+        self.assertEqual(len(queries), 0)
+        Post.objects.create(text='Новый пост', author=self.user)
+        self.assertEqual(CachedCountPaginator(queryset, 10).count, 4)
+
+    @override_settings(PAGINATOR_ESTIMATE_THRESHOLD=1)
+    def test_estimated_count_for_unfiltered_queryset(self):
+        """Для таблицы без фильтра число строк берётся из оценки"""
+        paginator = CachedCountPaginator(Post.objects.all(), 10)
+        self.assertGreaterEqual(paginator.count, 3)
+        self.assertTrue(paginator.count_is_estimated)
+        paginator = CachedCountPaginator(
+            Post.objects.filter(author=self.user), 10
+        )
+        self.assertEqual(paginator.count, 3)
+        self.assertFalse(paginator.count_is_estimated)
+
+    def test_elided_page_range(self):
+        """Ссылки только на края и соседние страницы"""
+        paginator = Paginator(range(1000), 10)
+        self.assertEqual(list(elided_page_range(paginator, 50)),
+                         [1, None, 48, 49, 50, 51, 52, None, 100])
+        self.assertEqual(list(elided_page_range(paginator, 2)),
+                         [1, 2, 3, 4, None, 100])
+        self.assertEqual(list(elided_page_range(Paginator(range(50), 10),
+                                                1)),
+                         [1, 2, 3, 4, 5])
+
+
+class CommentsPaginationTest(TestCase):
+    """Тесты постраничной подгрузки комментариев"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        Comment.objects.bulk_create([Comment(
+            post=cls.post,
+            author=cls.user,
+            text=f'Комментарий {num}'
+        ) for num in range(25)])
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_detail_embeds_first_page(self):
+        """Страница поста содержит только первую страницу комментариев"""
+        response = self.guest_client.get(
+            reverse('posts:post_detail',
+                    kwargs={'post_id': CommentsPaginationTest.post.pk})
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), NUM_COMMENTS)
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, comments.next_cursor)
+
+    def test_comments_fragment_is_one_query(self):
+        """Следующая страница отдаётся фрагментом за один запрос"""
+        post_id = CommentsPaginationTest.post.pk
+        first = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post_id})
+        ).context['comments']
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(
+                reverse('posts:post_comments', kwargs={'post_id': post_id}),
+                {'cursor': first.next_cursor}
+            )
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        rest = response.context['comments']
+        self.assertEqual(len(rest), 25 - NUM_COMMENTS)
+        self.assertFalse(rest.has_next())
+        self.assertFalse(set(first) & set(rest))
+
+
 class TestPostCreate(TestCase):
     """Тесты отображения созданного поста на страницах"""
     @classmethod
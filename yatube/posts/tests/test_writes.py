@@ -0,0 +1,188 @@
+import threading
+from concurrent.futures import TimeoutError
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, OperationalError, transaction
+from django.test import TransactionTestCase, override_settings
+
+from core import metrics
+from core.writes import write, writer
+
+from ..models import Comment, Follow, Post, Profile
+
+User = get_user_model()
+
+
+class WriteQueueTest(TransactionTestCase):
+    """Тесты записи через поток-писатель core.writes"""
+    THREADS = 8
+    ROUNDS = 15
+
+    def setUp(self):
+        self.users = [User.objects.create(username=f'User{num}')
+                      for num in range(self.THREADS)]
+        self.post = Post.objects.create(author=self.users[0], text='Пост')
+
+    def test_concurrent_writes(self):
+        """Потоки пишут посты, комментарии и подписки без ошибок"""
+        errors = []
+
+        def worker(user):
+            try:
+                for num in range(self.ROUNDS):
+                    write(Post.objects.create, author=user,
+                          text=f'Пост {num}')
+                    write(Comment.objects.create, post=self.post,
+                          author=user, text=f'Комментарий {num}',
+                          batch=True)
+                    author = self.users[num % self.THREADS]
+                    if author != user:
+                        write(Follow.objects.get_or_create, user=user,
+                              author=author, batch=True)
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=worker, args=(user,))
+                   for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(Post.objects.count(),
+                         self.THREADS * self.ROUNDS + 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count,
+                         self.THREADS * self.ROUNDS)
+        self.assertEqual(Follow.objects.count(),
+                         self.THREADS * (self.THREADS - 1))
+        profile = Profile.objects.get(user=self.users[1])
+        self.assertEqual(profile.posts_count, self.ROUNDS)
+        self.assertEqual(profile.following_count, self.THREADS - 1)
+
+    def test_group_commit(self):
+        """Мелкие записи из очереди фиксируются одной транзакцией, ошибка
+        одной из них не отменяет остальные"""
+        release = threading.Event()
+        blocker = writer.submit(release.wait, (), {}, False)
+        futures = [
+            writer.submit(Comment.objects.create, (),
+                          {'post': self.post, 'author': user,
+                           'text': 'Комментарий'}, True)
+            for user in self.users
+        ]
+        futures.append(writer.submit(
+            Follow.objects.create, (),
+            {'user': self.users[0], 'author': self.users[1]}, True
+        ))
+        futures.append(writer.submit(
+            Follow.objects.create, (),
+            {'user': self.users[0], 'author': self.users[1]}, True
+        ))
+        transactions = writer.stats['transactions']
+        release.set()
+        blocker.result()
+        for future in futures[:-1]:
+            future.result()
+        with self.assertRaises(IntegrityError):
+            futures[-1].result()
+        # Транзакция блокирующей записи и одна на все остальные
+        self.assertEqual(writer.stats['transactions'] - transactions, 2)
+        self.assertEqual(Comment.objects.count(), self.THREADS)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_bad_foreign_key_does_not_fail_batch(self):
+        """Внешний ключ проверяется при COMMIT, но запись с битой ссылкой
+        не отменяет соседние записи пачки"""
+        release = threading.Event()
+        blocker = writer.submit(release.wait, (), {}, False)
+        valid = writer.submit(
+            Comment.objects.create, (),
+            {'post': self.post, 'author': self.users[0], 'text': 'Есть'},
+            True
+        )
+        orphan = writer.submit(
+            Comment.objects.create, (),
+            {'post_id': self.post.pk + 1000, 'author': self.users[0],
+             'text': 'Без поста'},
+            True
+        )
+        release.set()
+        blocker.result()
+        self.assertEqual(valid.result().text, 'Есть')
+        with self.assertRaises(IntegrityError):
+            orphan.result()
+        self.assertEqual(list(Comment.objects.values_list('text',
+                                                          flat=True)),
+                         ['Есть'])
+
+    @override_settings(WRITE_RETRY_DELAY=0.001)
+    def test_lock_retry(self):
+        """Занятая БД — повтор транзакции, после WRITE_RETRIES — ошибка"""
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return Post.objects.create(author=self.users[0], text='Повтор')
+
+        post = write(flaky)
+        self.assertEqual(len(calls), 3)
+        self.assertTrue(Post.objects.filter(pk=post.pk).exists())
+        locked = mock.Mock(side_effect=OperationalError('database is locked'))
+        with override_settings(WRITE_RETRIES=2):
+            with self.assertRaises(OperationalError):
+                write(locked)
+        self.assertEqual(locked.call_count, 3)
+
+    def test_on_commit_hooks(self):
+        """Функции on_commit выполняет ждущий поток после фиксации, их
+        ошибка не влияет на результат записи и соседние записи"""
+        calls = []
+
+        def create(text, fail):
+            post = Post.objects.create(author=self.users[0], text=text)
+            if fail:
+                transaction.on_commit(lambda: 1 / 0)
+            transaction.on_commit(
+                lambda: calls.append(threading.current_thread())
+            )
+            return post
+
+        release = threading.Event()
+        blocker = writer.submit(release.wait, (), {}, False)
+        failing = writer.submit(create, ('Ошибка в хуке', True), {}, True)
+        neighbour = writer.submit(create, ('Сосед', False), {}, True)
+        release.set()
+        blocker.result()
+        with self.assertLogs('core.writes', 'ERROR'):
+            post = failing.result()
+        self.assertEqual(neighbour.result().text, 'Сосед')
+        self.assertTrue(Post.objects.filter(pk=post.pk).exists())
+        self.assertEqual(calls, [threading.current_thread()] * 2)
+
+    def test_dead_writer_is_restarted(self):
+        """Запись не ждёт умерший поток-писатель дольше WRITE_TIMEOUT, а
+        следующая запись запускает новый"""
+        def die():
+            raise SystemExit
+
+        with override_settings(WRITE_TIMEOUT=0.5):
+            with self.assertRaises(TimeoutError):
+                write(die)
+        writer.thread.join()
+        post = write(Post.objects.create, author=self.users[0],
+                     text='После перезапуска')
+        self.assertTrue(writer.thread.is_alive())
+        self.assertTrue(Post.objects.filter(pk=post.pk).exists())
+
+    def test_queries_counted_in_request_metrics(self):
+        """Запросы писателя учитываются в метриках ждущего запроса"""
+        stats = metrics.start()
+        try:
+            write(Post.objects.create, author=self.users[0], text='Метрики')
+        finally:
+            metrics.finish()
+        self.assertGreater(stats.queries, 0)
@@ -0,0 +1,267 @@
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from PIL import Image, features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.engines import pil_engine
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .cache import bump_generation, record_thumbnails
+from .storage import post_image_storage
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+class PostThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, умеющий искать миниатюру без её создания"""
+
+    def get_options(self, source, options):
+        """Опции миниатюры так же, как их дополняет get_thumbnail()"""
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def get_thumbnail_file(self, file_, geometry_string, **options):
+        """Несохранённый ImageFile, под которым sorl хранит миниатюру"""
+        source = ImageFile(file_)
+        options = self.get_options(source, options)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_cached_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра из key-value store или None"""
+        thumbnail = self.get_thumbnail_file(file_, geometry_string, **options)
+        return default.kvstore.get(thumbnail)
+
+    def get_cached_thumbnails(self, thumbnails):
+        """{ключ: готовая миниатюра или None} для несохранённых ImageFile
+
+        Для cached_db KVStore все ключи читаются одним get_many() из кеша,
+        а промахи кеша — одним запросом к таблице KVStore.
+        """
+        kvstore = default.kvstore
+        if not isinstance(kvstore, CachedDBStore):
+            return {thumbnail.key: kvstore.get(thumbnail)
+                    for thumbnail in thumbnails}
+        keys = {add_prefix(thumbnail.key): thumbnail.key
+                for thumbnail in thumbnails}
+        values = kvstore.cache.get_many(keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            stored = dict(
+                KVStoreModel.objects.filter(key__in=missing)
+                .values_list('key', 'value')
+            )
+            found = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+            kvstore.cache.set_many(found,
+                                   sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(found)
+        return {
+            key: (None if values[raw_key] == EMPTY_VALUE
+                  else deserialize_image_file(values[raw_key]))
+            for raw_key, key in keys.items()
+        }
+
+
+backend = PostThumbnailBackend()
+
+
+class DraftEngine(pil_engine.Engine):
+    """PIL-движок, не декодирующий большие JPEG в полном разрешении
+
+    JPEG декодируется сразу в масштабе 1/2, 1/4 или 1/8 (draft), затем
+    картинка уменьшается в целое число раз (reduce) и только остаток
+    масштабируется фильтром LANCZOS. До финального ресэмплинга остаётся
+    запас reducing_gap, поэтому качество миниатюры почти не меняется.
+    """
+    reducing_gap = 2
+    reduce_modes = ('L', 'LA', 'RGB', 'RGBA')
+
+    def create(self, image, geometry, options):
+        if (not options['cropbox'] and not options.get('remove_border')
+                and options['crop'] != 'smart'):
+            self._draft(image, geometry, options)
+        return super().create(image, geometry, options)
+
+    def _draft(self, image, geometry, options):
+        if image.format != 'JPEG':
+            return
+        x_image, y_image = image.size
+        if self.flip_dimensions(image, geometry, options):
+            geometry = geometry[1], geometry[0]
+        factor = self._calculate_scaling_factor(x_image, y_image,
+                                                geometry, options)
+        factor *= self.reducing_gap
+        if factor < 1:
+            image.draft(image.mode, (math.ceil(x_image * factor),
+                                     math.ceil(y_image * factor)))
+
+    def _scale(self, image, width, height):
+        x_image, y_image = image.size
+        reduce = int(min(x_image / width, y_image / height)
+                     / self.reducing_gap)
+        if reduce > 1 and image.mode in self.reduce_modes:
+            image = image.reduce(reduce)
+        return image.resize((width, height), resample=Image.LANCZOS)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.POST_THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def pending_key(name):
+    return f'thumbnails:pending:{name}'
+
+
+def thumbnail_variants(size):
+    """{(ширина, формат): (геометрия, опции)} для размера size
+
+    Кроме геометрии из POST_THUMBNAILS, размер нарезается по меньшим
+    ширинам POST_THUMBNAIL_WIDTHS с теми же пропорциями. Каждая ширина
+    создаётся в формате sorl по умолчанию (формат None) и в форматах
+    POST_THUMBNAIL_FORMATS, которые поддерживает установленный Pillow.
+    """
+    geometry, options = settings.POST_THUMBNAILS[size]
+    width, _, height = geometry.partition('x')
+    width = int(width)
+    widths = {w for w in settings.POST_THUMBNAIL_WIDTHS if w < width}
+    formats = [None] + [
+        format_ for format_ in settings.POST_THUMBNAIL_FORMATS
+        if features.check(format_.lower())
+    ]
+    variants = {}
+    for format_ in formats:
+        variant_options = dict(options)
+        if format_:
+            variant_options['format'] = format_
+        for variant_width in sorted(widths | {width}):
+            variant_geometry = str(variant_width)
+            if height:
+                variant_height = round(int(height) * variant_width / width)
+                variant_geometry += f'x{variant_height}'
+            variants[variant_width, format_] = (variant_geometry,
+                                                variant_options)
+    return variants
+
+
+def all_variants():
+    """{(размер, ширина, формат): (геометрия, опции)} всех миниатюр"""
+    return {
+        (size, *key): value
+        for size in settings.POST_THUMBNAILS
+        for key, value in thumbnail_variants(size).items()
+    }
+
+
+def cached_thumbnails(images):
+    """[{(размер, ширина, формат): миниатюра или None}] для images
+
+    Все варианты всех картинок ищутся одним пакетным запросом.
+    """
+    variants = all_variants()
+    wanted = [
+        {key: backend.get_thumbnail_file(image, geometry, **options)
+         for key, (geometry, options) in variants.items()}
+        for image in images
+    ]
+    found = backend.get_cached_thumbnails(
+        [thumbnail for files in wanted for thumbnail in files.values()]
+    )
+    return [
+        {key: found[thumbnail.key] for key, thumbnail in files.items()}
+        for files in wanted
+    ]
+
+
+def cached_thumbnail(image, size):
+    """Миниатюра image размера size из POST_THUMBNAILS, если она готова"""
+    geometry, options = settings.POST_THUMBNAILS[size]
+    return backend.get_cached_thumbnail(image, geometry, **options)
+
+
+def prefetch_thumbnails(posts):
+    """Находит все миниатюры картинок posts одним пакетным запросом
+
+    Результат сохраняется в post._prefetched_thumbnails ({(размер, ширина,
+    формат): миниатюра или None}) и используется тегом {% post_image %}.
+    """
+    started = time.perf_counter()
+    posts = [post for post in posts if post.image]
+    found = cached_thumbnails([post.image for post in posts])
+    hits = total = 0
+    for post, thumbnails in zip(posts, found):
+        post._prefetched_thumbnails = thumbnails
+        hits += sum(thumbnail is not None
+                    for thumbnail in thumbnails.values())
+        total += len(thumbnails)
+    record_thumbnails(hits, total - hits, time.perf_counter() - started)
+    return posts
+
+
+def generate_thumbnails(name):
+    """Создаёт все миниатюры POST_THUMBNAILS для файла name"""
+    source = ImageFile(name, post_image_storage)
+    try:
+        for geometry, options in all_variants().values():
+            backend.get_thumbnail(source, geometry, **options)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+    else:
+        bump_generation('thumbnails')
+    finally:
+        cache.delete(pending_key(name))
+
+
+def run_in_worker(name):
+    """Задача фонового потока: соединения с БД потока закрываются"""
+    try:
+        generate_thumbnails(name)
+    finally:
+        connections.close_all()
+
+
+def schedule_thumbnails(image):
+    """Ставит создание миниатюр image в фоновую очередь
+
+    Задача уходит в очередь после коммита транзакции, в которой сохранён
+    пост, и не ставится повторно, пока предыдущая не завершилась.
+    """
+    if not image:
+        return
+    name = image.name
+    if not cache.add(pending_key(name), True,
+                     settings.POST_THUMBNAIL_PENDING_TIMEOUT):
+        return
+    if not settings.POST_THUMBNAIL_BACKGROUND:
+        transaction.on_commit(lambda: generate_thumbnails(name))
+        return
+    transaction.on_commit(lambda: get_executor().submit(
+        run_in_worker, name
+    ))
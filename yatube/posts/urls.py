@@ -25,6 +25,11 @@ urlpatterns = [
         views.post_detail,
         name='post_detail'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         'create/',
         views.post_create,
@@ -40,6 +45,11 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path(
+        'search/',
+        views.search,
+        name='search'
+    ),
     path(
         'follow/',
         views.follow_index,
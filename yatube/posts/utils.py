@@ -1,8 +1,227 @@
-from django.core.paginator import Paginator
+import base64
+import hashlib
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 
-def paginate_page(request, post_list, post_per_page=10):
-    paginator = Paginator(post_list, post_per_page)
+from .cache import get_generation
+
+
+class KeysetPage(Page):
+    """Страница курсорной пагинации.
+
+    Сохраняет интерфейс ``Page``, который используют шаблоны, но вместо
+    номера страницы хранит непрозрачный курсор.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, cursor,
+                 has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self.cursor = cursor
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<KeysetPage {self.cursor or "first"}>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], 'n')
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], 'p')
+
+
+class KeysetPaginator:
+    """Пажинатор по ключу (key, pk) в порядке убывания.
+
+    Не выполняет ни COUNT(*), ни OFFSET: каждая страница — это один
+    запрос ``WHERE (key, pk) < (значение из курсора) LIMIT per_page + 1``.
+    """
+
+    def __init__(self, object_list, per_page, key='pub_date'):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.key = key
+
+    def encode_cursor(self, obj, direction):
+        raw = f'{direction}|{getattr(obj, self.key).isoformat()}|{obj.pk}'
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает (направление, значение ключа, pk) или None."""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode()).decode()
+            direction, value, pk = raw.split('|')
+            value, pk = parse_datetime(value), int(pk)
+        except (TypeError, ValueError):
+            return None
+        if direction not in ('n', 'p') or value is None:
+            return None
+        return direction, value, pk
+
+    def get_page(self, cursor):
+        """Возвращает страницу по курсору, при ошибке — первую страницу"""
+        position = self.decode_cursor(cursor) if cursor else None
+        key = self.key
+        if position is None:
+            cursor = None
+            backwards = False
+            queryset = self.object_list.order_by(f'-{key}', '-pk')
+        else:
+            direction, value, pk = position
+            backwards = direction == 'p'
+            if backwards:
+                queryset = self.object_list.filter(
+                    Q(**{f'{key}__gt': value})
+                    | Q(**{key: value, 'pk__gt': pk})
+                ).order_by(key, 'pk')
+            else:
+                queryset = self.object_list.filter(
+                    Q(**{f'{key}__lt': value})
+                    | Q(**{key: value, 'pk__lt': pk})
+                ).order_by(f'-{key}', '-pk')
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if backwards:
+            object_list.reverse()
+            return KeysetPage(object_list, self, cursor,
+                              has_next=True, has_previous=has_more)
+        return KeysetPage(object_list, self, cursor,
+                          has_next=has_more, has_previous=cursor is not None)
+
+
+def elided_page_range(paginator, number, on_each_side=2, on_ends=1):
+    """Номера страниц вокруг текущей и по краям, None на месте пропуска"""
+    num_pages = paginator.num_pages
+    if num_pages <= (on_each_side + on_ends) * 2 + 1:
+        yield from paginator.page_range
+        return
+    if number > on_each_side + on_ends + 1:
+        yield from range(1, on_ends + 1)
+        yield None
+        yield from range(number - on_each_side, number + 1)
+    else:
+        yield from range(1, number + 1)
+    if number < num_pages - on_each_side - on_ends:
+        yield from range(number + 1, number + on_each_side + 1)
+        yield None
+        yield from range(num_pages - on_ends + 1, num_pages + 1)
+    else:
+        yield from range(number + 1, num_pages + 1)
+
+
+class CachedCountPaginator(Paginator):
+    """Пажинатор, кеширующий COUNT(*) по сигнатуре запроса
+
+    Ключ включает поколение постов, поэтому любая запись Post делает
+    закешированные значения устаревшими. Для больших таблиц без фильтров
+    число строк можно брать из статистики СУБД (PAGINATOR_ESTIMATE_THRESHOLD).
+    """
+    count_is_estimated = False
+
+    def __init__(self, object_list, per_page, generation='posts', **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.generation = generation
+
+    def count_cache_key(self):
+        sql, params = self.object_list.query.sql_with_params()
+        signature = hashlib.md5(f'{sql}{params!r}'.encode()).hexdigest()
+        generation = get_generation(self.generation)
+        return f'paginator:count:{generation}:{signature}'
+
+    def estimate_count(self):
+        """Оценка числа строк таблицы из статистики СУБД или None"""
+        query = self.object_list.query
+        if query.where or query.distinct or query.combinator:
+            return None
+        table = self.object_list.model._meta.db_table
+        connection = connections[self.object_list.db]
+        if connection.vendor == 'postgresql':
+            sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+            params = [table]
+        elif connection.vendor == 'sqlite':
+            sql = f'SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}'
+            params = []
+        else:
+            return None
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                row = cursor.fetchone()
+        except DatabaseError:
+            return None
+        return row[0] if row and row[0] is not None else None
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        key = self.count_cache_key()
+        cached = cache.get(key)
+        if cached is None:
+            threshold = settings.PAGINATOR_ESTIMATE_THRESHOLD
+            estimate = self.estimate_count() if threshold else None
+            if estimate is not None and estimate >= threshold:
+                cached = (estimate, True)
+            else:
+                cached = (super().count, False)
+            cache.set(key, cached, settings.PAGINATOR_COUNT_TIMEOUT)
+        count, self.count_is_estimated = cached
+        return count
+
+
+def use_keyset(request):
+    """Включена ли курсорная пагинация для текущей view"""
+    match = request.resolver_match
+    return (match is not None
+            and match.view_name in settings.KEYSET_PAGINATION_VIEWS)
+
+
+def paginate_page(request, post_list, post_per_page=10, keyset=None,
+                  cache_count=True):
+    if keyset is None:
+        keyset = use_keyset(request)
+    if keyset and isinstance(post_list, QuerySet):
+        paginator = KeysetPaginator(post_list, post_per_page)
+        return paginator.get_page(request.GET.get('cursor'))
+    if cache_count:
+        paginator = CachedCountPaginator(post_list, post_per_page)
+    else:
+        paginator = Paginator(post_list, post_per_page)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def pk_chunks(queryset, chunk_size):
+    """Списки pk queryset по chunk_size штук без долгого курсора и OFFSET"""
+    last_pk = None
+    while True:
+        chunk = queryset.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        chunk = list(chunk.values_list('pk', flat=True)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1]
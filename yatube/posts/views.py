@@ -2,18 +2,24 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect, render
 
+from core.writes import write
+
+from .feeds import follow_feed
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
-from .utils import paginate_page
+from .models import Comment, Follow, Group, Post
+from .search import SearchPaginator, fts_available
+from .thumbnails import schedule_thumbnails
+from .utils import KeysetPaginator, paginate_page
 
 NUM_POST: int = 10
+NUM_COMMENTS: int = 20
 
 User = get_user_model()
 
 
 def index(request):
     """Функция отображения главной страницы"""
-    posts_list = Post.objects.all()
+    posts_list = Post.objects.select_related('author', 'group')
     context = {
         'page_obj': paginate_page(request, posts_list)
     }
@@ -23,7 +29,7 @@ def index(request):
 def group_posts(request, slug):
     """Функция отображения постов группы"""
     group = get_object_or_404(Group, slug=slug)
-    posts_list = group.posts.all()
+    posts_list = group.posts.select_related('author', 'group')
     context = {
         'page_obj': paginate_page(request, posts_list),
         'group': group
@@ -33,8 +39,9 @@ def group_posts(request, slug):
 
 def profile(request, username):
     """Функция отображения профиля пользователя"""
-    author = get_object_or_404(User, username=username)
-    posts_list = author.posts.all()
+    author = get_object_or_404(User.objects.select_related('profile'),
+                               username=username)
+    posts_list = author.posts.select_related('author', 'group')
     following = (request.user.is_authenticated
                  and Follow.objects.filter(user=request.user,
                                            author=author).exists())
@@ -48,9 +55,14 @@ def profile(request, username):
 
 def post_detail(request, post_id):
     """Функция детального отображения поста"""
-    one_post = get_object_or_404(Post, pk=post_id)
+    one_post = get_object_or_404(
+        Post.objects.select_related('author__profile', 'group'), pk=post_id
+    )
     form = CommentForm(request.POST or None)
-    comments = one_post.comments.all()
+    comments = KeysetPaginator(
+        one_post.comments.select_related('author'), NUM_COMMENTS,
+        key='created'
+    ).get_page(None)
     context = {
         'one_post': one_post,
         'form': form,
@@ -60,6 +72,37 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Функция подгрузки следующей страницы комментариев"""
+    comments = KeysetPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        NUM_COMMENTS, key='created'
+    ).get_page(request.GET.get('cursor'))
+    context = {
+        'comments': comments,
+        'post_id': post_id
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+def search(request):
+    """Функция полнотекстового поиска по постам"""
+    query = request.GET.get('q', '').strip()
+    cursor = request.GET.get('cursor')
+    if fts_available():
+        page_obj = SearchPaginator(query, NUM_POST).get_page(cursor)
+    else:
+        posts_list = Post.objects.filter(
+            text__icontains=query
+        ).select_related('author', 'group')
+        page_obj = KeysetPaginator(posts_list, NUM_POST).get_page(cursor)
+    context = {
+        'query': query,
+        'page_obj': page_obj if query else None,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     """Функция создания нового поста"""
@@ -67,7 +110,12 @@ def post_create(request):
     if form.is_valid():
         new_post = form.save(commit=False)
         new_post.author = request.user
-        new_post.save()
+
+        def save():
+            new_post.save()
+            schedule_thumbnails(new_post.image)
+
+        write(save)
         return redirect('posts:profile', request.user.username)
     return render(request, 'posts/create_post.html', {'form': form})
 
@@ -83,7 +131,13 @@ def post_edit(request, post_id):
                     instance=post)
     if form.is_valid():
         post.author = request.user
-        form.save()
+
+        def save():
+            form.save()
+            if 'image' in form.changed_data:
+                schedule_thumbnails(post.image)
+
+        write(save)
         return redirect('posts:post_detail', post_id)
     context = {
         'is_edit': True,
@@ -101,7 +155,7 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        write(comment.save, batch=True)
     return redirect('posts:post_detail', post_id=post_id)
 
 
@@ -109,19 +163,16 @@ def add_comment(request, post_id):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(
-            user=request.user,
-            author=author
-        )
+        write(Follow.objects.get_or_create, user=request.user,
+              author=author, batch=True)
     return redirect('posts:profile', username)
 
 
 @login_required
 def follow_index(request):
-    user = request.user
-    post_list = Post.objects.filter(author__following__user=user)
+    post_list = follow_feed(request.user)
     context = {
-        'page_obj': paginate_page(request, post_list)
+        'page_obj': paginate_page(request, post_list, cache_count=False)
     }
     return render(request, 'posts/follow.html', context)
 
@@ -129,5 +180,9 @@ def follow_index(request):
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.get(user=request.user, author=author).delete()
+
+    def delete():
+        Follow.objects.get(user=request.user, author=author).delete()
+
+    write(delete, batch=True)
     return redirect('posts:profile', username)
@@ -49,24 +49,39 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+
+# В продакшене шаблоны компилируются один раз на процесс кеширующим
+# загрузчиком (и заранее, см. WARMUP_ON_START); при DEBUG правки шаблонов
+# видны без перезапуска.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -86,11 +101,45 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # sqlite3 с BEGIN IMMEDIATE для транзакций core.writes
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # В продакшене соединение воркера живёт между запросами, и
+        # прагмы ниже выполняются один раз на соединение
+        'CONN_MAX_AGE': 0 if DEBUG else 600,
     }
 }
 
+# Прагмы каждого нового соединения с SQLite (core.signals). WAL: читатели
+# не ждут пишущего, а он — их; synchronous = NORMAL в WAL теряет при
+# сбое питания только последние транзакции, но не портит БД. busy_timeout
+# первым: переключение в WAL тоже ждёт блокировку. cache_size в КиБ
+# (отрицательное значение), mmap_size в байтах. См. bench_sqlite.
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# Транзакции записи процесса идут через один поток-писатель (core.writes):
+# BEGIN IMMEDIATE, до WRITE_RETRIES повторов при "database is locked" со
+# случайной задержкой до WRITE_RETRY_DELAY * 2 ** попытка секунд. Мелкие
+# записи (комментарии, подписки), накопившиеся в очереди, фиксируются
+# одной транзакцией, до GROUP_COMMIT_SIZE штук; 1 — без группировки.
+# Запрос ждёт писателя не дольше WRITE_TIMEOUT секунд.
+WRITE_QUEUE_ENABLED = True
+
+WRITE_RETRIES = 5
+
+WRITE_RETRY_DELAY = 0.02
+
+GROUP_COMMIT_SIZE = 50
+
+WRITE_TIMEOUT = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -154,5 +203,135 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
+
+
+# Имена view (``app:name``), в которых вместо нумерованных страниц
+# используется курсорная пагинация ``?cursor=`` без COUNT(*) и OFFSET.
+KEYSET_PAGINATION_VIEWS = []
+
+
+# Сколько последних постов хранится в ленте подписок каждого пользователя
+# и сколько строк Inbox записывается одним INSERT при рассылке поста.
+FEED_INBOX_LIMIT = 1000
+
+FEED_FANOUT_BATCH_SIZE = 1000
+
+# Посты авторов, у которых подписчиков не меньше порога, не рассылаются
+# по Inbox, а сливаются в ленту при чтении из закешированных списков
+# последних FEED_AUTHOR_CACHE_SIZE постов каждого автора. Рассылка
+# возобновляется, когда подписчиков становится меньше порога на долю
+# FEED_FANOUT_HYSTERESIS; пропущенные посты автора дописываются в ленты
+# в фоне (при FEED_BACKFILL_BACKGROUND = False — сразу после коммита).
+FEED_FANOUT_FOLLOWER_LIMIT = 10000
+
+FEED_FANOUT_HYSTERESIS = 0.1
+
+FEED_BACKFILL_BACKGROUND = True
+
+FEED_AUTHOR_CACHE_SIZE = 100
+
+FEED_CACHE_TIMEOUT = 60 * 60
+
+# Сколько секунд хранится закешированный COUNT(*) нумерованной пагинации.
+# Если задан порог, для таблиц без фильтра больше порога число строк
+# берётся из статистики СУБД вместо COUNT(*).
+PAGINATOR_COUNT_TIMEOUT = 60 * 60
+
+PAGINATOR_ESTIMATE_THRESHOLD = None
+
+# Фрагменты лент сбрасываются сменой поколения при записи Post, Group и
+# User, поэтому время жизни ограничивает только объём кеша.
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Кеш целых страниц для анонимных пользователей (ETag / Last-Modified).
+PAGE_CACHE_ENABLED = not DEBUG
+
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+PAGE_CACHE_VIEWS = [
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+]
+
+
+# Миниатюры картинок постов: имя размера -> (геометрия, опции sorl).
+# Они создаются фоновыми потоками после сохранения поста, а до готовности
+# шаблоны показывают заглушку.
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+# Каждый размер нарезается ещё и по меньшим ширинам с теми же пропорциями
+# и дублируется в форматах POST_THUMBNAIL_FORMATS для srcset и <picture>.
+POST_THUMBNAIL_WIDTHS = (480, 720)
+
+POST_THUMBNAIL_FORMATS = ('WEBP',)
+
+POST_THUMBNAIL_SIZES = '(min-width: 1000px) 960px, 100vw'
+
+POST_THUMBNAIL_BACKGROUND = True
+
+POST_THUMBNAIL_WORKERS = 2
+
+POST_THUMBNAIL_PENDING_TIMEOUT = 60 * 5
+
+# Обработка картинок постов при загрузке: уменьшение до
+# POST_IMAGE_MAX_DIMENSIONS, удаление метаданных и пережатие в
+# POST_IMAGE_FORMAT (картинки с прозрачностью — в PNG). Качество
+# понижается шагами по 10, пока файл больше POST_IMAGE_MAX_BYTES.
+POST_IMAGE_PROCESSING = True
+
+POST_IMAGE_MAX_DIMENSIONS = (2560, 2560)
+
+POST_IMAGE_FORMAT = 'JPEG'
+
+POST_IMAGE_QUALITY = 85
+
+POST_IMAGE_MIN_QUALITY = 60
+
+POST_IMAGE_MAX_BYTES = 1024 * 1024
+
+# Большие JPEG декодируются в уменьшенном масштабе (см. bench_thumbnails).
+THUMBNAIL_ENGINE = 'posts.thumbnails.DraftEngine'
+
+# Ленты ищут миниатюры всей страницы одним get_many() к этому кешу; в
+# продакшене он должен быть общим для процессов (Memcached, Redis).
+THUMBNAIL_KVSTORE = 'sorl.thumbnail.kvstores.cached_db_kvstore.KVStore'
+
+THUMBNAIL_CACHE = 'default'
+
+# Метрики запросов по имени view в формате Prometheus на /metrics: число
+# запросов, гистограмма времени, запросы к БД, шаблоны и кеш. Выключенная
+# MetricsMiddleware исключается из цепочки. Страница метрик отдаётся
+# только адресам METRICS_ALLOWED_IPS.
+METRICS_ENABLED = False
+
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Профилирование шаблонов: полное и собственное время каждого шаблона,
+# include, тега и фильтра, сложенное по запросам процесса. Отдаётся
+# адресам METRICS_ALLOWED_IPS на /metrics/templates (таблица) и
+# /metrics/templates?format=collapsed (для flamegraph.pl и speedscope).
+# Подменяет рендеринг узлов шаблонов, поэтому только для отладки.
+TEMPLATE_PROFILING = False
+
+# Бэкенды с замерами кеша и рендеринга подключаются, только если метрики
+# или профилирование включены: иначе они ничего не стоят.
+if METRICS_ENABLED:
+    CACHES['default']['BACKEND'] = 'core.cache.MetricsLocMemCache'
+if METRICS_ENABLED or TEMPLATE_PROFILING:
+    TEMPLATES[0]['BACKEND'] = 'core.templates.MetricsDjangoTemplates'
+
+# Прогрев воркера в wsgi.py до приёма запросов: компиляция всех шаблонов
+# в кеширующий загрузчик, импорт URLconf и view, каталоги переводов.
+WARMUP_ON_START = not DEBUG